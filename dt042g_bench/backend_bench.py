@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import argparse
+import decimal
+import timeit
+
+from dt042g_src.calculator import FLOAT_BACKEND, INTEGER_BACKEND, compile, decimal_backend, fraction_backend
+
+__desc__ = 'Compares the cost of compiling and evaluating expressions with each numeric backend'
+
+
+def backends(precision: int) -> dict:
+    """Creates the backends to compare
+
+    :param precision: The precision of the decimal backend
+    :returns A mapping of backend names to backends
+    """
+    return {
+        'float': FLOAT_BACKEND,
+        'integer': INTEGER_BACKEND,
+        'decimal': decimal_backend(decimal.Context(prec=precision)),
+        'fraction': fraction_backend(),
+    }
+
+
+def workloads() -> dict:
+    """Returns expressions exercising integer arithmetic, exact and inexact division, and large powers
+
+    :returns A mapping of workload names to expressions
+    """
+    return {
+        'integers': '(12 + 345) * 6789 - 2 ^ 3 * (45 - 6) + 789 * 10',
+        'divisions': '(1 / 3 + 2 / 7) * 21 - 100 / 8 + 9 / 4',
+        'powers': '2 ^ 64 * 3 ^ 20 - 7 ^ 30 + 2 ^ 10',
+    }
+
+
+def measure(statement, number: int, repeat: int) -> float:
+    """Measures the best time of running the statement number times
+
+    :returns The best time per run in seconds
+    """
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+
+
+def main():
+    """Parses arguments and prints the compile and evaluation cost of each backend for each workload"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--number', type=int, default=10_000, help='Evaluations per repetition')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions, of which the best is reported')
+    parser.add_argument('--precision', type=int, default=28, help='The precision of the decimal backend')
+    arguments = parser.parse_args()
+    print(f'{"workload":<12}{"backend":<10}{"compile us":>12}{"evaluate us":>13}{"vs float":>10}  result')
+    for name, expression in workloads().items():
+        baseline = None
+        for backend_name, backend in backends(arguments.precision).items():
+            compile_time = measure(lambda: compile(expression, backend=backend), arguments.number // 10 or 1,
+                                   arguments.repeat)
+            compiled = compile(expression, backend=backend)
+            evaluate_time = measure(compiled.evaluate, arguments.number, arguments.repeat)
+            baseline = baseline or evaluate_time
+            print(f'{name:<12}{backend_name:<10}{compile_time * 1e6:>12.2f}{evaluate_time * 1e6:>13.2f}'
+                  f'{evaluate_time / baseline:>9.1f}x  {compiled.evaluate()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import argparse
+import timeit
+
+from dt042g_src.calculator import compile
+from dt042g_src.codegen import NativeCompiler, NativeExpression
+
+__desc__ = 'Compares evaluating compiled expressions by interpreting their program against generated Python functions'
+
+
+def workloads() -> dict:
+    """Returns expressions with variables, evaluated with x = 3 and y = 2
+
+    :returns A mapping of workload names to expressions
+    """
+    return {
+        'arithmetic': '(x + 2) * y - x / (y + 1) ^ 2',
+        'polynomial': '3 * x ^ 4 - 2 * x ^ 3 + x ^ 2 * y - 7 * x + y ^ 2 - 11',
+        'conditional': 'if(x > y and y != 0, sqrt(x) * y, x * 2 - y)',
+        'long sum': ' + '.join(f'{i} * x - y' for i in range(50)),
+    }
+
+
+def measure(statement, number: int, repeat: int) -> float:
+    """Measures the best time of running the statement number times
+
+    :returns The best time per run in seconds
+    """
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+
+
+def main():
+    """Parses arguments and prints the evaluation cost of the interpreted and native forms of each workload, and the
+    cost of compiling the native form with and without the cache"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--number', type=int, default=100_000, help='Evaluations per repetition')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions, of which the best is reported')
+    arguments = parser.parse_args()
+    values = [3.0, 2.0]
+    compiler = NativeCompiler()
+    print(f'{"workload":<13}{"interpret us":>14}{"native us":>11}{"speedup":>9}{"translate us":>14}{"cached us":>11}')
+    for name, expression in workloads().items():
+        compiled = compile(expression)
+        native = NativeExpression(compiled)
+        interpret_time = measure(lambda: compiled.evaluate(values), arguments.number, arguments.repeat)
+        native_time = measure(lambda: native.evaluate(values), arguments.number, arguments.repeat)
+        translate_time = measure(lambda: NativeExpression(compiled), arguments.number // 100 or 1, arguments.repeat)
+        cached_time = measure(lambda: compiler.compile(expression), arguments.number // 10 or 1, arguments.repeat)
+        print(f'{name:<13}{interpret_time * 1e6:>14.2f}{native_time * 1e6:>11.2f}'
+              f'{interpret_time / native_time:>8.1f}x{translate_time * 1e6:>14.2f}{cached_time * 1e6:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import argparse
+import random
+import timeit
+
+from dt042g_src.calculator import CompiledExpression, compile
+from dt042g_src.optimizer import count_nodes, share_subtrees
+from dt042g_bench.workloads import repetitive_expression
+
+__desc__ = 'Measures how many nodes sharing subtrees of the same structure removes from repetitive expressions, ' \
+           'and how much faster they evaluate'
+
+
+def main():
+    """Parses arguments and prints the deduplication ratio, the number of instructions and the evaluation time of
+    repetitive expressions with and without shared subtrees"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--terms', type=int, nargs='+', default=[4, 16, 64],
+                        help='The numbers of top level subexpressions of the generated expressions')
+    parser.add_argument('--levels', type=int, default=3, help='The number of levels of repeated subexpressions')
+    parser.add_argument('--number', type=int, default=2000, help='The number of evaluations to time')
+    arguments = parser.parse_args()
+    rng = random.Random(0)
+    expressions = [('example', '(a + b * c) ^ 2 / (a + b * c)')]
+    expressions += [(f'{terms} terms', repetitive_expression(rng, terms, levels=arguments.levels))
+                    for terms in arguments.terms]
+    values = {'a': 1.5, 'b': 2.5, 'c': 3.5, 'd': 4.5}
+    print(f'{"expression":<12}{"nodes":>8}{"distinct":>9}{"ratio":>7}{"instructions":>13}{"shared":>8}'
+          f'{"tree us":>9}{"shared us":>10}{"speedup":>8}')
+    for name, expression in expressions:
+        compiled = compile(expression)
+        shared = CompiledExpression(expression, share_subtrees(compiled.tree), compiled.backend)
+        assert compiled.evaluate(values) == shared.evaluate(values)
+        nodes, _ = count_nodes(compiled.tree)
+        _, distinct = count_nodes(shared.tree)
+        times = [min(timeit.repeat(lambda: program.evaluate(values), number=arguments.number, repeat=5))
+                 / arguments.number for program in (compiled, shared)]
+        print(f'{name:<12}{nodes:>8}{distinct:>9}{nodes / distinct:>7.1f}{len(compiled.program):>13}'
+              f'{len(shared.program):>8}{times[0] * 1e6:>9.1f}{times[1] * 1e6:>10.1f}{times[0] / times[1]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from dt042g_bench.workloads import random_expression, repetitive_expression, write_batch_file
+
+__desc__ = 'Compares the time restarted processes take to compile a formula library without a cache, with an empty ' \
+           'DiskCache and with a DiskCache filled by an earlier process'
+
+
+def formula_library(formulas: int, seed=0) -> list:
+    """Generates a library of large formulas, half of them random and half of them repetitive
+
+    :returns The formulas
+    """
+    rng = random.Random(seed)
+    return [random_expression(rng, rng.randint(20, 200)) if i % 2 else repetitive_expression(rng, rng.randint(2, 16))
+            for i in range(formulas)]
+
+
+def compile_library(library: str, cache: str or None):
+    """Compiles every formula of a library file, with a DiskCache at the path cache if it is not None, and prints
+    the seconds it took including opening the cache"""
+    from dt042g_src.calculator import compile
+    from dt042g_src.disk_cache import DiskCache
+    with open(library) as file_handle:
+        formulas = file_handle.read().splitlines()
+    start = time.perf_counter()
+    if cache is None:
+        for formula in formulas:
+            compile(formula)
+    else:
+        with DiskCache(cache) as disk_cache:
+            for formula in formulas:
+                disk_cache.compile(formula)
+    print(time.perf_counter() - start)
+
+
+def run(library: str, cache: str or None, processes: int) -> tuple:
+    """Runs processes compiling the library at the same time
+
+    :returns The slowest compile time reported by a process, and the wall time until all of them exited
+    """
+    command = [sys.executable, '-m', 'dt042g_bench.disk_cache_bench', '--compile', library]
+    if cache is not None:
+        command += ['--cache', cache]
+    start = time.perf_counter()
+    children = [subprocess.Popen(command, stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+    compile_times = [float(child.communicate()[0]) for child in children]
+    return max(compile_times), time.perf_counter() - start
+
+
+def main():
+    """Parses arguments and prints the compile and wall times of processes compiling a generated formula library"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--formulas', type=int, default=2000, help='The number of formulas in the library')
+    parser.add_argument('--processes', type=int, default=4,
+                        help='The number of processes reading the filled cache at the same time')
+    parser.add_argument('--compile', help=argparse.SUPPRESS)
+    parser.add_argument('--cache', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.compile is not None:
+        compile_library(arguments.compile, arguments.cache)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        library = os.path.join(directory, 'library.txt')
+        cache = os.path.join(directory, 'cache.sqlite')
+        formulas = formula_library(arguments.formulas)
+        write_batch_file(library, formulas)
+        print(f'{len(formulas)} formulas, {sum(map(len, formulas)) / 1e6:.1f} MB')
+        print(f'{"run":<28}{"compile s":>10}{"wall s":>8}')
+        for name, path, processes in (('no cache', None, 1), ('cold cache', cache, 1), ('warm cache', cache, 1),
+                                      (f'warm cache, {arguments.processes} processes', cache, arguments.processes)):
+            compile_time, wall = run(library, path, processes)
+            print(f'{name:<28}{compile_time:>10.3f}{wall:>8.3f}')
+        print(f'cache file {os.path.getsize(cache) / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
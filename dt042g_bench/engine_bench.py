@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dt042g_src.cache import ExpressionCache
+from dt042g_src.calculator import Calculator
+from dt042g_src.engine import CalculatorEngine
+from dt042g_bench.workloads import batch_corpus, repeated_corpus
+
+__desc__ = 'Compares allocating a Calculator per request against sharing a CalculatorEngine in a thread pool'
+
+
+def per_request(expression: str):
+    """Calculates an expression with a Calculator of its own, like a request handler without a shared engine"""
+    try:
+        return Calculator(expression).calculate()
+    except (ValueError, ArithmeticError) as e:
+        return e
+
+
+def run(calculate, expressions: list, threads: int) -> float:
+    """Calculates the expressions in a thread pool
+
+    :returns The number of expressions calculated per second
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        for _ in executor.map(calculate, expressions, chunksize=64):
+            pass
+        return len(expressions) / (time.perf_counter() - start)
+
+
+def main():
+    """Parses arguments and prints the throughput of each way of calculating each corpus with each number of
+    threads"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--lines', type=int, default=50_000, help='The number of expressions of each corpus')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8], help='The numbers of threads')
+    arguments = parser.parse_args()
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'Python {sys.version.split()[0]}, GIL {"enabled" if gil else "disabled"}')
+    corpora = (('repeated', repeated_corpus(arguments.lines, 100)), ('distinct', batch_corpus(arguments.lines)))
+    print(f'{"corpus":<10}{"threads":>8}{"per request/s":>15}{"engine/s":>11}{"cached engine/s":>17}')
+    for name, expressions in corpora:
+        for threads in arguments.threads:
+            engine = CalculatorEngine()
+            cached = CalculatorEngine(cache=ExpressionCache())
+            rates = [run(calculate, expressions, threads) for calculate in
+                     (per_request, lambda expression: engine.calculate_many((expression,))[0],
+                      lambda expression: cached.calculate_many((expression,))[0])]
+            print(f'{name:<10}{threads:>8}{rates[0]:>15.0f}{rates[1]:>11.0f}{rates[2]:>17.0f}')
+
+
+if __name__ == '__main__':
+    main()
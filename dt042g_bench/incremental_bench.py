@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import argparse
+import random
+import time
+
+from dt042g_src.calculator import compile
+from dt042g_src.incremental import IncrementalEvaluator
+
+__desc__ = 'Compares re-evaluating a formula with many inputs on every tick against incremental re-evaluation'
+
+
+def balanced_formula(inputs: int) -> str:
+    """Generates a weighted sum of the inputs, grouped pairwise into a balanced tree, like a pricing formula
+
+    :returns The expression, with variables named x0, x1, ...
+    """
+    terms = [f'x{i} * {1 + i % 7}' for i in range(inputs)]
+    while len(terms) > 1:
+        terms = [f'({" + ".join(terms[i:i + 2])})' for i in range(0, len(terms), 2)]
+    return terms[0]
+
+
+def flat_formula(inputs: int) -> str:
+    """Generates a weighted sum of the inputs as a flat, left-deep sum
+
+    :returns The expression, with variables named x0, x1, ...
+    """
+    return ' + '.join(f'x{i} * {1 + i % 7}' for i in range(inputs))
+
+
+def main():
+    """Parses arguments and prints the cost per tick of full and incremental evaluation, where each tick changes
+    a few random inputs"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--inputs', type=int, default=64, help='The number of inputs of the formula')
+    parser.add_argument('--changed', type=int, default=1, help='The number of inputs changed per tick')
+    parser.add_argument('--ticks', type=int, default=20_000, help='The number of ticks')
+    arguments = parser.parse_args()
+    rng = random.Random(0)
+    print(f'{"formula":<10}{"full us":>10}{"incremental us":>16}{"speedup":>9}{"nodes/tick":>12}')
+    for name, expression in (('balanced', balanced_formula(arguments.inputs)),
+                             ('flat', flat_formula(arguments.inputs))):
+        compiled = compile(expression)
+        values = {name: 1.0 for name in compiled.variables}
+        ticks = [[(f'x{rng.randrange(arguments.inputs)}', rng.random()) for _ in range(arguments.changed)]
+                 for _ in range(arguments.ticks)]
+
+        start = time.perf_counter()
+        for changes in ticks:
+            values.update(changes)
+            compiled.evaluate(values)
+        full = (time.perf_counter() - start) / arguments.ticks
+
+        evaluator = IncrementalEvaluator(compiled, values)
+        evaluator.value()
+        recomputed = 0
+        start = time.perf_counter()
+        for changes in ticks:
+            for variable, value in changes:
+                evaluator.set(variable, value)
+            evaluator.value()
+            recomputed += evaluator.recomputed
+        incremental = (time.perf_counter() - start) / arguments.ticks
+        print(f'{name:<10}{full * 1e6:>10.2f}{incremental * 1e6:>16.2f}{full / incremental:>8.1f}x'
+              f'{recomputed / arguments.ticks:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from itertools import cycle, islice
+
+from dt042g_src.calculator import calculate_lines
+from dt042g_src.parallel import calculate_parallel
+
+__desc__ = 'Measures how batch calculation scales from one to many worker processes'
+
+
+def load_corpus(path: str, lines: int) -> list:
+    """Loads the expressions of a corpus file and replicates them to the requested number of lines
+
+    :param path: A JSON file mapping expressions to their results, like lab2_expressions/expressions.json
+    :param lines: The number of lines to replicate the expressions to
+    :returns The lines
+    """
+    with open(path) as file_handle:
+        expressions = list(json.load(file_handle))
+    return list(islice(cycle(expressions), lines))
+
+
+def worker_counts(maximum: int) -> list:
+    """Returns the worker counts to measure: the powers of two up to maximum, and maximum itself"""
+    counts = []
+    count = 1
+    while count < maximum:
+        counts.append(count)
+        count *= 2
+    return counts + [maximum]
+
+
+def measure(results) -> float:
+    """Consumes an iterator of results without keeping them
+
+    :returns The elapsed time in seconds
+    """
+    start = time.perf_counter()
+    deque(results, maxlen=0)
+    return time.perf_counter() - start
+
+
+def main():
+    """Parses arguments and prints the throughput and speedup of each worker count"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--corpus', default=os.path.join('lab2_expressions', 'expressions.json'),
+                        help='The JSON corpus of expressions to replicate')
+    parser.add_argument('--lines', type=int, default=1_000_000, help='The number of lines to calculate')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                        help='The largest number of worker processes to measure')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='Lines dispatched to a worker at a time')
+    parser.add_argument('--unordered', dest='ordered', action='store_false', help='Measure unordered results')
+    arguments = parser.parse_args()
+    lines = load_corpus(arguments.corpus, arguments.lines)
+
+    baseline = measure(calculate_lines(lines))
+    print(f'{"workers":>8}{"lines/s":>14}{"speedup":>10}')
+    print(f'{"in-proc":>8}{len(lines) / baseline:>14.0f}{1:>9.2f}x')
+    for workers in worker_counts(arguments.max_workers):
+        elapsed = measure(calculate_parallel(lines, workers, arguments.chunk_size, arguments.ordered))
+        print(f'{workers:>8}{len(lines) / elapsed:>14.0f}{baseline / elapsed:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+from dt042g_src.server import CalculatorServer
+
+__desc__ = 'Generates load on a calculator server and reports latency percentiles and throughput'
+
+
+async def run_connection(host: str, port: int, requests: int, pipeline: int, latencies: list):
+    """Sends requests over one connection, keeping up to pipeline requests in flight, and records the latency
+    of each request"""
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = deque()
+    in_flight = asyncio.Semaphore(pipeline)
+
+    async def send():
+        for i in range(requests):
+            await in_flight.acquire()
+            sent.append(time.perf_counter())
+            writer.write(json.dumps({'id': i, 'expression': f'({i}+1)*x^2/3', 'variables': {'x': i % 7}})
+                         .encode() + b'\n')
+            await writer.drain()
+
+    async def receive():
+        for _ in range(requests):
+            await reader.readline()
+            latencies.append(time.perf_counter() - sent.popleft())
+            in_flight.release()
+
+    await asyncio.gather(send(), receive())
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(values: list, share: float) -> float:
+    """Returns the value below which the given share of the sorted values lie"""
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+async def run(arguments):
+    """Starts an in-process server unless a port is given, runs the connections and prints the report"""
+    listener = None
+    port = arguments.port
+    if port is None:
+        listener = await CalculatorServer().start(arguments.host, 0)
+        port = listener.sockets[0].getsockname()[1]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[run_connection(arguments.host, port, arguments.requests, arguments.pipeline, latencies)
+                           for _ in range(arguments.connections)])
+    elapsed = time.perf_counter() - start
+    if listener is not None:
+        listener.close()
+        await listener.wait_closed()
+
+    latencies.sort()
+    print(f'requests: {len(latencies)}, throughput: {len(latencies) / elapsed:.0f} requests/s')
+    for share in (0.5, 0.9, 0.99, 1.0):
+        print(f'p{share * 100:g} latency: {percentile(latencies, share) * 1000:.3f} ms')
+
+
+def main():
+    """Parses arguments and runs the load generator"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--host', default='127.0.0.1', help='The host of the server')
+    parser.add_argument('--port', type=int, help='The port of a running server. Starts one in-process if omitted')
+    parser.add_argument('--connections', type=int, default=8, help='Concurrent connections')
+    parser.add_argument('--requests', type=int, default=10_000, help='Requests per connection')
+    parser.add_argument('--pipeline', type=int, default=16, help='Requests in flight per connection')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from dt042g_bench.suite import metadata
+
+__desc__ = 'Measures the import time of the calculator with -X importtime and the wall time of short command line ' \
+           'invocations, and checks them against a budget'
+
+
+def import_times(module: str) -> list:
+    """Imports a module in a fresh interpreter with -X importtime
+
+    :returns (self microseconds, cumulative microseconds, depth, name) of every imported module, in import order
+    """
+    command = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    stderr = subprocess.run(command, capture_output=True, text=True, check=True).stderr
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        stripped = name.lstrip()
+        times.append((int(own), int(cumulative), (len(name) - len(stripped) - 1) // 2, stripped))
+    return times
+
+
+def command_time(arguments: list, repeat: int) -> float:
+    """Measures the median wall time of running the interpreter with the arguments
+
+    :returns The median time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    """Parses arguments, prints the slowest direct imports of the calculator and the wall times of command line
+    invocations, and exits with status 1 if the import time exceeds the budget"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--repeat', type=int, default=15, help='The number of runs of which the median is reported')
+    parser.add_argument('--top', type=int, default=8, help='The number of slowest direct imports to report')
+    parser.add_argument('--budget', type=float, help='The import time of the calculator in milliseconds above which '
+                                                     'the exit status is 1')
+    parser.add_argument('-o', '--output', help='Save the results as JSON to this file')
+    arguments = parser.parse_args()
+
+    runs = [import_times('dt042g_src.calculator') for _ in range(arguments.repeat)]
+    total = statistics.median(times[-1][1] for times in runs) / 1000
+    direct = {}
+    for times in runs:
+        # The modules imported by the calculator itself are listed right before it, one level deeper
+        for own, cumulative, depth, name in reversed(times[:-1]):
+            if depth == 0:
+                break
+            elif depth == 1:
+                direct.setdefault(name, []).append(cumulative)
+    direct = sorted(((statistics.median(cumulative) / 1000, name) for name, cumulative in direct.items()),
+                    reverse=True)
+    print(f'import dt042g_src.calculator: {total:.1f} ms')
+    for milliseconds, name in direct[:arguments.top]:
+        print(f'  {name:<24}{milliseconds:>8.1f} ms')
+
+    commands = {
+        'python -c pass': ['-c', 'pass'],
+        'calculator -c 1+2': ['-m', 'dt042g_src.calculator', '-c', '1+2'],
+        'calculator --json -c 1+2': ['-m', 'dt042g_src.calculator', '--json', '-c', '1+2'],
+    }
+    wall = {name: command_time(command, arguments.repeat) * 1000 for name, command in commands.items()}
+    for name, milliseconds in wall.items():
+        print(f'{name:<26}{milliseconds:>8.1f} ms')
+
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as file_handle:
+            json.dump({'metadata': metadata(1), 'import_ms': total,
+                       'imports_ms': {name: milliseconds for milliseconds, name in direct}, 'wall_ms': wall},
+                      file_handle, indent=2)
+    if arguments.budget is not None and total > arguments.budget:
+        print(f'Import time {total:.1f} ms exceeds the budget of {arguments.budget:.1f} ms')
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from collections import deque
+
+from dt042g_src.calculator import Calculator, __version__, calculate_batch, tokenize
+from dt042g_bench import workloads
+
+__desc__ = 'Measures the tokenizer, parser, evaluator and command line on synthetic workloads, and compares ' \
+           'the results against a previous run to flag regressions'
+
+
+def expression_workloads(scale: int) -> dict:
+    """Generates the single expression workloads. Deep workloads are parsed iteratively, since the recursive
+    parser is limited by the recursion limit
+
+    :param scale: The size multiplier of the workloads
+    :returns A mapping of workload names to (expression, iterative) pairs
+    """
+    return {
+        'flat sum': (workloads.flat_sum(1000 * scale), False),
+        'deep nesting': (workloads.deep_nesting(2000 * scale), True),
+        'exponent chain': (workloads.exponent_chain(2000 * scale), True),
+    }
+
+
+def corpus_workloads(scale: int) -> dict:
+    """Generates the corpus workloads
+
+    :param scale: The size multiplier of the workloads
+    :returns A mapping of workload names to lists of expressions
+    """
+    return {
+        'repeated corpus': workloads.repeated_corpus(10_000 * scale, 20),
+        'batch corpus': workloads.batch_corpus(10_000 * scale),
+    }
+
+
+def measure(function, operations: int, repeat: int) -> dict:
+    """Measures the best time of calling function, and its peak memory allocated in a separate call
+
+    :param function: The function to measure, called without arguments
+    :param operations: The number of operations performed by each call, such as the number of lines of a batch
+    :param repeat: The number of timed runs, of which the best is reported
+    :returns A mapping of 'seconds', 'ops_per_sec' and 'peak_bytes' to the measured values
+    """
+    number, _ = timeit.Timer(function).autorange()
+    seconds = min(timeit.repeat(function, number=number, repeat=repeat)) / number
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': seconds, 'ops_per_sec': operations / seconds, 'peak_bytes': peak}
+
+
+def measure_expression(expression: str, iterative: bool, repeat: int) -> dict:
+    """Measures each stage of calculating an expression: tokenizing alone, tokenizing and parsing into a compiled
+    expression, evaluating the compiled expression, and all of them together
+
+    :returns A mapping of stage names to measurements
+    """
+    compiled = Calculator(expression, iterative).compile()
+    return {
+        'tokenize': measure(lambda: deque(tokenize(expression), maxlen=0), 1, repeat),
+        'parse': measure(lambda: Calculator(expression, iterative).compile(), 1, repeat),
+        'evaluate': measure(compiled.evaluate, 1, repeat),
+        'calculate': measure(lambda: Calculator(expression, iterative).calculate(), 1, repeat),
+    }
+
+
+def measure_corpus(lines: list, repeat: int, command_line: bool) -> dict:
+    """Measures calculating a corpus as a batch in this process, and optionally through the command line in a
+    new process, which includes the start up of the interpreter
+
+    :param command_line: Whether to measure the command line
+    :returns A mapping of stage names to measurements
+    """
+    results = {'batch': measure(lambda: calculate_batch(lines, io.StringIO()), len(lines), repeat)}
+    if command_line:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'batch.txt')
+            workloads.write_batch_file(path, lines)
+            results['cli'] = measure_command(path, len(lines), repeat)
+    return results
+
+
+def measure_command(path: str, operations: int, repeat: int) -> dict:
+    """Measures the best wall time of calculating a batch file with the command line. The peak memory of a child
+    process is not traced, and is reported as None
+
+    :returns A measurement like measure()
+    """
+    command = [sys.executable, '-m', 'dt042g_src.calculator', '-i', path]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    return {'seconds': seconds, 'ops_per_sec': operations / seconds, 'peak_bytes': None}
+
+
+def run(scale: int, repeat: int, command_line: bool) -> dict:
+    """Runs every workload
+
+    :returns The results, with metadata identifying the run and a mapping of 'workload/stage' to measurements
+    """
+    results = {}
+    for name, (expression, iterative) in expression_workloads(scale).items():
+        for stage, measurement in measure_expression(expression, iterative, repeat).items():
+            results[f'{name}/{stage}'] = measurement
+            report(f'{name}/{stage}', measurement)
+    for name, lines in corpus_workloads(scale).items():
+        for stage, measurement in measure_corpus(lines, repeat, command_line).items():
+            results[f'{name}/{stage}'] = measurement
+            report(f'{name}/{stage}', measurement)
+    return {'metadata': metadata(scale), 'results': results}
+
+
+def metadata(scale: int) -> dict:
+    """Describes the run, so results of different commits and machines can be told apart"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'version': __version__,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': scale,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def report(name: str, measurement: dict):
+    """Prints a measurement as a table row"""
+    peak = measurement['peak_bytes']
+    peak = '-' if peak is None else f'{peak / 1024:.1f}'
+    print(f'{name:<28}{measurement["ops_per_sec"]:>14.1f}{measurement["seconds"] * 1e3:>12.3f}{peak:>12}')
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Compares the throughput of each measurement against a baseline run
+
+    :param baseline: The results of a previous run()
+    :param current: The results of this run()
+    :param threshold: The relative drop in ops/sec above which a measurement is a regression, like 0.1 for 10%
+    :returns The names of the regressed measurements
+    """
+    regressions = []
+    print(f'\n{"compared to " + str(baseline["metadata"].get("commit")):<28}{"before":>14}{"after":>14}{"change":>10}')
+    for name, measurement in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = measurement['ops_per_sec'] / before['ops_per_sec'] - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<28}{before["ops_per_sec"]:>14.1f}{measurement["ops_per_sec"]:>14.1f}{change:>+10.1%}{flag}')
+    return regressions
+
+
+def main():
+    """Parses arguments, runs the workloads, and saves and compares the results. Exits with status 1 if a
+    measurement regressed compared to the baseline"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--scale', type=int, default=1, help='The size multiplier of the workloads')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions, of which the best is reported')
+    parser.add_argument('--no-cli', dest='command_line', action='store_false',
+                        help='Skip measuring the command line')
+    parser.add_argument('-o', '--output', help='Save the results as JSON to this file')
+    parser.add_argument('--compare', help='Compare the results against a JSON file saved with --output')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='The relative drop in ops/sec which is reported as a regression')
+    arguments = parser.parse_args()
+
+    print(f'{"workload/stage":<28}{"ops/s":>14}{"ms/op":>12}{"peak KiB":>12}')
+    results = run(arguments.scale, arguments.repeat, arguments.command_line)
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as file_handle:
+            json.dump(results, file_handle, indent=2)
+    if arguments.compare is not None:
+        with open(arguments.compare) as file_handle:
+            baseline = json.load(file_handle)
+        if compare(baseline, results, arguments.threshold):
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
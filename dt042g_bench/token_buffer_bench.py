@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+import argparse
+import time
+import tracemalloc
+
+from dt042g_src.calculator import Calculator, TokenBuffer, tokenize
+from dt042g_bench.workloads import flat_sum
+
+__desc__ = 'Compares the memory and time of holding the Tokens of large expressions as a list of Tokens and as a ' \
+           'TokenBuffer'
+
+
+def measure(function) -> tuple:
+    """Measures the time of calling function, and the memory allocated by it which is still held by its result
+
+    :returns The result, the elapsed time in seconds, and the bytes held by the result
+    """
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, held
+
+
+def main():
+    """Parses arguments and prints the memory held and time taken by each token representation, and the time of
+    compiling the expression from its text, which tokenizes it lazily, and from the TokenBuffer"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--terms', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='The numbers of terms of the generated sums')
+    arguments = parser.parse_args()
+    print(f'{"terms":>9}{"MB":>7}{"tokens":>9}{"representation":>16}{"B/token":>9}{"build s":>9}{"parse s":>9}')
+    for terms in arguments.terms:
+        expression = flat_sum(terms)
+        for name, build, parse in (
+                ('list', lambda: list(tokenize(expression)), None),
+                ('TokenBuffer', lambda: TokenBuffer(expression),
+                 lambda tokens: Calculator(expression, iterative=True).compile(tokens))):
+            tokens, build_time, held = measure(build)
+            if parse is None:
+                start = time.perf_counter()
+                Calculator(expression, iterative=True).compile()
+            else:
+                start = time.perf_counter()
+                parse(tokens)
+            parse_time = time.perf_counter() - start
+            print(f'{terms:>9}{len(expression) / 1e6:>7.1f}{len(tokens):>9}{name:>16}{held / len(tokens):>9.1f}'
+                  f'{build_time:>9.3f}{parse_time:>9.3f}')
+            del tokens
+
+
+if __name__ == '__main__':
+    main()
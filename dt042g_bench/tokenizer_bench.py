@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import argparse
+import re
+import timeit
+
+from dt042g_src.calculator import Token, TokenType, tokenize
+
+__desc__ = 'Compares the throughput of tokenize() against the original per-character tokenizer'
+
+
+def legacy_tokenize(calculation: str) -> list:
+    """The original per-character tokenizer of Calculator, kept as the baseline of the benchmark
+
+    :returns Tokens extracted from the expression
+    """
+    calculation = re.sub('[ "\n\t]', '', calculation)
+    operators = ['+', '-', '*', '/', '^', '(', ')']
+    i = 0
+    tokens = []
+    while i < len(calculation):
+        if calculation[i].isdigit():
+            number = ''
+            while i < len(calculation) and calculation[i].isdigit():
+                number += calculation[i]
+                i += 1
+            tokens.append(Token(type=TokenType.NUMBER, value=number))
+        elif calculation[i] in operators:
+            if calculation[i] == operators[0]:
+                tokens.append(Token(type=TokenType.PLUS, value=calculation[i]))
+            elif calculation[i] == operators[1]:
+                tokens.append(Token(type=TokenType.MINUS, value=calculation[i]))
+            elif calculation[i] == operators[2]:
+                tokens.append(Token(type=TokenType.MULTIPLY, value=calculation[i]))
+            elif calculation[i] == operators[3]:
+                tokens.append(Token(type=TokenType.DIVIDE, value=calculation[i]))
+            elif calculation[i] == operators[4]:
+                tokens.append(Token(type=TokenType.EXPONENT, value=calculation[i]))
+            elif calculation[i] == operators[5]:
+                tokens.append(Token(type=TokenType.LEFT_PARENTHESIS, value=calculation[i]))
+            elif calculation[i] == operators[6]:
+                tokens.append(Token(type=TokenType.RIGHT_PARENTHESIS, value=calculation[i]))
+            i += 1
+        else:
+            i += 1
+
+    return list(tokens)
+
+
+def workloads(size: int) -> dict:
+    """Generates expressions of roughly size characters
+
+    :returns A mapping of workload names to expressions
+    """
+    unit = '(12 + 345) * 6789 / 2 ^ 3 - '
+    return {
+        'mixed': unit * (size // len(unit)) + '1',
+        'long literal': '1' * size,
+    }
+
+
+def measure(function, expression: str, repeat: int) -> float:
+    """Measures the best time of tokenizing the expression completely
+
+    :returns The best time in seconds
+    """
+    return min(timeit.repeat(lambda: list(function(expression)), number=1, repeat=repeat))
+
+
+def main():
+    """Parses arguments and prints the throughput of both tokenizers for each workload and size"""
+    parser = argparse.ArgumentParser(description=__desc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Expression sizes in characters')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions, of which the best is reported')
+    arguments = parser.parse_args()
+    print(f'{"workload":<14}{"size":>10}{"legacy MB/s":>14}{"tokenize MB/s":>16}{"speedup":>10}')
+    for size in arguments.sizes:
+        for name, expression in workloads(size).items():
+            legacy = measure(legacy_tokenize, expression, arguments.repeat)
+            current = measure(tokenize, expression, arguments.repeat)
+            megabytes = len(expression) / 1e6
+            print(f'{name:<14}{size:>10}{megabytes / legacy:>14.2f}{megabytes / current:>16.2f}'
+                  f'{legacy / current:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
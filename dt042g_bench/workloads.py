@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import random
+from itertools import cycle, islice
+
+__desc__ = 'Generates synthetic expressions and corpora for the benchmarks'
+
+
+def flat_sum(terms: int) -> str:
+    """Generates a long sum without nesting, like 1 + 2 - 3 + ...
+
+    :param terms: The number of numbers in the sum
+    :returns The expression
+    """
+    parts = [str(1 + i % 97) for i in range(terms)]
+    operators = cycle(' + - * / '.split())
+    return ''.join(part + ' ' + next(operators) + ' ' for part in parts[:-1]) + parts[-1]
+
+
+def deep_nesting(depth: int) -> str:
+    """Generates an expression nested in depth parenthesis, like (((1 + 1) * 2) - 3)
+
+    :param depth: The number of nested parenthesis
+    :returns The expression
+    """
+    operators = cycle('+-*')
+    return '(' * depth + '1' + ''.join(f' {next(operators)} {1 + i % 9})' for i in range(depth))
+
+
+def exponent_chain(length: int) -> str:
+    """Generates a right-associative chain of exponentiations, which stays finite for any length
+
+    :param length: The number of exponentiations
+    :returns The expression
+    """
+    return '2 ^ ' + ' ^ '.join(['1'] * length)
+
+
+def random_expression(rng: random.Random, operations: int) -> str:
+    """Generates a random expression with numbers, parenthesis, unary minus and every binary operator
+
+    :param rng: The random number generator, seeded for reproducible expressions
+    :param operations: The number of binary operations
+    :returns The expression
+    """
+    expression = str(rng.randint(1, 99))
+    for _ in range(operations):
+        operand = str(rng.randint(1, 99))
+        if rng.random() < 0.2:
+            operand = f'-{operand}'
+        expression = f'{expression} {rng.choice("+-*/")} {operand}'
+        if rng.random() < 0.3:
+            expression = f'({expression})'
+    return expression
+
+
+def repeated_corpus(lines: int, distinct: int, seed=0) -> list:
+    """Generates a corpus in which a few distinct expressions repeat many times, like the formulas of a
+    spreadsheet applied to many rows
+
+    :param lines: The number of expressions in the corpus
+    :param distinct: The number of distinct expressions
+    :param seed: The seed of the random expressions
+    :returns The expressions
+    """
+    rng = random.Random(seed)
+    expressions = [random_expression(rng, rng.randint(1, 12)) for _ in range(distinct)]
+    return list(islice(cycle(expressions), lines))
+
+
+def batch_corpus(lines: int, seed=0) -> list:
+    """Generates a corpus of distinct random expressions, like a large batch file
+
+    :param lines: The number of expressions
+    :param seed: The seed of the random expressions
+    :returns The expressions
+    """
+    rng = random.Random(seed)
+    return [random_expression(rng, rng.randint(1, 12)) for _ in range(lines)]
+
+
+def write_batch_file(path: str, lines: list):
+    """Writes expressions as a newline-delimited batch file, which can be calculated with -i/--input"""
+    with open(path, 'w') as file_handle:
+        file_handle.writelines(line + '\n' for line in lines)
+
+
+def repetitive_expression(rng: random.Random, terms: int, distinct=4, levels=3) -> str:
+    """Generates an expression which repeats a few subexpressions, like generated formulas such as
+    (a + b * c) ^ 2 / (a + b * c). Each level combines pairs of the subexpressions of the level below, so the
+    subexpressions of the top level repeat those of every level below.
+
+    :param rng: The random number generator, seeded for reproducible expressions
+    :param terms: The number of top level subexpressions in the sum
+    :param distinct: The number of distinct subexpressions of each level
+    :param levels: The number of levels of subexpressions
+    :returns The expression, with variables named a, b, c and d
+    """
+    pool = [f'({rng.choice("abcd")} {rng.choice("+-*")} {rng.choice("abcd")} * {rng.randint(2, 9)})'
+            for _ in range(distinct)]
+    for _ in range(levels - 1):
+        pool = [f'({rng.choice(pool)} {rng.choice("+-*/")} {rng.choice(pool)})' for _ in range(distinct)]
+    return ' + '.join(rng.choice(pool) for _ in range(terms))
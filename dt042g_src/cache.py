@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Callable
+
+from dt042g_src.calculator import FLOAT_BACKEND, FUNCTIONS, Calculator, CompiledExpression, FunctionRegistry, \
+    Limits, NumericBackend
+
+_REDUNDANT_SPACE = re.compile(r'(?<![\w.<>=!])(?<![eE][-+]) |(?<![eE]) (?![\w.=])|(?<=[\w.])(?<![eE]) (?==)'
+                             r'|(?<=[<>=!]) (?!=)')
+
+
+def normalize_expression(expression: str) -> str:
+    """Normalizes whitespace and quotes, so expressions which only differ in them share a cache key. A single space
+    is kept where whitespace separates two numbers or identifiers, since it separates their Tokens, and where removing
+    it could join a decimal point or an exponent sign into a number, or an equals sign into a comparison.
+
+    :returns The normalized expression
+    """
+    return _REDUNDANT_SPACE.sub('', ' '.join(expression.replace('"', ' ').split()))
+
+
+class CacheStats(namedtuple('CacheStats', ('hits', 'misses', 'evictions', 'size', 'maxsize'))):
+    """A snapshot of the counters of a cache"""
+    __slots__ = ()
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+    @property
+    def hit_ratio(self) -> float:
+        """The share of lookups which were hits, or 0 if there were no lookups"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """A bounded, thread-safe mapping which evicts the least recently used entry when full"""
+    __maxsize: int
+    __entries: OrderedDict
+    __lock: threading.Lock
+    __hits: int
+    __misses: int
+    __evictions: int
+
+    def __init__(self, maxsize=1024):
+        """Initializes fields
+
+        :param maxsize: The maximum number of entries
+        :raises ValueError if maxsize is not positive
+        """
+        if maxsize < 1:
+            raise ValueError(f'Expected a positive maxsize, got {maxsize}')
+        self.__maxsize = maxsize
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = self.__misses = self.__evictions = 0
+
+    def __len__(self):
+        """Returns the number of entries"""
+        return len(self.__entries)
+
+    def get(self, key, compute: Callable):
+        """Returns the cached value of the key, or computes, caches and returns it on a miss. The value is computed
+        without holding the lock, so a slow computation does not block other lookups. Errors raised by compute are
+        not cached.
+
+        :param key: The key of the value
+        :param compute: Computes the value on a miss
+        :returns The value
+        """
+        with self.__lock:
+            try:
+                value = self.__entries[key]
+            except KeyError:
+                self.__misses += 1
+            else:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return value
+
+        value = compute()
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            if len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+        return value
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the counters"""
+        with self.__lock:
+            return CacheStats(self.__hits, self.__misses, self.__evictions, len(self.__entries), self.__maxsize)
+
+    def clear(self):
+        """Removes all entries and resets the counters"""
+        with self.__lock:
+            self.__entries.clear()
+            self.__hits = self.__misses = self.__evictions = 0
+
+
+class ExpressionCache:
+    """Caches the results of calculations, and the compiled forms of expressions with variables, keyed on the
+    normalized expression. Pass it to Calculator to cache calculate(), or use compile() directly. Compiled
+    expressions which miss the cache can be looked up in a second, persistent store like disk_cache.DiskCache."""
+    __results: LRUCache
+    __compiled: LRUCache
+    __store: object
+
+    def __init__(self, maxsize=1024, compiled_maxsize=1024, store=None):
+        """Initializes fields
+
+        :param maxsize: The maximum number of cached results
+        :param compiled_maxsize: The maximum number of cached compiled expressions
+        :param store: An optional store with the compile() method of this class, which compiles the expressions
+        missing the cache, like a disk_cache.DiskCache
+        """
+        self.__results = LRUCache(maxsize)
+        self.__compiled = LRUCache(compiled_maxsize)
+        self.__store = store
+
+    def result(self, expression: str, compute: Callable, backend=None, functions=None,
+               limits=None) -> float or int:
+        """Returns the cached result of the expression, or computes and caches it on a miss. Only results of
+        expressions calling pure functions should be cached.
+
+        :param expression: The expression the result belongs to
+        :param compute: Calculates the result on a miss
+        :param backend: The NumericBackend the result is calculated with. Defaults to FLOAT_BACKEND
+        :param functions: The FunctionRegistry the result is calculated with. Defaults to FUNCTIONS
+        :param limits: The Limits the result is calculated with, if any
+        :returns The result
+        """
+        return self.__results.get(self.__key(expression, backend, functions, limits), compute)
+
+    def compile(self, expression: str, iterative=False, backend=None, functions=None,
+                limits=None) -> CompiledExpression:
+        """Returns the cached compiled form of the expression, or compiles and caches it on a miss
+
+        :param expression: The expression to compile
+        :param iterative: Whether to parse without recursion, see Calculator
+        :param backend: The NumericBackend to compile for. Defaults to FLOAT_BACKEND
+        :param functions: The FunctionRegistry to resolve function calls in. Defaults to FUNCTIONS
+        :param limits: Optional Limits the expression must be within. The length is checked before the lookup
+        :raises ValueError if the expression is invalid
+        :raises LimitExceededError if the expression exceeds the limits
+        :returns The compiled expression, which is immutable and can be shared between threads
+        """
+        if limits is not None:
+            limits.check_length(expression)
+        if self.__store is not None:
+            return self.__compiled.get(self.__key(expression, backend, functions, limits),
+                                       lambda: self.__store.compile(expression, iterative, backend, functions, limits))
+        return self.__compiled.get(self.__key(expression, backend, functions, limits),
+                                   lambda: Calculator(expression, iterative, backend=backend, functions=functions,
+                                                      limits=limits).compile())
+
+    @staticmethod
+    def __key(expression: str, backend: NumericBackend or None, functions: FunctionRegistry or None,
+              limits: Limits or None = None) -> str or tuple:
+        """Returns the cache key of an expression, which includes the backend, function registry and limits unless
+        they are the defaults"""
+        expression = normalize_expression(expression)
+        if (backend is None or backend is FLOAT_BACKEND) and (functions is None or functions is FUNCTIONS) \
+                and limits is None:
+            return expression
+        else:
+            return expression, backend or FLOAT_BACKEND, functions or FUNCTIONS, limits
+
+    def stats(self) -> dict:
+        """Returns snapshots of the counters of the result and compiled expression caches
+
+        :returns A mapping of 'results' and 'compiled' to CacheStats
+        """
+        return {'results': self.__results.stats(), 'compiled': self.__compiled.stats()}
+
+    def clear(self):
+        """Removes all entries and resets the counters"""
+        self.__results.clear()
+        self.__compiled.clear()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 
-import argparse
+import math
+import os
 import re
-from collections.abc import Iterator
+import sys
+from array import array
+from contextlib import nullcontext
+from itertools import islice
+from time import perf_counter
+from collections import namedtuple
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from enum import Enum
-from dataclasses import dataclass
 
 __version__ = '1.0'
 __desc__ = "A simple calculator that evaluates a mathematical expression using + - / * ()"
@@ -21,21 +27,252 @@ class TokenType(Enum):
     LEFT_PARENTHESIS = 6
     RIGHT_PARENTHESIS = 7
     END = 8
+    IDENTIFIER = 9
+    COMMA = 10
+    LESS = 11
+    LESS_EQUAL = 12
+    GREATER = 13
+    GREATER_EQUAL = 14
+    EQUAL = 15
+    NOT_EQUAL = 16
+    AND = 17
+    OR = 18
+    NOT = 19
 
 
-@dataclass
-class Token:
-    """Defines a token, with a type and value"""
+class Token(namedtuple('Token', ('type', 'value', 'position'), defaults=(None,))):
+    """Defines a token, with a type, value and position of its first character in the expression. The value of a
+    NUMBER token is the converted number, and the text of the token otherwise. A collections.namedtuple, since
+    importing typing for NamedTuple takes longer than a single calculation."""
+    __slots__ = ()
     type: TokenType
-    value: str
+    value: str or float
+    position: int or None
 
     def __repr__(self):
         """Returns a string representation of the token"""
         return f'{self.type.name} "{self.value}"'
 
 
+class CalculationError(Exception):
+    """Base class of the errors raised for expressions which can not be calculated, with the position in the
+    expression of the Token causing the error where it is known"""
+    message: str
+    position: int or None
+
+    def __init__(self, message: str, position: int or None = None):
+        """Initializes fields"""
+        super().__init__(message, position)
+        self.message = message
+        self.position = position
+
+    def __str__(self):
+        """Returns the message, including the position if it is known"""
+        if self.position is None:
+            return self.message
+        else:
+            return f'{self.message} at position {self.position}'
+
+
+class ExpressionSyntaxError(CalculationError, ValueError):
+    """Raised for an invalid expression, at the position of the unexpected Token"""
+
+
+class UnboundVariableError(CalculationError, ValueError):
+    """Raised when evaluating an expression without a value bound to one of its variables"""
+
+
+class NonRealResultError(CalculationError, ValueError):
+    """Raised when an expression evaluates to a complex number, like a fractional power of a negative number"""
+
+
+class DivisionByZeroError(CalculationError, ZeroDivisionError):
+    """Raised when an expression divides by zero"""
+
+
+class FunctionCallError(CalculationError, ValueError):
+    """Raised when a function rejects its arguments, like the square root of a negative number"""
+
+
+class LimitExceededError(CalculationError, ValueError):
+    """Raised when an expression exceeds a resource limit of the Limits it is calculated with"""
+
+
+_TOKEN_PATTERN = re.compile(r'[\s"]*(?:(<=|>=|==|!=|[-+*/^(),<>])'
+                            r'|(0[xX][0-9a-fA-F](?:_?[0-9a-fA-F])*)'
+                            r'|((?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)?|\.\d(?:_?\d)*)(?:[eE][-+]?\d(?:_?\d)*)?)'
+                            r'|([^\W\d]\w*)|.)', re.DOTALL)
+_OPERATORS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '^': TokenType.EXPONENT,
+    '(': TokenType.LEFT_PARENTHESIS,
+    ')': TokenType.RIGHT_PARENTHESIS,
+    ',': TokenType.COMMA,
+    '<': TokenType.LESS,
+    '<=': TokenType.LESS_EQUAL,
+    '>': TokenType.GREATER,
+    '>=': TokenType.GREATER_EQUAL,
+    '==': TokenType.EQUAL,
+    '!=': TokenType.NOT_EQUAL,
+}
+_KEYWORDS = {
+    'and': TokenType.AND,
+    'or': TokenType.OR,
+    'not': TokenType.NOT,
+}
+
+
+def tokenize(expression: str, convert: Callable = float) -> Iterator:
+    """Lazily parses an expression into Tokens in a single pass of a compiled pattern. Numbers are integers (12),
+    decimals (3.14, 2., .5), scientific notation (1e6, 2.5E-3) or hexadecimal integers (0xFF), and digits can be
+    grouped with single underscores (1_000_000). Identifiers start with a letter or underscore, followed by letters,
+    digits or underscores. Whitespace and quotes separate tokens, and any other character is skipped.
+
+    :param expression: The expression to tokenize
+    :param convert: Converts the text of a number without underscores, or the int value of a hexadecimal number,
+    into the value of its Token. Defaults to float
+    :raises ExpressionSyntaxError if a number converts to infinity, like 1e400 does with float
+    :returns An iterator of the Tokens in the expression
+    """
+    number, identifier, operators, keywords = TokenType.NUMBER, TokenType.IDENTIFIER, _OPERATORS, _KEYWORDS
+    new_token = tuple.__new__  # Skips the argument handling of Token.__new__
+    infinity = math.inf
+    for match in _TOKEN_PATTERN.finditer(expression):
+        group = match.lastindex
+        if group == 1:
+            yield new_token(Token, (operators[match.group(1)], match.group(1), match.start(1)))
+        elif group == 3:
+            text = match.group(3)
+            if '_' in text:
+                text = text.replace('_', '')
+            value = convert(text)
+            if value == infinity:
+                raise _literal_overflow(match.group(3), match.start(3))
+            yield new_token(Token, (number, value, match.start(3)))
+        elif group == 4:
+            text = match.group(4)
+            yield new_token(Token, (keywords.get(text, identifier), text, match.start(4)))
+        elif group == 2:
+            yield new_token(Token, (number, convert(int(match.group(2), 16)), match.start(2)))
+
+
+def _literal_overflow(text: str, position: int) -> 'ExpressionSyntaxError':
+    """Creates the error of a number literal which converts to infinity"""
+    return ExpressionSyntaxError(f'Number {text} is too large to represent', position)
+
+
+_TOKEN_TYPES = sorted(TokenType, key=lambda token_type: token_type.value)
+
+
+class TokenBuffer:
+    """The Tokens of an expression stored compactly, as an array of TokenType values and arrays of the start and end
+    offsets of the text of each Token in the expression, so a Token takes 9 bytes instead of a Token object with its
+    text or number. Token objects are only created when the buffer is iterated by tokens(), and numbers are converted
+    then, so the buffer can be parsed with any backend by Calculator.compile()."""
+    __slots__ = ('__expression', '__types', '__starts', '__ends')
+
+    def __init__(self, expression: str):
+        """Initializes fields and tokenizes the expression like tokenize()
+
+        :param expression: The expression to tokenize
+        """
+        offset_type = 'I' if len(expression) < 2 ** 32 else 'Q'
+        self.__expression = expression
+        self.__types = array('b')
+        self.__starts = array(offset_type)
+        self.__ends = array(offset_type)
+        append_type, append_start, append_end = self.__types.append, self.__starts.append, self.__ends.append
+        number, identifier, operators, keywords = TokenType.NUMBER.value, TokenType.IDENTIFIER, _OPERATORS, _KEYWORDS
+        for match in _TOKEN_PATTERN.finditer(expression):
+            group = match.lastindex
+            if group is None:
+                continue
+            elif group == 1:
+                append_type(operators[match.group(1)].value)
+            elif group == 4:
+                append_type(keywords.get(match.group(4), identifier).value)
+            else:
+                append_type(number)
+            start, end = match.span(group)
+            append_start(start)
+            append_end(end)
+
+    def __len__(self):
+        """Returns the number of Tokens"""
+        return len(self.__types)
+
+    def __repr__(self):
+        """Returns a string representation of the buffer"""
+        return f'TokenBuffer({len(self.__types)} tokens)'
+
+    @property
+    def expression(self) -> str:
+        """The expression the Tokens were extracted from"""
+        return self.__expression
+
+    @property
+    def types(self) -> memoryview:
+        """A read-only view of the TokenType values of the Tokens, which can be scanned without creating Tokens"""
+        return memoryview(self.__types).toreadonly()
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes taken by the arrays of the buffer"""
+        return sum(len(values) * values.itemsize for values in (self.__types, self.__starts, self.__ends))
+
+    def text(self, index: int) -> str:
+        """Returns the text of the Token at the index"""
+        return self.__expression[self.__starts[index]:self.__ends[index]]
+
+    def token(self, index: int, convert: Callable = float) -> Token:
+        """Creates the Token at the index, converting numbers like tokenize()"""
+        token_type = _TOKEN_TYPES[self.__types[index]]
+        text = self.__expression[self.__starts[index]:self.__ends[index]]
+        return Token(token_type, self.__value(token_type, text, convert, self.__starts[index]), self.__starts[index])
+
+    def tokens(self, convert: Callable = float) -> Iterator:
+        """Lazily creates the Tokens of the expression, like tokenize()
+
+        :param convert: Converts the text of a number without underscores, or the int value of a hexadecimal number,
+        into the value of its Token. Defaults to float
+        :raises ExpressionSyntaxError if a number converts to infinity
+        :returns An iterator of the Tokens in the expression
+        """
+        expression, token_types, value, new_token = self.__expression, _TOKEN_TYPES, self.__value, tuple.__new__
+        for type_value, start, end in zip(self.__types, self.__starts, self.__ends):
+            token_type = token_types[type_value]
+            yield new_token(Token, (token_type, value(token_type, expression[start:end], convert, start), start))
+
+    @staticmethod
+    def __value(token_type: TokenType, text: str, convert: Callable, position: int) -> str or float:
+        """Returns the value of a Token with the text: the converted number of a NUMBER, and the text otherwise
+
+        :raises ExpressionSyntaxError if a number converts to infinity
+        """
+        if token_type is not TokenType.NUMBER:
+            return text
+        elif text[1:2] in ('x', 'X'):
+            return convert(int(text, 16))
+        value = convert(text.replace('_', '') if '_' in text else text)
+        if value == math.inf:
+            raise _literal_overflow(text, position)
+        return value
+
+
+def _check_real(a, b):
+    """Checks that two compared numbers are real
+
+    :raises NonRealResultError if either is a complex number, like a fractional power of a negative number
+    """
+    if isinstance(a, complex) or isinstance(b, complex):
+        raise NonRealResultError(f"Can't compare {a} and {b}, which are not both real numbers") from None
+
+
 class Operations:
-    """Operations the calculator can do."""
+    """Operations the calculator can do. Comparisons raise NonRealResultError for complex numbers."""
     @staticmethod
     def add(a, b): return a + b
 
@@ -48,197 +285,1500 @@ class Operations:
     @staticmethod
     def divide(a, b):
         if b == 0:
-            raise ZeroDivisionError("Can't divide by zero, exiting..")
+            raise DivisionByZeroError("Can't divide by zero")
         else:
             return a / b
 
     @staticmethod
-    def exponentiation(a, b): return a ** b
+    def exponentiation(a, b):
+        try:
+            return a ** b
+        except ZeroDivisionError:
+            raise DivisionByZeroError("Can't raise zero to a negative power") from None
 
     @staticmethod
     def negate(value): return -value
 
+    @staticmethod
+    def less(a, b):
+        try:
+            return a < b
+        except TypeError:
+            _check_real(a, b)
+            raise
+
+    @staticmethod
+    def less_equal(a, b):
+        try:
+            return a <= b
+        except TypeError:
+            _check_real(a, b)
+            raise
+
+    @staticmethod
+    def greater(a, b):
+        try:
+            return a > b
+        except TypeError:
+            _check_real(a, b)
+            raise
+
+    @staticmethod
+    def greater_equal(a, b):
+        try:
+            return a >= b
+        except TypeError:
+            _check_real(a, b)
+            raise
+
+    @staticmethod
+    def equal(a, b):
+        if type(a) is complex or type(b) is complex:
+            _check_real(a, b)
+        return a == b
+
+    @staticmethod
+    def not_equal(a, b):
+        if type(a) is complex or type(b) is complex:
+            _check_real(a, b)
+        return a != b
+
+    @staticmethod
+    def logical_not(value):
+        if type(value) is complex:
+            _check_real(value, 0)
+        return value == 0
+
+    @staticmethod
+    def call(function, arguments): return function.call(arguments)
+
+
+class IntegerOperations(Operations):
+    """Operations of the integer backend, which keep the quotient of two ints an int where the division is exact"""
+    @staticmethod
+    def divide(a, b):
+        if b == 0:
+            raise DivisionByZeroError("Can't divide by zero")
+        elif type(a) is int and type(b) is int and a % b == 0:
+            return a // b
+        else:
+            return a / b
+
+
+class Function(namedtuple('Function', ('name', 'function', 'min_arity', 'max_arity', 'pure'),
+                          defaults=(1, 1, True))):
+    """A function which can be called in expressions, with the range of the number of arguments it takes. Pure
+    functions always return the same value for the same arguments, so calls on numbers can be folded and their
+    results cached."""
+    __slots__ = ()
+    name: str
+    function: Callable
+    min_arity: int
+    max_arity: int or None
+    pure: bool
+
+    def call(self, arguments: Sequence):
+        """Calls the function on the values of its arguments
+
+        :raises FunctionCallError if the function rejects the arguments
+        :returns The value returned by the function
+        """
+        try:
+            return self.function(*arguments)
+        except (TypeError, ValueError) as e:
+            raise FunctionCallError(f'Invalid arguments for {self.name}(): {e}') from None
+
+
+class FunctionRegistry:
+    """Maps names to the Functions which can be called in expressions. Calls are resolved to their Function when an
+    expression is compiled, so compiled expressions keep the function they were compiled with."""
+    __functions: dict
+
+    def __init__(self, functions: Iterable = ()):
+        """Initializes fields
+
+        :param functions: The Functions to register
+        """
+        self.__functions = {function.name: function for function in functions}
+
+    def __contains__(self, name: str):
+        """Returns whether a function is registered with the name"""
+        return name in self.__functions
+
+    def __iter__(self):
+        """Returns an iterator of the registered Functions"""
+        return iter(self.__functions.values())
+
+    def get(self, name: str) -> Function or None:
+        """Returns the Function registered with the name, or None if there is none"""
+        return self.__functions.get(name)
+
+    def register(self, name: str, function: Callable, min_arity=1, max_arity=1, pure=True) -> Function:
+        """Registers a function, replacing any function registered with the same name
+
+        :param name: The name the function is called by in expressions
+        :param function: The callable, which is called with the values of the arguments
+        :param min_arity: The minimum number of arguments
+        :param max_arity: The maximum number of arguments, or None for any number
+        :param pure: Whether the function always returns the same value for the same arguments
+        :raises ValueError if the name is not an identifier or the arities are invalid
+        :returns The registered Function
+        """
+        if not name.isidentifier():
+            raise ValueError(f'Expected an identifier as the name of the function, got {name!r}')
+        if min_arity < 1 or max_arity is not None and max_arity < min_arity:
+            raise ValueError(f'Expected 1 <= min_arity <= max_arity, got {min_arity} and {max_arity}')
+        self.__functions[name] = Function(name, function, min_arity, max_arity, pure)
+        return self.__functions[name]
+
+    def copy(self) -> 'FunctionRegistry':
+        """Returns a registry with the same Functions, which can be extended without changing this one"""
+        return FunctionRegistry(self.__functions.values())
+
+
+def _round(value, digits=0):
+    """Rounds a value to a number of decimals, which may be given as a float"""
+    return round(value, int(digits))
+
+
+FUNCTIONS = FunctionRegistry([
+    Function('abs', abs),
+    Function('min', min, 2, None),
+    Function('max', max, 2, None),
+    Function('round', _round, 1, 2),
+    Function('floor', math.floor),
+    Function('ceil', math.ceil),
+    Function('sqrt', math.sqrt),
+    Function('exp', math.exp),
+    Function('log', math.log, 1, 2),
+    Function('log2', math.log2),
+    Function('log10', math.log10),
+    Function('sin', math.sin),
+    Function('cos', math.cos),
+    Function('tan', math.tan),
+    Function('asin', math.asin),
+    Function('acos', math.acos),
+    Function('atan', math.atan),
+    Function('atan2', math.atan2, 2, 2),
+    Function('hypot', math.hypot, 1, None),
+    Function('degrees', math.degrees),
+    Function('radians', math.radians),
+])
+
+
+def register_function(name: str, function: Callable, min_arity=1, max_arity=1, pure=True) -> Function:
+    """Registers a function in the default registry FUNCTIONS, see FunctionRegistry.register()
+
+    :returns The registered Function
+    """
+    return FUNCTIONS.register(name, function, min_arity, max_arity, pure)
+
+
+class OpCode(Enum):
+    """Defines the instructions of a compiled expression program"""
+    PUSH = 0
+    UNARY = 1
+    BINARY = 2
+    LOAD = 3
+    CALL = 4
+    JUMP = 5
+    JUMP_IF_FALSE = 6
+    JUMP_IF_FALSE_OR_POP = 7
+    JUMP_IF_TRUE_OR_POP = 8
+    STORE = 9
+    RECALL = 10
+
+
+# The nodes of an expression tree are collections.namedtuples like Token, since importing dataclasses takes longer
+# than a single calculation
+class Number(namedtuple('Number', ('value',))):
+    """A number in a parsed expression tree"""
+    __slots__ = ()
+    value: float
+
+
+class Variable(namedtuple('Variable', ('name',))):
+    """A variable in a parsed expression tree, bound to a value on evaluation"""
+    __slots__ = ()
+    name: str
+
+
+class UnaryOperation(namedtuple('UnaryOperation', ('operation', 'operand'))):
+    """An operation on a single operand in a parsed expression tree"""
+    __slots__ = ()
+    operation: Callable
+    operand: 'Node'
+
+
+class BinaryOperation(namedtuple('BinaryOperation', ('operation', 'left', 'right'))):
+    """An operation on two operands in a parsed expression tree"""
+    __slots__ = ()
+    operation: Callable
+    left: 'Node'
+    right: 'Node'
+
+
+class FunctionCall(namedtuple('FunctionCall', ('function', 'arguments'))):
+    """A call of a Function on the values of its arguments in a parsed expression tree"""
+    __slots__ = ()
+    function: Function
+    arguments: tuple
+
+
+class BooleanOperation(namedtuple('BooleanOperation', ('operator', 'left', 'right'))):
+    """A short-circuiting 'and' or 'or' operation in a parsed expression tree. Like in Python, the value of the
+    operation is the value of the operand which decides it, and the right operand is only evaluated if needed."""
+    __slots__ = ()
+    operator: str
+    left: 'Node'
+    right: 'Node'
+
+
+class Conditional(namedtuple('Conditional', ('condition', 'if_true', 'if_false'))):
+    """A conditional in a parsed expression tree, of which only the branch taken is evaluated"""
+    __slots__ = ()
+    condition: 'Node'
+    if_true: 'Node'
+    if_false: 'Node'
+
+
+# The classes of the nodes of an expression tree, as a tuple isinstance() accepts
+Node = (Number, Variable, UnaryOperation, BinaryOperation, FunctionCall, BooleanOperation, Conditional)
+
+
+class CompiledExpression:
+    """An expression parsed once into an immutable postfix program, which can be evaluated many times
+    without tokenizing or parsing the expression again. Subtrees shared by several nodes of the tree, like those of
+    optimizer.share_subtrees(), are calculated once per evaluation and recalled where they occur again."""
+    __slots__ = ('__expression', '__tree', '__backend', '__program', '__variables', '__pure', '__slot_count')
+
+    def __init__(self, expression: str, tree: Node, backend=None, variables=()):
+        """Initializes fields and flattens the parsed expression tree into a postfix program
+
+        :param backend: The NumericBackend the numbers of the tree were converted with, whose Operations the program
+        executes. Defaults to FLOAT_BACKEND
+        :param variables: The names of the first variables, in the order positional values are bound to them. They
+        are kept even if the tree does not use them, like when it was simplified. The other variables of the tree
+        follow in order of first appearance
+        """
+        self.__expression = expression
+        self.__tree = tree
+        self.__backend = backend if backend is not None else FLOAT_BACKEND
+        self.__program, self.__variables, self.__slot_count = self.__flatten(tree, self.__backend.operations,
+                                                                             variables)
+        self.__pure = all(argument[0].pure for opcode, argument in self.__program if opcode is OpCode.CALL)
+
+    def __repr__(self):
+        """Returns a string representation of the compiled expression"""
+        return f'CompiledExpression({self.__expression!r})'
+
+    @property
+    def expression(self) -> str:
+        """The expression the program was compiled from"""
+        return self.__expression
+
+    @property
+    def tree(self) -> Node:
+        """The parsed expression tree"""
+        return self.__tree
+
+    @property
+    def backend(self) -> 'NumericBackend':
+        """The numeric backend the expression is evaluated with"""
+        return self.__backend
+
+    @property
+    def program(self) -> tuple:
+        """The postfix program as a tuple of (OpCode, argument) instructions"""
+        return self.__program
+
+    @property
+    def variables(self) -> tuple:
+        """The names of the variables in the expression, in the order positional values are bound to them"""
+        return self.__variables
+
+    @property
+    def pure(self) -> bool:
+        """Whether the expression only calls pure functions, so its value only depends on its variables"""
+        return self.__pure
+
+    @property
+    def slot_count(self) -> int:
+        """The number of shared subtrees whose values the program stores to recall them"""
+        return self.__slot_count
+
+    def evaluate(self, variables: Mapping or Sequence = ()) -> float or int:
+        """Evaluates the program with the variables bound to the given values
+
+        :param variables: A mapping of variable names to values, or a sequence of values in the order of
+        the variables property
+        :raises UnboundVariableError if a variable has no value bound to it
+        :raises ValueError if a sequence of values does not match the number of variables
+        :raises DivisionByZeroError if the expression divides by zero
+        :raises NonRealResultError if the expression evaluates to a complex number
+        :raises OverflowError if a result is too large to represent
+        :returns The value of the expression, normalized by the backend
+        """
+        backend = self.__backend
+        if backend.context is None:
+            return backend.normalize(self._execute(self._bind(variables)))
+        with backend.evaluating():
+            return backend.normalize(self._execute(self._bind(variables)))
+
+    def _bind(self, variables: Mapping or Sequence) -> Sequence:
+        """Orders the values of the variables by their position in the program
+
+        :raises UnboundVariableError if a variable has no value bound to it
+        :raises ValueError if a sequence of values does not match the number of variables
+        :returns The values of the variables, indexed by the LOAD instructions of the program
+        """
+        if isinstance(variables, Mapping):
+            try:
+                return [variables[name] for name in self.__variables]
+            except KeyError as e:
+                raise UnboundVariableError(f'No value bound for variable {e}') from None
+        elif len(variables) != len(self.__variables):
+            raise ValueError(f'Expected {len(self.__variables)} values for the variables {self.__variables}, '
+                             f'got {len(variables)}')
+        else:
+            return variables
+
+    def _execute(self, values: Sequence = ()) -> float:
+        """Executes the postfix program on a value stack. Jumps only go forward, so they skip instructions of the
+        program iterator instead of indexing the program. The values of shared subtrees are stored in slots.
+
+        :param values: The values of the variables, indexed by the LOAD instructions of the program
+        :returns The raw value left on the stack by the program
+        """
+        push, load, binary, unary, call = OpCode.PUSH, OpCode.LOAD, OpCode.BINARY, OpCode.UNARY, OpCode.CALL
+        call_function = self.__backend.operations.call
+        stack = []
+        slots = [None] * self.__slot_count
+        instructions = iter(self.__program)
+        for opcode, argument in instructions:
+            if opcode is push:
+                stack.append(argument)
+            elif opcode is load:
+                stack.append(values[argument])
+            elif opcode is binary:
+                right = stack.pop()
+                stack[-1] = argument(stack[-1], right)
+            elif opcode is unary:
+                stack[-1] = argument(stack[-1])
+            elif opcode is call:
+                function, count = argument
+                arguments = stack[-count:]
+                del stack[-count:]
+                stack.append(call_function(function, arguments))
+            elif opcode is OpCode.RECALL:
+                stack.append(slots[argument])
+            elif opcode is OpCode.STORE:
+                slots[argument] = stack[-1]
+            elif opcode is OpCode.JUMP_IF_FALSE:
+                if not stack.pop():
+                    next(islice(instructions, argument, argument), None)
+            elif opcode is OpCode.JUMP:
+                next(islice(instructions, argument, argument), None)
+            elif opcode is OpCode.JUMP_IF_FALSE_OR_POP:
+                if stack[-1]:
+                    stack.pop()
+                else:
+                    next(islice(instructions, argument, argument), None)
+            elif stack[-1]:
+                next(islice(instructions, argument, argument), None)
+            else:
+                stack.pop()
+        return stack[-1]
+
+    @staticmethod
+    def __flatten(tree: Node, operations: type, variables: tuple) -> tuple:
+        """Flattens an expression tree into postfix order using an explicit stack, so the depth of the tree is
+        not limited by recursion, and numbers the variables which are not given by first appearance. Conditionals
+        and boolean operations emit jumps over the instructions of the operands they may skip, which are patched with
+        the number of instructions to skip once those are emitted.
+
+        Operations and calls which are operands of more than one node are followed by a STORE of their value into a
+        slot. Where they occur again, a RECALL of the slot replaces their instructions if the STORE is certain to
+        have been executed, which it is unless it was emitted in an operand the occurrence is not skipped with.
+        Each operand which may be skipped is a branch of the branch it is in, so branches are tuples of the numbers
+        of the operands which may be skipped, and a STORE is certain if its branch is a prefix of the occurrence's.
+
+        :param operations: The Operations class whose operations replace those of the tree
+        :param variables: The names of the first variables, in order
+        :returns The program as a tuple of (OpCode, argument) instructions, the names of the variables, and the
+        number of slots
+        """
+        slots = CompiledExpression.__shared_slots(tree)
+        stored = {}
+        program = []
+        variables = {name: index for index, name in enumerate(variables)}
+        branches = 0
+        pending = [(tree, False, ())]
+        while pending:
+            node, operands_emitted, branch = pending.pop()
+            if node is None:
+                # operands_emitted is the index of a jump, which skips the instructions emitted after it
+                program[operands_emitted] = (program[operands_emitted][0], len(program) - operands_emitted - 1)
+                continue
+            elif node is OpCode.STORE:
+                # operands_emitted is the slot of a shared node whose instructions have been emitted
+                program.append((OpCode.STORE, operands_emitted))
+                stored.setdefault(operands_emitted, []).append(branch)
+                continue
+            elif isinstance(node, Number):
+                program.append((OpCode.PUSH, node.value))
+                continue
+            elif isinstance(node, Variable):
+                program.append((OpCode.LOAD, variables.setdefault(node.name, len(variables))))
+                continue
+            elif operands_emitted is False and id(node) in slots:
+                slot = slots[id(node)]
+                if any(branch[:len(stored_branch)] == stored_branch for stored_branch in stored.get(slot, ())):
+                    program.append((OpCode.RECALL, slot))
+                    continue
+                pending.append((OpCode.STORE, slot, branch))
+
+            if isinstance(node, FunctionCall):
+                if operands_emitted:
+                    program.append((OpCode.CALL, (node.function, len(node.arguments))))
+                else:
+                    pending.append((node, True, branch))
+                    pending.extend((argument, False, branch) for argument in reversed(node.arguments))
+            elif isinstance(node, Conditional):
+                if operands_emitted is False:
+                    pending.extend(((node, True, branch), (node.condition, False, branch)))
+                elif operands_emitted is True:
+                    branches += 1
+                    pending.extend(((node, len(program), branch), (node.if_true, False, branch + (branches,))))
+                    program.append((OpCode.JUMP_IF_FALSE, 0))
+                else:
+                    # operands_emitted is the index of the jump over the true branch, which also skips this jump
+                    branches += 1
+                    pending.extend(((None, len(program), branch), (node.if_false, False, branch + (branches,))))
+                    program.append((OpCode.JUMP, 0))
+                    program[operands_emitted] = (OpCode.JUMP_IF_FALSE, len(program) - operands_emitted - 1)
+            elif isinstance(node, BooleanOperation):
+                if operands_emitted:
+                    branches += 1
+                    pending.extend(((None, len(program), branch), (node.right, False, branch + (branches,))))
+                    program.append((OpCode.JUMP_IF_FALSE_OR_POP if node.operator == 'and'
+                                    else OpCode.JUMP_IF_TRUE_OR_POP, 0))
+                else:
+                    pending.extend(((node, True, branch), (node.left, False, branch)))
+            elif operands_emitted:
+                operation = node.operation
+                if operations is not Operations:
+                    operation = getattr(operations, operation.__name__)
+                program.append((OpCode.UNARY if isinstance(node, UnaryOperation) else OpCode.BINARY, operation))
+            elif isinstance(node, UnaryOperation):
+                pending.extend(((node, True, branch), (node.operand, False, branch)))
+            else:
+                pending.extend(((node, True, branch), (node.right, False, branch), (node.left, False, branch)))
+        return tuple(program), tuple(variables), len(slots)
+
+    @staticmethod
+    def __shared_slots(tree: Node) -> dict:
+        """Finds the operations and calls which are operands of more than one node of the tree
+
+        :returns A mapping of the ids of those nodes to the numbers of their slots
+        """
+        seen = set()
+        slots = {}
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, (Number, Variable)):
+                continue
+            elif id(node) in seen:
+                slots.setdefault(id(node), len(slots))
+                continue
+            seen.add(id(node))
+            if isinstance(node, UnaryOperation):
+                pending.append(node.operand)
+            elif isinstance(node, (BinaryOperation, BooleanOperation)):
+                pending.extend((node.left, node.right))
+            elif isinstance(node, FunctionCall):
+                pending.extend(node.arguments)
+            else:
+                pending.extend((node.condition, node.if_true, node.if_false))
+        return slots
+
+
+_COMPARISONS = {
+    TokenType.LESS: Operations.less,
+    TokenType.LESS_EQUAL: Operations.less_equal,
+    TokenType.GREATER: Operations.greater,
+    TokenType.GREATER_EQUAL: Operations.greater_equal,
+    TokenType.EQUAL: Operations.equal,
+    TokenType.NOT_EQUAL: Operations.not_equal,
+}
+# The Tokens which can follow a sum in a comparison or boolean operation
+_LOGICAL_OPERATORS = frozenset((TokenType.AND, TokenType.OR, *_COMPARISONS))
+_BINARY_OPERATORS = {
+    TokenType.OR: (1, False, 2, 'or'),
+    TokenType.AND: (2, False, 2, 'and'),
+    **{token_type: (4, False, 2, operation) for token_type, operation in _COMPARISONS.items()},
+    TokenType.PLUS: (5, False, 2, Operations.add),
+    TokenType.MINUS: (5, False, 2, Operations.subtract),
+    TokenType.MULTIPLY: (6, False, 2, Operations.multiply),
+    TokenType.DIVIDE: (6, False, 2, Operations.divide),
+    TokenType.EXPONENT: (8, True, 2, Operations.exponentiation),
+}
+_INVERSION = (3, True, 1, Operations.logical_not)
+_NEGATION = (7, True, 1, Operations.negate)
+
+
+def _normalize_result(result: float) -> float or int:
+    """Converts a result without decimals to an int
+
+    :raises NonRealResultError if the result is a complex number
+    :returns The result as an int if it has no decimals, else the result unchanged
+    """
+    if isinstance(result, complex):
+        raise NonRealResultError(f'The result {result} is not a real number')
+    elif result % 1 == 0:
+        return int(result)
+    else:
+        return result
+
+
+def _normalize_integer_result(result: int or float) -> int or float:
+    """Keeps an int result exact, and normalizes a float result with _normalize_result()"""
+    if type(result) is int:
+        return result
+    else:
+        return _normalize_result(result)
+
+
+def _normalize_exact_result(result):
+    """Keeps an exact result unchanged, converting the result of a comparison to an int
+
+    :raises NonRealResultError if the result is a complex number
+    :returns The result
+    """
+    if isinstance(result, complex):
+        raise NonRealResultError(f'The result {result} is not a real number')
+    elif type(result) is bool:
+        return int(result)
+    else:
+        return result
+
+
+class NumericBackend(namedtuple('NumericBackend', ('name', 'convert', 'operations', 'normalize', 'context'),
+                                defaults=(Operations, _normalize_result, None))):
+    """Defines the type numbers are calculated with: the conversion of number literals when an expression is
+    compiled, the Operations class the compiled program executes, the normalization of results, and an optional
+    decimal.Context the program is evaluated in"""
+    __slots__ = ()
+    name: str
+    convert: Callable
+    operations: type
+    normalize: Callable
+    context: object
+
+    def evaluating(self):
+        """Returns a context manager which sets the decimal context of the backend, if it has one"""
+        if self.context is None:
+            return nullcontext()
+        from decimal import localcontext
+        return localcontext(self.context)
+
+
+def _convert_integer(literal: str or int) -> int or float:
+    """Converts an integer literal to an exact int, and a decimal or scientific literal to float"""
+    try:
+        return int(literal)
+    except ValueError:
+        return float(literal)
+
+
+FLOAT_BACKEND = NumericBackend('float', float)
+INTEGER_BACKEND = NumericBackend('integer', _convert_integer, IntegerOperations, _normalize_integer_result)
+
+
+_EXACT_OPERATIONS = {}
+
+
+def _exact_operations(convert: Callable) -> type:
+    """Creates a subclass of Operations for a backend of exact numbers, whose function calls convert float results
+    with convert, since the math functions return floats which do not calculate with exact numbers, and whose
+    fractional powers of negative numbers raise NonRealResultError and negative powers of zero raise
+    DivisionByZeroError, instead of an error or infinity of the number type
+
+    :returns The subclass, which is created once for each conversion
+    """
+    if convert in _EXACT_OPERATIONS:
+        return _EXACT_OPERATIONS[convert]
+
+    def exponentiation(a, b):
+        if a < 0 and b % 1 != 0:
+            raise NonRealResultError(f'The result {a} ^ {b} is not a real number')
+        elif a == 0 and b < 0:
+            raise DivisionByZeroError("Can't raise zero to a negative power")
+        return a ** b
+
+    def call(function, arguments):
+        result = function.call(arguments)
+        return convert(result) if type(result) is float else result
+
+    exact = _EXACT_OPERATIONS[convert] = type(f'Exact{convert.__name__}Operations', (Operations,), {
+        'exponentiation': staticmethod(exponentiation), 'call': staticmethod(call)})
+    return exact
+
+
+def decimal_backend(context=None) -> NumericBackend:
+    """Creates a backend calculating with decimal.Decimal numbers, which are exact for decimal fractions and
+    rounded to the precision of the context. The float results of functions are converted to Decimal.
+
+    :param context: The decimal.Context to evaluate in. Defaults to a copy of the current context
+    :returns The backend
+    """
+    from decimal import Decimal, getcontext
+    return NumericBackend('decimal', Decimal, _exact_operations(Decimal), _normalize_exact_result,
+                          context if context is not None else getcontext().copy())
+
+
+def fraction_backend() -> NumericBackend:
+    """Creates a backend calculating with exact fractions.Fraction numbers. Fractional powers fall back to float.
+
+    :returns The backend
+    """
+    from fractions import Fraction
+    return NumericBackend('fraction', Fraction, _exact_operations(Fraction), _normalize_exact_result)
+
+
+class Limits(namedtuple('Limits', ('max_length', 'max_tokens', 'max_depth', 'max_operations', 'max_exponent',
+                                   'max_magnitude'), defaults=(None,) * 6)):
+    """Bounds the resources an untrusted expression can use, so a single expression can not stall the calculator.
+    The length, Tokens and nesting are checked while the expression is tokenized, the number of operations when it
+    is compiled, and the exponents and magnitudes of results while it is evaluated, before a power is computed. Each
+    limit is disabled by None."""
+    __slots__ = ()
+    max_length: int or None
+    max_tokens: int or None
+    max_depth: int or None
+    max_operations: int or None
+    max_exponent: float or None
+    max_magnitude: float or None
+
+    def check_length(self, expression: str):
+        """Checks the length of an expression before it is tokenized
+
+        :raises LimitExceededError if the expression is longer than max_length
+        """
+        if self.max_length is not None and len(expression) > self.max_length:
+            raise LimitExceededError(f'Expected an expression of at most {self.max_length} characters, '
+                                     f'got {len(expression)}')
+
+    def guard_tokens(self, tokens: Iterator) -> Iterator:
+        """Passes the Tokens of an expression on, counting them and the depth of nested parenthesis
+
+        :raises LimitExceededError if there are more than max_tokens Tokens, or parenthesis nest deeper than max_depth
+        :returns An iterator of the Tokens
+        """
+        if self.max_tokens is None and self.max_depth is None:
+            return tokens
+        return self.__guard_tokens(tokens)
+
+    def __guard_tokens(self, tokens: Iterator) -> Iterator:
+        """Generates the Tokens of guard_tokens()"""
+        max_tokens = self.max_tokens if self.max_tokens is not None else float('inf')
+        max_depth = self.max_depth if self.max_depth is not None else float('inf')
+        left, right = TokenType.LEFT_PARENTHESIS, TokenType.RIGHT_PARENTHESIS
+        depth = 0
+        for count, token in enumerate(tokens, 1):
+            if count > max_tokens:
+                raise LimitExceededError(f'Expected an expression of at most {max_tokens} tokens', token.position)
+            if token.type is left:
+                depth += 1
+                if depth > max_depth:
+                    raise LimitExceededError(f'Expected parenthesis nested at most {max_depth} deep', token.position)
+            elif token.type is right:
+                depth -= 1
+            yield token
+
+    def check_program(self, program: tuple):
+        """Checks the number of operations and the numbers of a compiled program. Programs only jump forward, so this
+        bounds the number of operations of every evaluation.
+
+        :raises LimitExceededError if the program has more than max_operations operations and function calls, or a
+        number above max_magnitude
+        """
+        if self.max_operations is not None:
+            operations = sum(1 for opcode, _ in program if opcode is OpCode.BINARY or opcode is OpCode.UNARY
+                             or opcode is OpCode.CALL)
+            if operations > self.max_operations:
+                raise LimitExceededError(f'Expected an expression of at most {self.max_operations} operations, '
+                                         f'got {operations}')
+        if self.max_magnitude is not None:
+            for opcode, argument in program:
+                if opcode is OpCode.PUSH and not abs(argument) <= self.max_magnitude:
+                    raise LimitExceededError(f'Expected numbers of at most {self.max_magnitude:g} in magnitude')
+
+    def guard_backend(self, backend: 'NumericBackend') -> 'NumericBackend':
+        """Returns a copy of the backend whose arithmetic operations and function calls check max_exponent and
+        max_magnitude, and whose normalization checks max_magnitude for results like the values of variables, or the
+        backend itself if neither limit is set"""
+        if self.max_exponent is None and self.max_magnitude is None:
+            return backend
+        operations = _limited_operations(backend.operations, self.max_exponent, self.max_magnitude)
+        if self.max_magnitude is None:
+            return backend._replace(operations=operations)
+        return backend._replace(operations=operations, normalize=_limited_normalize(backend.normalize,
+                                                                                   self.max_magnitude))
+
+
+UNTRUSTED_LIMITS = Limits(max_length=10_000, max_tokens=5_000, max_depth=100, max_operations=2_500,
+                          max_exponent=10_000, max_magnitude=1e308)
+_LIMITED_OPERATIONS = {}
+_LIMITED_NORMALIZE = {}
+
+
+def _check_magnitude(result, max_magnitude):
+    """Checks the magnitude of a result, which is not a number within any limit if it is NaN
+
+    :raises LimitExceededError if the result is above max_magnitude in magnitude, or NaN
+    :returns The result
+    """
+    if not abs(result) <= max_magnitude:
+        raise LimitExceededError(f'Expected results of at most {max_magnitude:g} in magnitude')
+    return result
+
+
+def _limited_operations(operations: type, max_exponent, max_magnitude) -> type:
+    """Creates a subclass of an Operations class whose arithmetic operations raise LimitExceededError for exponents
+    above max_exponent, and results above max_magnitude. The magnitude of a power is estimated from the logarithm of
+    its base before it is computed, since computing an exact power like 9^9^9 takes minutes.
+
+    :returns The subclass, which is created once for each class and limits
+    """
+    key = (operations, max_exponent, max_magnitude)
+    if key in _LIMITED_OPERATIONS:
+        return _LIMITED_OPERATIONS[key]
+    max_digits = math.log10(max_magnitude) if max_magnitude is not None else None
+
+    def check(result):
+        return _check_magnitude(result, max_magnitude) if max_magnitude is not None else result
+
+    def exponentiation(a, b):
+        if max_exponent is not None and abs(b) > max_exponent:
+            raise LimitExceededError(f'Expected exponents of at most {max_exponent:g} in magnitude')
+        real = getattr(b, 'real', b)
+        try:
+            exponent = float(real)
+        except OverflowError:
+            exponent = math.inf if real > 0 else -math.inf
+        if max_digits is not None and exponent > 1 and abs(a) > 1 and exponent * math.log10(abs(a)) > max_digits:
+            raise LimitExceededError(f'Expected results of at most {max_magnitude:g} in magnitude')
+        return check(operations.exponentiation(a, b))
+
+    def guard(operation):
+        return staticmethod(lambda *operands: check(operation(*operands)))
+
+    methods = {name: guard(getattr(operations, name))
+               for name in ('add', 'subtract', 'multiply', 'divide', 'negate', 'call')}
+    methods['exponentiation'] = staticmethod(exponentiation)
+    limited = _LIMITED_OPERATIONS[key] = type(f'Limited{operations.__name__}', (operations,), methods)
+    return limited
+
+
+def _limited_normalize(normalize: Callable, max_magnitude) -> Callable:
+    """Creates a normalization of results which raises LimitExceededError for results above max_magnitude before
+    normalizing them
+
+    :returns The normalization, which is created once for each normalization and limit
+    """
+    key = (normalize, max_magnitude)
+    if key not in _LIMITED_NORMALIZE:
+        _LIMITED_NORMALIZE[key] = lambda result: normalize(_check_magnitude(result, max_magnitude))
+    return _LIMITED_NORMALIZE[key]
+
 
 class Calculator:
     """Calculates a mathematical expression via the calculate method"""
     __calculation: str
+    __iterative: bool
+    __cache: object
+    __backend: NumericBackend
+    __functions: FunctionRegistry
+    __profiler: object
+    __limits: Limits or None
     __tokens: Iterator or None
     __current_token: Token or None
+    __end: Token
 
-    def __init__(self, calculation):
-        """Initializes fields including the calculation to be calculated"""
+    def __init__(self, calculation, iterative=False, cache=None, backend=None, functions=None, profiler=None,
+                 limits=None):
+        """Initializes fields including the calculation to be calculated
+
+        :param iterative: Whether to parse with _parse_iteratively() instead of the recursive _parse_* methods,
+        which removes the recursion limit on the nesting of parenthesis and unary operators
+        :param cache: An optional cache.ExpressionCache which calculate() looks results up in
+        :param backend: The NumericBackend to calculate with. Defaults to FLOAT_BACKEND
+        :param functions: The FunctionRegistry function calls are resolved in. Defaults to FUNCTIONS
+        :param profiler: An optional profiling.Profiler which records the stages of compile() and calculate(). With a
+        cache, only the evaluations which miss the cache are recorded
+        :param limits: Optional Limits on the resources the calculation can use
+        """
         self.__calculation = calculation
+        self.__iterative = iterative
+        self.__cache = cache
+        self.__backend = backend if backend is not None else FLOAT_BACKEND
+        self.__functions = functions if functions is not None else FUNCTIONS
+        self.__profiler = profiler
+        self.__limits = limits
         self.__current_token = None
         self.__tokens = None
+        self.__end = Token(TokenType.END, '', len(calculation))
 
     def calculate(self) -> float or int:
-        """Calculates the expression in __calculation using helper methods and handles errors
+        """Calculates the expression in __calculation using helper methods. If a cache was given, the compiled
+        expression is looked up in it, and the result too unless the expression calls impure functions.
 
+        :raises ExpressionSyntaxError if __calculation is not a valid expression
+        :raises UnboundVariableError if __calculation contains variables
+        :raises DivisionByZeroError if __calculation divides by zero
+        :raises NonRealResultError if __calculation evaluates to a complex number
+        :raises FunctionCallError if a function rejects its arguments
+        :raises OverflowError if a result is too large to represent
+        :raises LimitExceededError if __calculation exceeds the limits
         :returns The value of the __calculation
         """
-        self.__tokens = iter(self.__tokenize_calculation())
+        if self.__cache is None:
+            return self.__evaluate(self.compile())
+        compiled = self.__cache.compile(self.__calculation, self.__iterative, self.__backend, self.__functions,
+                                        self.__limits)
+        if compiled.pure:
+            return self.__cache.result(self.__calculation, lambda: self.__evaluate(compiled), self.__backend,
+                                       self.__functions, self.__limits)
+        else:
+            return self.__evaluate(compiled)
+
+    def __evaluate(self, compiled: CompiledExpression) -> float or int:
+        """Evaluates a compiled expression without variables, recording it in __profiler if there is one
+
+        :returns The value of the compiled expression
+        """
+        if self.__profiler is None:
+            return compiled.evaluate({})
+        return self.__profiler.evaluate(compiled, {})
+
+    def compile(self, tokens: TokenBuffer = None) -> CompiledExpression:
+        """Tokenizes and parses __calculation into a CompiledExpression which can be evaluated many times
+
+        :param tokens: A TokenBuffer of __calculation to parse instead of tokenizing __calculation again
+        :raises ValueError if the TokenBuffer is of another expression
+        :raises ExpressionSyntaxError if __calculation is not a valid expression
+        :raises LimitExceededError if __calculation exceeds the limits
+        :returns The compiled expression
+        """
+        if tokens is None:
+            self.__tokens = tokenize(self.__calculation, self.__backend.convert)
+        elif tokens.expression != self.__calculation:
+            raise ValueError('Expected a TokenBuffer of the expression to compile')
+        else:
+            self.__tokens = tokens.tokens(self.__backend.convert)
+        if self.__limits is not None:
+            self.__limits.check_length(self.__calculation)
+            self.__tokens = self.__limits.guard_tokens(self.__tokens)
+        if self.__profiler is not None:
+            return self.__compile_profiled()
         self.__next_token()
+        return self.__compiled(self.__parse(), self.__backend)
+
+    def __parse(self) -> Node:
+        """Parses the Tokens with _parse_iteratively() or _parse_expression(). With limits, a recursion error of
+        _parse_expression() is raised as a LimitExceededError.
+
+        :returns The expression tree
+        """
+        if self.__iterative:
+            return self._parse_iteratively()
+        elif self.__limits is None:
+            return self._parse_expression()
         try:
-            result = self._calculate_expression()
-            if result % 1 == 0:
-                return int(result)
-            else:
-                return result
-        except ValueError as e:
-            print(f'{e}\nInvalid mathematical expression, exiting..')
-            exit(1)
-        except ZeroDivisionError as e:
-            print(e)
-            exit(1)
+            return self._parse_expression()
+        except RecursionError:
+            raise LimitExceededError('Expected an expression nested shallow enough to parse recursively') from None
+
+    def __compiled(self, tree: Node, backend: 'NumericBackend') -> CompiledExpression:
+        """Creates the compiled expression of a parsed tree, with the backend guarded by the limits if there are any
+
+        :raises LimitExceededError if the program has more operations than the limits allow
+        :returns The compiled expression
+        """
+        if self.__limits is None:
+            return CompiledExpression(self.__calculation, tree, backend)
+        compiled = CompiledExpression(self.__calculation, tree, self.__limits.guard_backend(backend))
+        self.__limits.check_program(compiled.program)
+        return compiled
+
+    def __compile_profiled(self) -> CompiledExpression:
+        """Compiles like compile(), recording the Tokens, the recursion depth of the parser, and the time spent
+        tokenizing, parsing and flattening in __profiler. The program counts the operations it executes in __profiler.
+
+        :returns The compiled expression
+        """
+        profiler = self.__profiler
+        self.__tokens = tokens = profiler.trace(self.__tokens)
+        start = perf_counter()
+        self.__next_token()
+        tree = self.__parse()
+        parsed = perf_counter()
+        compiled = self.__compiled(tree, profiler.counting(self.__backend))
+        profiler.record_compile(tokens, parsed - start, perf_counter() - parsed)
+        return compiled
 
     def __tokenize_calculation(self) -> list:
-        """Strips quotes, whitespace and parses the calculation string into Tokens
+        """Parses the calculation string into a list of Tokens using tokenize()
 
         :returns Tokens extracted from the expression
         """
-        calculation = re.sub('[ "\n\t]', '', self.__calculation)
-        operators = ['+', '-', '*', '/', '^', '(', ')']
-        i = 0
-        tokens = []
-        while i < len(calculation):
-            if calculation[i].isdigit():
-                number = ''
-                while i < len(calculation) and calculation[i].isdigit():
-                    number += calculation[i]
-                    i += 1
-                tokens.append(Token(type=TokenType.NUMBER, value=number))
-            elif calculation[i] in operators:
-                if calculation[i] == operators[0]:
-                    tokens.append(Token(type=TokenType.PLUS, value=calculation[i]))
-                elif calculation[i] == operators[1]:
-                    tokens.append(Token(type=TokenType.MINUS, value=calculation[i]))
-                elif calculation[i] == operators[2]:
-                    tokens.append(Token(type=TokenType.MULTIPLY, value=calculation[i]))
-                elif calculation[i] == operators[3]:
-                    tokens.append(Token(type=TokenType.DIVIDE, value=calculation[i]))
-                elif calculation[i] == operators[4]:
-                    tokens.append(Token(type=TokenType.EXPONENT, value=calculation[i]))
-                elif calculation[i] == operators[5]:
-                    tokens.append(Token(type=TokenType.LEFT_PARENTHESIS, value=calculation[i]))
-                elif calculation[i] == operators[6]:
-                    tokens.append(Token(type=TokenType.RIGHT_PARENTHESIS, value=calculation[i]))
-                i += 1
-            else:
-                i += 1
-
-        return list(tokens)
+        return list(tokenize(self.__calculation, self.__backend.convert))
 
     def __next_token(self):
         """Iterates the __tokens iterator and assigns the token to __current_token"""
-        self.__current_token = next(self.__tokens, Token(TokenType.END, ''))
+        self.__current_token = next(self.__tokens, self.__end)
 
     def _calculate_expression(self, expected_end_of_expression=Token(TokenType.END, '')) -> float:
-        """Identifies and calculates the value of an expression by finding PLUS/MINUS tokens and
-        executing add/subtract operations on its two terms.
+        """Calculates the value of the expression parsed by _parse_expression()
 
         :param expected_end_of_expression: The Token on which the expression is expected to end. Defaults to
         a Token with type END
-        :raises ValueError if the current token is not a PLUS/MINUS or expected_end_of_expression
-        - which means an invalid expression
+        :raises ValueError if the expression is invalid
         :returns The value of the expression
         """
-        term_a = self._calculate_term()
+        return self._evaluate(self._parse_expression(expected_end_of_expression))
+
+    def _calculate_term(self) -> float:
+        """Calculates the value of the term parsed by _parse_term()
+
+        :returns The value of the term
+        """
+        return self._evaluate(self._parse_term())
+
+    def _calculate_factor(self) -> float:
+        """Calculates the value of the factor parsed by _parse_factor()
+
+        :returns The value of the factor
+        """
+        return self._evaluate(self._parse_factor())
+
+    def _calculate_exponentiation(self) -> float:
+        """Calculates the value of the exponentiation parsed by _parse_exponentiation()
+
+        :returns The value of the exponentiation, or the base if no exponentiation exists
+        """
+        return self._evaluate(self._parse_exponentiation())
+
+    def _identify_number(self) -> float:
+        """Identifies and returns the value of a number
+
+        :raises ValueError if the current token is not a number - which means an invalid expression
+        :returns The value of the number
+        """
+        return self._parse_number().value
+
+    def _evaluate(self, tree: Node) -> float:
+        """Evaluates a parsed expression tree
+
+        :raises UnboundVariableError if the tree contains variables, which have no values bound to them
+        :returns The value of the tree
+        """
+        compiled = CompiledExpression(self.__calculation, tree, self.__backend)
+        with self.__backend.evaluating():
+            return compiled._execute(compiled._bind({}))
+
+    def _parse_expression(self, expected_end_of_expression=Token(TokenType.END, '')) -> Node:
+        """Identifies and parses an expression, which is a disjunction parsed by _parse_disjunction() followed by the
+        token expected to end it.
+
+        :param expected_end_of_expression: The Token on which the expression is expected to end. Defaults to
+        a Token with type END
+        :raises ExpressionSyntaxError if the current token is not a PLUS/MINUS or expected_end_of_expression
+        - which means an invalid expression
+        :returns The expression tree
+        """
+        if self.__current_token.type is TokenType.NOT:
+            disjunction = self._parse_disjunction()
+        else:
+            # Most expressions in parenthesis are a term or a sum alone, so they are parsed without the levels of
+            # grammar above them, which would limit the nesting of parenthesis by the recursion limit
+            disjunction = self._parse_term()
+            if self.__current_token.type is TokenType.PLUS or self.__current_token.type is TokenType.MINUS:
+                disjunction = self._parse_sum(disjunction)
+            if self.__current_token.type in _LOGICAL_OPERATORS:
+                disjunction = self._parse_disjunction(disjunction)
+        if self.__current_token.type is not expected_end_of_expression.type:
+            raise ExpressionSyntaxError(f'Expected the end of an expression with a Token of type: '
+                                        f'{expected_end_of_expression.type} but received '
+                                        f'{self.__current_token.type}', self.__current_token.position)
+        else:
+            self.__next_token()
+            return disjunction
+
+    def _parse_disjunction(self, operand: Node = None) -> Node:
+        """Identifies and parses a disjunction by finding OR tokens and
+        building short-circuiting or operations on its two conjunctions.
+
+        :param operand: The first sum of the disjunction, if it has already been parsed
+        :returns The disjunction tree
+        """
+        if operand is None and self.__current_token.type is not TokenType.NOT:
+            operand = self._parse_sum()
+            if self.__current_token.type not in _LOGICAL_OPERATORS:
+                return operand
+        conjunction_a = self._parse_conjunction(operand)
+        while self.__current_token.type == TokenType.OR:
+            self.__next_token()
+            conjunction_b = self._parse_conjunction()
+            conjunction_a = BooleanOperation('or', conjunction_a, conjunction_b)
+        return conjunction_a
+
+    def _parse_conjunction(self, operand: Node = None) -> Node:
+        """Identifies and parses a conjunction by finding AND tokens and
+        building short-circuiting and operations on its two inversions.
+
+        :param operand: The first sum of the conjunction, if it has already been parsed
+        :returns The conjunction tree
+        """
+        inversion_a = self._parse_inversion(operand)
+        while self.__current_token.type == TokenType.AND:
+            self.__next_token()
+            inversion_b = self._parse_inversion()
+            inversion_a = BooleanOperation('and', inversion_a, inversion_b)
+        return inversion_a
+
+    def _parse_inversion(self, operand: Node = None) -> Node:
+        """Identifies and parses an inversion and determines if the comparison
+        should be inverted by finding NOT tokens.
+
+        :param operand: The first sum of the comparison, if it has already been parsed
+        :returns The inversion tree
+        """
+        if operand is None and self.__current_token.type == TokenType.NOT:
+            self.__next_token()
+            return UnaryOperation(Operations.logical_not, self._parse_inversion())
+        else:
+            return self._parse_comparison(operand)
+
+    def _parse_comparison(self, operand: Node = None) -> Node:
+        """Identifies and parses a comparison by finding LESS/LESS_EQUAL/GREATER/GREATER_EQUAL/EQUAL/NOT_EQUAL
+        tokens and building comparison operations on its two sums. Comparisons are left-associative.
+
+        :param operand: The first sum of the comparison, if it has already been parsed
+        :returns The comparison tree
+        """
+        sum_a = operand if operand is not None else self._parse_sum()
+        while self.__current_token.type in _COMPARISONS:
+            operation = _COMPARISONS[self.__current_token.type]
+            self.__next_token()
+            sum_b = self._parse_sum()
+            sum_a = BinaryOperation(operation, sum_a, sum_b)
+        return sum_a
+
+    def _parse_sum(self, operand: Node = None) -> Node:
+        """Identifies and parses a sum by finding PLUS/MINUS tokens and
+        building add/subtract operations on its two terms.
+
+        :param operand: The first term of the sum, if it has already been parsed
+        :returns The sum tree, which has been accumulated into the term_a variable
+        """
+        term_a = operand if operand is not None else self._parse_term()
         while self.__current_token.type in (TokenType.PLUS, TokenType.MINUS):
             if self.__current_token.type == TokenType.PLUS:
                 self.__next_token()
-                term_b = self._calculate_term()
-                term_a = Operations.add(term_a, term_b)
+                term_b = self._parse_term()
+                term_a = BinaryOperation(Operations.add, term_a, term_b)
             elif self.__current_token.type == TokenType.MINUS:
                 self.__next_token()
-                term_b = self._calculate_term()
-                term_a = Operations.subtract(term_a, term_b)
-
+                term_b = self._parse_term()
+                term_a = BinaryOperation(Operations.subtract, term_a, term_b)
         else:
-            if self.__current_token.type is not expected_end_of_expression.type:
-                raise ValueError(f'Expected the end of an expression with a Token of type: '
-                                 f'{expected_end_of_expression.type} but received {self.__current_token.type}')
-            else:
-                self.__next_token()
-                return term_a
+            return term_a
 
-    def _calculate_term(self) -> float:
-        """Identifies and calculates the value of a term by finding MULTIPLY/DIVIDE tokens and
-        executing multiply/divide operations on its two factors.
+    def _parse_term(self) -> Node:
+        """Identifies and parses a term by finding MULTIPLY/DIVIDE tokens and
+        building multiply/divide operations on its two factors.
 
-        :returns The value of the term, which has been accumulated into the factor_a variable
+        :returns The term tree, which has been accumulated into the factor_a variable
         """
-        factor_a = self._calculate_factor()
+        factor_a = self._parse_factor()
         while self.__current_token.type in (TokenType.MULTIPLY, TokenType.DIVIDE):
             if self.__current_token.type == TokenType.MULTIPLY:
                 self.__next_token()
-                factor_b = self._calculate_factor()
-                factor_a = Operations.multiply(factor_a, factor_b)
+                factor_b = self._parse_factor()
+                factor_a = BinaryOperation(Operations.multiply, factor_a, factor_b)
             elif self.__current_token.type == TokenType.DIVIDE:
                 self.__next_token()
-                factor_b = self._calculate_factor()
-                factor_a = Operations.divide(factor_a, factor_b)
+                factor_b = self._parse_factor()
+                factor_a = BinaryOperation(Operations.divide, factor_a, factor_b)
         else:
             return factor_a
 
-    def _calculate_factor(self) -> float:
-        """Identifies and calculates the value of a factor and determines if the factor
+    def _parse_factor(self) -> Node:
+        """Identifies and parses a factor and determines if the factor
         should be negated by finding unary PLUS/MINUS tokens.
 
-        :returns The value of the factor.
+        :returns The factor tree
         """
         while self.__current_token.type in (TokenType.MINUS, TokenType.PLUS):
             if self.__current_token.type == TokenType.MINUS:
                 self.__next_token()
-                return Operations.negate(self._calculate_factor())
+                return UnaryOperation(Operations.negate, self._parse_factor())
             elif self.__current_token.type == TokenType.PLUS:
                 self.__next_token()
-                return self._calculate_factor()
+                return self._parse_factor()
         else:
-            return self._calculate_exponentiation()
+            return self._parse_exponentiation()
 
-    def _calculate_exponentiation(self) -> float:
-        """Identifies and calculates the value of an exponentiation by determining if an expression
-        in parenthesis should be calculated, then identifying and calculating the base and exponent
-        and executing the exponentiation operation with these if applicable.
+    def _parse_exponentiation(self) -> Node:
+        """Identifies and parses an exponentiation by determining if an expression
+        in parenthesis should be parsed as the base, or else identifying the number or variable making up
+        the base, then parsing the exponent and building the exponentiation operation with these if applicable.
 
-        :returns The value of the exponentiation, or the base if no exponentiation exists
+        :returns The exponentiation tree, or the base if no exponentiation exists
         """
         if self.__current_token.type == TokenType.LEFT_PARENTHESIS:
             self.__next_token()
-            return self._calculate_expression(expected_end_of_expression=Token(TokenType.RIGHT_PARENTHESIS, ')'))
-        else:
-            base = self._identify_number()
+            base = self._parse_expression(expected_end_of_expression=Token(TokenType.RIGHT_PARENTHESIS, ')'))
+        elif self.__current_token.type == TokenType.IDENTIFIER:
+            name = self.__current_token
             self.__next_token()
-
-            if self.__current_token.type == TokenType.EXPONENT:
+            if self.__current_token.type == TokenType.LEFT_PARENTHESIS:
                 self.__next_token()
-                exponent = self._calculate_factor()
-                return Operations.exponentiation(base, exponent)
+                base = self.__call(name, self._parse_arguments())
             else:
-                return base
+                base = Variable(name.value)
+        else:
+            base = self._parse_number()
+            self.__next_token()
 
-    def _identify_number(self) -> float:
-        """Identifies and returns the value of a number
+        if self.__current_token.type == TokenType.EXPONENT:
+            self.__next_token()
+            exponent = self._parse_factor()
+            return BinaryOperation(Operations.exponentiation, base, exponent)
+        else:
+            return base
 
-        :raises ValueError if the current token is not a number - which means an invalid expression
-        :returns The value of the number
+    def _parse_arguments(self) -> list:
+        """Identifies and parses the comma separated arguments of a function call, up to and including the
+        RIGHT_PARENTHESIS token closing the call
+
+        :raises ExpressionSyntaxError if an argument is not followed by a COMMA or RIGHT_PARENTHESIS
+        :returns The argument trees
+        """
+        arguments = [self._parse_disjunction()]
+        while self.__current_token.type == TokenType.COMMA:
+            self.__next_token()
+            arguments.append(self._parse_disjunction())
+        if self.__current_token.type is not TokenType.RIGHT_PARENTHESIS:
+            raise ExpressionSyntaxError(f'Expected the end of an expression with a Token of type: '
+                                        f'{TokenType.RIGHT_PARENTHESIS} but received '
+                                        f'{self.__current_token.type}', self.__current_token.position)
+        self.__next_token()
+        return arguments
+
+    def __call(self, name: Token, arguments: list) -> FunctionCall or Conditional:
+        """Resolves a function call to the Function registered with the name, or a call of if(condition, if_true,
+        if_false) to a Conditional
+
+        :param name: The IDENTIFIER token naming the function
+        :param arguments: The argument trees
+        :raises ExpressionSyntaxError if no function is registered with the name, or it does not take the number
+        of arguments
+        :returns The function call
+        """
+        if name.value == 'if':
+            if len(arguments) != 3:
+                raise ExpressionSyntaxError(f'Function if() takes 3 argument(s), got {len(arguments)}', name.position)
+            return Conditional(*arguments)
+        function = self.__functions.get(name.value)
+        if function is None:
+            raise ExpressionSyntaxError(f"Unknown function '{name.value}'", name.position)
+        if len(arguments) < function.min_arity or \
+                function.max_arity is not None and len(arguments) > function.max_arity:
+            expected = function.min_arity if function.min_arity == function.max_arity else \
+                f'{function.min_arity} or more' if function.max_arity is None else \
+                f'{function.min_arity} to {function.max_arity}'
+            raise ExpressionSyntaxError(f'Function {function.name}() takes {expected} argument(s), '
+                                        f'got {len(arguments)}', name.position)
+        return FunctionCall(function, tuple(arguments))
+
+    def _parse_number(self) -> Number:
+        """Identifies and parses a number
+
+        :raises ExpressionSyntaxError if the current token is not a number - which means an invalid expression
+        :returns The number
         """
         if self.__current_token.type != TokenType.NUMBER:
-            raise ValueError(f"Expected TokenType.NUMBER, got '{self.__current_token.type}'")
+            raise ExpressionSyntaxError(f"Expected TokenType.NUMBER, got '{self.__current_token.type}'",
+                                        self.__current_token.position)
         else:
-            return float(self.__current_token.value)
+            return Number(self.__current_token.value)
+
+    def _parse_iteratively(self) -> Node:
+        """Parses a whole expression with the shunting-yard algorithm, using explicit operand and operator stacks
+        instead of recursion. Builds the same tree as _parse_expression(): unary PLUS/MINUS bind weaker than
+        EXPONENT but stronger than the other operators, and EXPONENT is right-associative. NOT binds weaker than the
+        comparisons but stronger than AND and OR, and can only start an operand where _parse_inversion() is reached.
+        A function call is marked on the operator stack like a left parenthesis, and its arguments are the operands
+        pushed above the mark.
+
+        :raises ExpressionSyntaxError if the expression is invalid, like _parse_expression()
+        :returns The expression tree
+        """
+        operands = []
+        operators = []
+        while True:
+            # Operand position: unary operators, left parenthesis and function calls, followed by a number or variable
+            token_type = self.__current_token.type
+            inversion_allowed = not operators or operators[-1] is None or operators[-1][0] <= _INVERSION[0]
+            while token_type in (TokenType.MINUS, TokenType.PLUS, TokenType.LEFT_PARENTHESIS, TokenType.NOT):
+                if token_type == TokenType.MINUS:
+                    operators.append(_NEGATION)
+                elif token_type == TokenType.LEFT_PARENTHESIS:
+                    operators.append(None)
+                elif token_type == TokenType.NOT:
+                    if not inversion_allowed:
+                        break
+                    operators.append(_INVERSION)
+                inversion_allowed = token_type is not TokenType.MINUS and token_type is not TokenType.PLUS
+                self.__next_token()
+                token_type = self.__current_token.type
+            if token_type == TokenType.IDENTIFIER:
+                name = self.__current_token
+                self.__next_token()
+                if self.__current_token.type == TokenType.LEFT_PARENTHESIS:
+                    operators.append((-1, name, len(operands)))
+                    self.__next_token()
+                    continue
+                operands.append(Variable(name.value))
+            else:
+                operands.append(self._parse_number())
+                self.__next_token()
+
+            # Operator position: right parenthesis, followed by a comma separating function arguments, a binary
+            # operator or the end of the expression
+            token_type = self.__current_token.type
+            while token_type == TokenType.RIGHT_PARENTHESIS:
+                self.__reduce(operands, operators, 0)
+                if not operators:
+                    raise ExpressionSyntaxError(f'Expected the end of an expression with a Token of type: '
+                                                f'{TokenType.END} but received {token_type}',
+                                                self.__current_token.position)
+                opening = operators.pop()
+                if opening is not None:
+                    _, name, first_argument = opening
+                    arguments = operands[first_argument:]
+                    del operands[first_argument:]
+                    operands.append(self.__call(name, arguments))
+                self.__next_token()
+                token_type = self.__current_token.type
+            if token_type == TokenType.COMMA:
+                self.__reduce(operands, operators, 0)
+                if operators and operators[-1] is not None:
+                    self.__next_token()
+                    continue
+            operator = _BINARY_OPERATORS.get(token_type)
+            if operator is None:
+                self.__reduce(operands, operators, 0)
+                expected_end = TokenType.RIGHT_PARENTHESIS if operators else TokenType.END
+                if token_type is not expected_end:
+                    raise ExpressionSyntaxError(f'Expected the end of an expression with a Token of type: '
+                                                f'{expected_end} but received {token_type}',
+                                                self.__current_token.position)
+                return operands[0]
+            precedence, right_associative = operator[0], operator[1]
+            self.__reduce(operands, operators, precedence + 1 if right_associative else precedence)
+            operators.append(operator)
+            self.__next_token()
+
+    @staticmethod
+    def __reduce(operands: list, operators: list, precedence: int):
+        """Builds operations from the operators on top of the stack, until a left parenthesis or an operator
+        binding weaker than precedence is on top
+
+        :param operands: The stack of operand trees, which operations are built from and pushed back on
+        :param operators: The stack of (precedence, right-associative, arity, operation) operators, where None marks
+        a left parenthesis and (-1, name, first argument) marks a function call
+        :param precedence: The lowest precedence of the operators to build
+        """
+        while operators and operators[-1] is not None and operators[-1][0] >= precedence:
+            _, _, arity, operation = operators.pop()
+            if arity == 1:
+                operands[-1] = UnaryOperation(operation, operands[-1])
+            elif isinstance(operation, str):
+                right = operands.pop()
+                operands[-1] = BooleanOperation(operation, operands[-1], right)
+            else:
+                right = operands.pop()
+                operands[-1] = BinaryOperation(operation, operands[-1], right)
+
+
+def compile(expression: str, iterative=False, backend=None) -> CompiledExpression:
+    """Tokenizes and parses an expression once into a CompiledExpression which can be evaluated many times,
+    with different values bound to its variables. Shadows the builtin compile() within this module.
+
+    :param expression: The expression to compile
+    :param iterative: Whether to parse without recursion, see Calculator
+    :param backend: The NumericBackend to calculate with. Defaults to FLOAT_BACKEND
+    :raises ExpressionSyntaxError if the expression is invalid
+    :returns The compiled expression
+    """
+    return Calculator(expression, iterative, backend=backend).compile()
+
+
+def calculate_lines(lines: Iterable, iterative=False, profiler=None) -> Iterator:
+    """Lazily calculates newline-delimited expressions, one line at a time, skipping blank lines. Errors are
+    reported per line instead of exiting, including exceptions which are not CalculationErrors, like the
+    RecursionError of a line nested too deep to parse recursively.
+
+    :param lines: The lines to calculate, such as an open file
+    :param iterative: Whether to parse without recursion, see Calculator
+    :param profiler: An optional profiling.Profiler to record the calculations in, see Calculator
+    :returns An iterator of (expression, result, error) tuples, where error is None or the message of the error
+    which made the line invalid, and result is None if there was an error
+    """
+    for line in lines:
+        expression = line.strip()
+        if expression:
+            try:
+                yield expression, Calculator(expression, iterative, profiler=profiler).calculate(), None
+            except RecursionError:
+                yield expression, None, 'Expected an expression nested shallow enough to parse recursively'
+            except Exception as e:
+                yield expression, None, str(e) or type(e).__name__
+
+
+def format_text_line(expression: str, result: float or int, error: str or None) -> str:
+    """Formats a calculated line as 'expression = result', or 'expression = error: message'"""
+    if error is None:
+        return f'{expression} = {result}\n'
+    else:
+        return f'{expression} = error: {error}\n'
+
+
+def format_json_line(expression: str, result: float or int, error: str or None) -> str:
+    """Formats a calculated line as a JSON object with the expression and either its result or error. json is
+    imported on the first call, so calculating a single expression does not import it."""
+    import json
+    if error is None:
+        return json.dumps({'expression': expression, 'result': result}) + '\n'
+    else:
+        return json.dumps({'expression': expression, 'error': error}) + '\n'
+
+
+def calculate_batch(lines: Iterable, output, json_lines=False, iterative=False, buffer_lines=1024,
+                    workers=1, ordered=True, profiler=None) -> int:
+    """Streams the results of calculate_lines() to output, writing buffer_lines formatted lines at a time,
+    so memory use is bounded regardless of the number of lines
+
+    :param lines: The lines to calculate, such as an open file
+    :param output: A text stream to write the results to
+    :param json_lines: Whether to write JSON Lines instead of 'expression = result' lines
+    :param iterative: Whether to parse without recursion, see Calculator
+    :param buffer_lines: The number of formatted lines to join into each write
+    :param workers: The number of worker processes to calculate in, see parallel.ParallelCalculator. The lines are
+    calculated in this process if it is 1
+    :param ordered: Whether results are written in the order of the lines when calculated in worker processes
+    :param profiler: An optional profiling.Profiler to record the calculations in, see Calculator
+    :raises ValueError if a profiler is given with more than one worker process
+    :returns The number of lines which had errors
+    """
+    if workers == 1:
+        results = calculate_lines(lines, iterative, profiler)
+    elif profiler is not None:
+        raise ValueError('Expected a single worker process to profile calculations in')
+    else:
+        from dt042g_src.parallel import calculate_parallel
+        results = calculate_parallel(lines, workers, ordered=ordered, iterative=iterative)
+    format_line = format_json_line if json_lines else format_text_line
+    errors = 0
+    buffer = []
+    for expression, result, error in results:
+        if error is not None:
+            errors += 1
+        buffer.append(format_line(expression, result, error))
+        if len(buffer) >= buffer_lines:
+            output.write(''.join(buffer))
+            buffer.clear()
+    output.write(''.join(buffer))
+    output.flush()
+    return errors
+
+
+def print_calculation(expression: str, profiler=None, iterative=False):
+    """Calculates an expression and prints 'expression = result', or prints the error and exits with status 1
+
+    :param profiler: An optional profiling.Profiler which records the calculation
+    :param iterative: Whether to parse without recursion, see Calculator
+    """
+    calculator = Calculator(expression, iterative, profiler=profiler)
+    try:
+        print(f'{expression} = {calculator.calculate()}')
+    except ZeroDivisionError as e:
+        print(f'{e}, exiting..')
+        exit(1)
+    except (ValueError, ArithmeticError) as e:
+        print(f'{e}\nInvalid mathematical expression, exiting..')
+        exit(1)
 
 
 def main():
-    """Parses arguments, passes calculate argument to the calculator and prints the result"""
+    """Parses arguments, passes calculate argument to the calculator and prints the result, or streams
+    the results of a batch of newline-delimited expressions. Arguments which are only -c/--calculate and the
+    expression are handled without argparse, which takes longer to import than the calculation takes."""
+    if len(sys.argv) == 3 and sys.argv[1] in ('-c', '--calculate'):
+        print_calculation(sys.argv[2])
+        return
+    import argparse
     epilog = 'DT042G Calculator V' + __version__
     parser = argparse.ArgumentParser(description=__desc__, epilog=epilog, add_help=True)
     parser.add_argument('-c', '--calculate', dest='calculate', type=str,
                         help='The expression to calculate. Ex: 2+(4-5)/5*3')
+    parser.add_argument('-b', '--batch', dest='batch', action='store_true',
+                        help='Calculate newline-delimited expressions from stdin')
+    parser.add_argument('-i', '--input', dest='input', type=str,
+                        help='Calculate newline-delimited expressions from a file')
+    parser.add_argument('--json', dest='json', action='store_true',
+                        help='Write batch results as JSON Lines')
+    parser.add_argument('--iterative', dest='iterative', action='store_true',
+                        help='Parse without recursion, so parenthesis can be nested any number of levels deep')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='Calculate batch expressions in this many worker processes, 0 for one per CPU')
+    parser.add_argument('--unordered', dest='ordered', action='store_false',
+                        help='Write batch results as soon as they are calculated by a worker process')
+    parser.add_argument('--profile', dest='profile', nargs='?', const='text', choices=('text', 'json', 'prometheus'),
+                        help='Write the time spent in each stage, Token counts, parser recursion depth and operation '
+                             'counts to stderr, as a text breakdown, JSON or Prometheus metrics')
     arguments = parser.parse_args()
-    calculator = Calculator(arguments.calculate)
-    print(f'{arguments.calculate} = {calculator.calculate()}')
+    if arguments.workers < 0:
+        parser.error(f'argument -w/--workers: expected 0 or a positive number of processes, got {arguments.workers}')
+    profiler = None
+    if arguments.profile is not None:
+        if arguments.workers != 1:
+            parser.error('argument --profile: not allowed with -w/--workers other than 1')
+        from dt042g_src.profiling import Profiler
+        profiler = Profiler()
+    try:
+        if arguments.batch or arguments.input is not None:
+            options = dict(json_lines=arguments.json, iterative=arguments.iterative,
+                           workers=arguments.workers or None, ordered=arguments.ordered, profiler=profiler)
+            if arguments.input is None:
+                errors = calculate_batch(sys.stdin, sys.stdout, **options)
+            else:
+                with open(arguments.input) as file_handle:
+                    errors = calculate_batch(file_handle, sys.stdout, **options)
+            exit(1 if errors else 0)
+        if arguments.calculate is None:
+            parser.error('one of the arguments -c/--calculate -b/--batch -i/--input is required')
+        print_calculation(arguments.calculate, profiler, arguments.iterative)
+    finally:
+        if profiler is not None:
+            sys.stderr.write(profiler.export(arguments.profile))
 
 
 if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
     main()
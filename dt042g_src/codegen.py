@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+import builtins
+import math
+from collections.abc import Mapping, Sequence
+
+from dt042g_src.cache import CacheStats, LRUCache
+from dt042g_src.calculator import FLOAT_BACKEND, FUNCTIONS, BinaryOperation, BooleanOperation, Calculator, \
+    CompiledExpression, Conditional, FunctionCall, Node, Number, Operations, UnaryOperation, Variable
+
+# Precedence of the generated Python expressions, which matches the precedence of the grammar of the calculator
+_ATOM = 9
+_BINARY_OPERATORS = {
+    Operations.add: ('+', 5),
+    Operations.subtract: ('-', 5),
+    Operations.multiply: ('*', 6),
+}
+_BOOLEAN_OPERATORS = {'and': 2, 'or': 1}
+# The largest int written as a literal. Larger ints are referenced by name, since the repr of an int with more digits
+# than int to text conversion allows raises ValueError
+_MAX_LITERAL_INT = 2 ** 64
+
+
+class _SourceGenerator:
+    """Translates an expression tree into the source of a single Python expression. Operations which are plain
+    Python operators are inlined with the fewest parenthesis needed, and everything else, like numbers which are not
+    plain literals, divisions and powers with their zero checks, comparisons with their check for complex numbers,
+    operations of other backends and function calls, is referenced by name from a namespace."""
+    __operations: type
+    __variables: dict
+    __namespace: dict
+
+    def __init__(self, operations: type, variables: tuple):
+        """Initializes fields
+
+        :param operations: The Operations class whose operations replace those of the tree
+        :param variables: The names of the variables, in the order of the parameters of the generated function
+        """
+        self.__operations = operations
+        self.__variables = {name: f'v{index}' for index, name in enumerate(variables)}
+        self.__namespace = {}
+
+    @property
+    def namespace(self) -> dict:
+        """A mapping of the names referenced by the generated source to their values"""
+        return {name: value for value, name in self.__namespace.values()}
+
+    def generate(self, node: Node) -> tuple:
+        """Generates the source of a tree
+
+        :raises RecursionError if the tree is nested too deep to translate
+        :returns The source, and its precedence
+        """
+        if isinstance(node, Number):
+            value = node.value
+            if type(value) is int and 0 <= value <= _MAX_LITERAL_INT or \
+                    type(value) is float and math.isfinite(value) and not repr(value).startswith('-'):
+                return repr(value), _ATOM
+            return self.__name(value), _ATOM
+        elif isinstance(node, Variable):
+            return self.__variables[node.name], _ATOM
+        elif isinstance(node, UnaryOperation):
+            operation = self.__operation(node.operation)
+            if operation is Operations.negate:
+                return '-' + self.__operand(node.operand, 7), 7
+            return f'{self.__name(operation)}({self.__operand(node.operand, 0)})', _ATOM
+        elif isinstance(node, BinaryOperation):
+            operation = self.__operation(node.operation)
+            if operation not in _BINARY_OPERATORS:
+                return f'{self.__name(operation)}({self.__operand(node.left, 0)}, ' \
+                       f'{self.__operand(node.right, 0)})', _ATOM
+            symbol, precedence = _BINARY_OPERATORS[operation]
+            return f'{self.__operand(node.left, precedence)} {symbol} ' \
+                   f'{self.__operand(node.right, precedence + 1)}', precedence
+        elif isinstance(node, BooleanOperation):
+            precedence = _BOOLEAN_OPERATORS[node.operator]
+            return f'{self.__operand(node.left, precedence)} {node.operator} ' \
+                   f'{self.__operand(node.right, precedence + 1)}', precedence
+        elif isinstance(node, Conditional):
+            return f'({self.__operand(node.if_true, 1)} if {self.__operand(node.condition, 1)} ' \
+                   f'else {self.__operand(node.if_false, 1)})', _ATOM
+        elif isinstance(node, FunctionCall):
+            arguments = ''.join(self.__operand(argument, 1) + ', ' for argument in node.arguments)
+            if self.__operations.call is Operations.call:
+                return f'{self.__name(node.function.call)}(({arguments}))', _ATOM
+            return f'{self.__name(self.__operations.call)}({self.__name(node.function)}, ({arguments}))', _ATOM
+        raise TypeError(f'Unknown node {node!r}')
+
+    def __operand(self, node: Node, precedence: int) -> str:
+        """Generates the source of an operand, in parenthesis if it binds weaker than precedence"""
+        source, operand_precedence = self.generate(node)
+        return source if operand_precedence >= precedence else f'({source})'
+
+    def __operation(self, operation):
+        """Returns the operation of __operations which replaces an operation of the tree"""
+        if self.__operations is Operations:
+            return operation
+        return getattr(self.__operations, operation.__name__)
+
+    def __name(self, value) -> str:
+        """Returns the name a value is referenced by in the namespace, adding it if it is not yet referenced"""
+        key = id(value)
+        if key not in self.__namespace:
+            self.__namespace[key] = (value, f'_n{len(self.__namespace)}')
+        return self.__namespace[key][1]
+
+
+class NativeExpression:
+    """A compiled expression translated into a Python function, so evaluating it runs Python bytecode instead of
+    interpreting the program instruction by instruction. Expressions nested too deep for the Python compiler are
+    evaluated by the compiled expression instead."""
+    __slots__ = ('__compiled', '__source', '__function')
+
+    def __init__(self, compiled: CompiledExpression):
+        """Initializes fields and translates the tree of the compiled expression into a Python function
+
+        :param compiled: The expression to translate, with the backend it is evaluated with
+        """
+        self.__compiled = compiled
+        try:
+            generator = _SourceGenerator(compiled.backend.operations, compiled.variables)
+            body, _ = generator.generate(compiled.tree)
+            namespace = generator.namespace
+            self.__source = f'def _factory({", ".join(namespace)}):\n' \
+                            f'    return lambda {", ".join(f"v{i}" for i in range(len(compiled.variables)))}: {body}\n'
+            scope = {}
+            exec(builtins.compile(self.__source, f'<expression {compiled.expression!r}>', 'exec'), scope)
+            self.__function = scope['_factory'](*namespace.values())
+        except (RecursionError, MemoryError, SyntaxError):
+            self.__source = self.__function = None
+
+    def __repr__(self):
+        """Returns a string representation of the native expression"""
+        return f'NativeExpression({self.__compiled.expression!r})'
+
+    @property
+    def compiled(self) -> CompiledExpression:
+        """The compiled expression which was translated"""
+        return self.__compiled
+
+    @property
+    def source(self) -> str or None:
+        """The generated Python source, or None if the expression was too deep to translate"""
+        return self.__source
+
+    @property
+    def native(self) -> bool:
+        """Whether the expression is evaluated by a generated Python function"""
+        return self.__function is not None
+
+    @property
+    def variables(self) -> tuple:
+        """The names of the variables in the expression, in the order positional values are bound to them"""
+        return self.__compiled.variables
+
+    def evaluate(self, variables: Mapping or Sequence = ()) -> float or int:
+        """Evaluates the expression with the variables bound to the given values, like CompiledExpression.evaluate()
+
+        :param variables: A mapping of variable names to values, or a sequence of values in the order of
+        the variables property
+        :raises UnboundVariableError if a variable has no value bound to it
+        :raises ValueError if a sequence of values does not match the number of variables
+        :raises DivisionByZeroError if the expression divides by zero
+        :raises NonRealResultError if the expression evaluates to a complex number
+        :raises OverflowError if a result is too large to represent
+        :returns The value of the expression, normalized by the backend
+        """
+        compiled = self.__compiled
+        if self.__function is None:
+            return compiled.evaluate(variables)
+        backend = compiled.backend
+        if backend.context is None:
+            return backend.normalize(self.__function(*compiled._bind(variables)))
+        with backend.evaluating():
+            return backend.normalize(self.__function(*compiled._bind(variables)))
+
+
+class NativeCompiler:
+    """Compiles expressions into NativeExpressions, caching them by their text, backend and function registry,
+    since translating and compiling the generated source costs far more than parsing. The text is not normalized
+    like in ExpressionCache, so a lookup costs a single hash of the text."""
+    __cache: LRUCache
+
+    def __init__(self, maxsize=1024):
+        """Initializes fields
+
+        :param maxsize: The maximum number of cached expressions
+        """
+        self.__cache = LRUCache(maxsize)
+
+    def compile(self, expression: str, iterative=False, backend=None, functions=None) -> NativeExpression:
+        """Returns the cached native form of the expression, or compiles and caches it on a miss
+
+        :param expression: The expression to compile
+        :param iterative: Whether to parse without recursion, see Calculator
+        :param backend: The NumericBackend to compile for. Defaults to FLOAT_BACKEND
+        :param functions: The FunctionRegistry to resolve function calls in. Defaults to FUNCTIONS
+        :raises ExpressionSyntaxError if the expression is invalid
+        :returns The native expression, which is immutable and can be shared between threads
+        """
+        key = (expression, backend or FLOAT_BACKEND, functions or FUNCTIONS)
+        return self.__cache.get(key, lambda: NativeExpression(
+            Calculator(expression, iterative, backend=backend, functions=functions).compile()))
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the counters of the cache"""
+        return self.__cache.stats()
+
+    def clear(self):
+        """Removes all entries and resets the counters"""
+        self.__cache.clear()
+
+
+_COMPILER = NativeCompiler()
+
+
+def compile_native(expression: str, iterative=False, backend=None) -> NativeExpression:
+    """Compiles an expression into a NativeExpression, cached by its text in a shared NativeCompiler
+
+    :param expression: The expression to compile
+    :param iterative: Whether to parse without recursion, see Calculator
+    :param backend: The NumericBackend to calculate with. Defaults to FLOAT_BACKEND
+    :raises ExpressionSyntaxError if the expression is invalid
+    :returns The native expression
+    """
+    return _COMPILER.compile(expression, iterative, backend)
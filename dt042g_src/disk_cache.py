@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+import json
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+from fractions import Fraction
+
+from dt042g_src.cache import CacheStats, normalize_expression
+from dt042g_src.calculator import FLOAT_BACKEND, FUNCTIONS, BinaryOperation, BooleanOperation, Calculator, \
+    CompiledExpression, Conditional, FunctionCall, FunctionRegistry, Limits, Node, Number, NumericBackend, \
+    Operations, UnaryOperation, Variable, __version__, tokenize
+
+# The version of the calculator and of the encoding of trees, which entries of other versions are not read with
+ENGINE_VERSION = f'{__version__}/1'
+
+_OPERATIONS = {name: getattr(Operations, name) for name in vars(Operations) if not name.startswith('_')}
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS expressions (
+    expression TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    version TEXT NOT NULL,
+    tree TEXT NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (expression, backend, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS expressions_used ON expressions (used);
+'''
+
+
+def encode_tree(tree: Node) -> str or None:
+    """Encodes a tree as a JSON array of its nodes in postfix order. Numbers are encoded as JSON numbers, or as
+    ["d", text] and ["q", text] for Decimal and Fraction, variables as their name, operations as ["u", name] and
+    ["b", name], function calls as ["c", name, number of arguments], boolean operations as ["and"] and ["or"], and
+    conditionals as ["if"]. Functions are encoded by name, and resolved again when the tree is decoded.
+
+    :returns The JSON text, or None if the tree has numbers of a type which can not be encoded
+    """
+    nodes = []
+    pending = [(tree, False)]
+    while pending:
+        node, operands_encoded = pending.pop()
+        if isinstance(node, Number):
+            value = node.value
+            if type(value) is float or type(value) is int:
+                nodes.append(value)
+            elif type(value) is Decimal:
+                nodes.append(['d', str(value)])
+            elif type(value) is Fraction:
+                nodes.append(['q', str(value)])
+            else:
+                return None
+        elif isinstance(node, Variable):
+            nodes.append(node.name)
+        elif not operands_encoded:
+            pending.append((node, True))
+            if isinstance(node, UnaryOperation):
+                pending.append((node.operand, False))
+            elif isinstance(node, (BinaryOperation, BooleanOperation)):
+                pending.extend(((node.right, False), (node.left, False)))
+            elif isinstance(node, FunctionCall):
+                pending.extend((argument, False) for argument in reversed(node.arguments))
+            else:
+                pending.extend(((node.if_false, False), (node.if_true, False), (node.condition, False)))
+        elif isinstance(node, UnaryOperation):
+            nodes.append(['u', node.operation.__name__])
+        elif isinstance(node, BinaryOperation):
+            nodes.append(['b', node.operation.__name__])
+        elif isinstance(node, FunctionCall):
+            nodes.append(['c', node.function.name, len(node.arguments)])
+        elif isinstance(node, BooleanOperation):
+            nodes.append([node.operator])
+        else:
+            nodes.append(['if'])
+    return json.dumps(nodes, separators=(',', ':'))
+
+
+def decode_tree(text: str, functions: FunctionRegistry) -> Node or None:
+    """Decodes a tree encoded by encode_tree(), resolving its function calls in a registry like the parser does
+
+    :returns The tree, or None if it calls a function which is not registered, or not with that number of arguments
+    """
+    stack = []
+    for node in json.loads(text):
+        if type(node) is str:
+            stack.append(Variable(node))
+        elif type(node) is not list:
+            stack.append(Number(node))
+        elif node[0] == 'b':
+            right = stack.pop()
+            stack[-1] = BinaryOperation(_OPERATIONS[node[1]], stack[-1], right)
+        elif node[0] == 'u':
+            stack[-1] = UnaryOperation(_OPERATIONS[node[1]], stack[-1])
+        elif node[0] == 'c':
+            _, name, count = node
+            function = functions.get(name)
+            if function is None or count < function.min_arity or \
+                    function.max_arity is not None and count > function.max_arity:
+                return None
+            arguments = tuple(stack[-count:])
+            del stack[-count:]
+            stack.append(FunctionCall(function, arguments))
+        elif node[0] == 'if':
+            if_false = stack.pop()
+            if_true = stack.pop()
+            stack[-1] = Conditional(stack[-1], if_true, if_false)
+        elif node[0] == 'd':
+            stack.append(Number(Decimal(node[1])))
+        elif node[0] == 'q':
+            stack.append(Number(Fraction(node[1])))
+        else:
+            right = stack.pop()
+            stack[-1] = BooleanOperation(node[0], stack[-1], right)
+    return stack[0]
+
+
+class DiskCache:
+    """Caches the parsed trees of expressions in an SQLite database file, so processes which compile the same
+    expressions do not parse them again after a restart. Entries are keyed on the normalized expression, the name of
+    the backend and ENGINE_VERSION. The database is in write-ahead logging mode, so any number of processes can read
+    it while one writes. When there are more than maxsize entries, the least recently used tenth is evicted. The time
+    an entry was used is only updated when it is older than touch_interval seconds, so hits rarely write."""
+    __path: str
+    __maxsize: int
+    __touch_interval: float
+    __connection: sqlite3.Connection
+    __lock: threading.Lock
+    __size: int
+    __hits: int
+    __misses: int
+    __evictions: int
+
+    def __init__(self, path: str, maxsize=65536, touch_interval=60.0, timeout=10.0):
+        """Initializes fields, and opens or creates the database
+
+        :param path: The path of the database file
+        :param maxsize: The maximum number of entries
+        :param touch_interval: The number of seconds after which a hit updates the time an entry was used
+        :param timeout: The number of seconds to wait for another process writing the database
+        :raises ValueError if maxsize is not positive
+        :raises sqlite3.Error if the file can not be opened as a database
+        """
+        if maxsize < 1:
+            raise ValueError(f'Expected a positive maxsize, got {maxsize}')
+        self.__path = path
+        self.__maxsize = maxsize
+        self.__touch_interval = touch_interval
+        self.__connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(_SCHEMA)
+        self.__lock = threading.Lock()
+        self.__size = self.__count()
+        self.__hits = self.__misses = self.__evictions = 0
+
+    def __repr__(self):
+        """Returns a string representation of the cache"""
+        return f'DiskCache({self.__path!r}, maxsize={self.__maxsize})'
+
+    def __enter__(self) -> 'DiskCache':
+        """Returns the cache, which is closed when the with block exits"""
+        return self
+
+    def __exit__(self, *exception):
+        """Closes the cache"""
+        self.close()
+
+    def compile(self, expression: str, iterative=False, backend=None, functions=None,
+                limits=None) -> CompiledExpression:
+        """Compiles an expression from its cached tree, or parses it and caches its tree on a miss. Expressions which
+        do not parse are not cached.
+
+        :param expression: The expression to compile
+        :param iterative: Whether to parse without recursion on a miss, see Calculator
+        :param backend: The NumericBackend to compile for. Defaults to FLOAT_BACKEND
+        :param functions: The FunctionRegistry to resolve function calls in. Defaults to FUNCTIONS
+        :param limits: Optional Limits the expression must be within. The expression of a cached tree is tokenized
+        again if the limits count Tokens or nesting, which the tree does not keep, but is not parsed again
+        :raises ExpressionSyntaxError if the expression is invalid
+        :raises LimitExceededError if the expression exceeds the limits
+        :returns The compiled expression
+        """
+        backend = backend if backend is not None else FLOAT_BACKEND
+        functions = functions if functions is not None else FUNCTIONS
+        if limits is not None:
+            limits.check_length(expression)
+        key = (normalize_expression(expression), backend.name, ENGINE_VERSION)
+        tree = self.__load(key, functions)
+        if tree is None:
+            compiled = Calculator(expression, iterative, backend=backend, functions=functions, limits=limits).compile()
+            self.__store(key, compiled.tree)
+            return compiled
+        return self.__compiled(expression, tree, backend, limits)
+
+    @staticmethod
+    def __compiled(expression: str, tree: Node, backend: NumericBackend,
+                   limits: Limits or None) -> CompiledExpression:
+        """Compiles a cached tree, with the backend guarded by the limits if there are any
+
+        :raises LimitExceededError if the expression has more Tokens, deeper nesting or the program more operations
+        than the limits allow
+        :returns The compiled expression
+        """
+        if limits is None:
+            return CompiledExpression(expression, tree, backend)
+        for _ in limits.guard_tokens(tokenize(expression, backend.convert)):
+            pass
+        compiled = CompiledExpression(expression, tree, limits.guard_backend(backend))
+        limits.check_program(compiled.program)
+        return compiled
+
+    def __load(self, key: tuple, functions: FunctionRegistry) -> Node or None:
+        """Looks up the tree of a key, updating the time it was used if that is older than __touch_interval. Trees
+        which can not be decoded, like those of a damaged file, count as misses.
+
+        :returns The decoded tree, or None on a miss
+        """
+        with self.__lock:
+            row = self.__connection.execute('SELECT tree, used FROM expressions '
+                                            'WHERE expression = ? AND backend = ? AND version = ?', key).fetchone()
+            try:
+                tree = decode_tree(row[0], functions) if row is not None else None
+            except (ValueError, KeyError, IndexError, TypeError):
+                tree = None
+            if tree is None:
+                self.__misses += 1
+                return None
+            self.__hits += 1
+            now = time.time()
+            if now - row[1] > self.__touch_interval:
+                self.__connection.execute('UPDATE expressions SET used = ? '
+                                          'WHERE expression = ? AND backend = ? AND version = ?', (now,) + key)
+            return tree
+
+    def __store(self, key: tuple, tree: Node):
+        """Stores the tree of a key, evicting the least recently used entries if there are more than __maxsize.
+        The number of entries is counted again before evicting, since other processes add and evict entries too."""
+        text = encode_tree(tree)
+        if text is None:
+            return
+        with self.__lock:
+            self.__connection.execute('INSERT OR REPLACE INTO expressions VALUES (?, ?, ?, ?, ?)',
+                                      key + (text, time.time()))
+            self.__size += 1
+            if self.__size > self.__maxsize:
+                self.__size = self.__count()
+                if self.__size > self.__maxsize:
+                    evicted = self.__connection.execute(
+                        'DELETE FROM expressions WHERE (expression, backend, version) IN '
+                        '(SELECT expression, backend, version FROM expressions ORDER BY used LIMIT ?)',
+                        (self.__size - self.__maxsize + self.__maxsize // 10,)).rowcount
+                    self.__evictions += evicted
+                    self.__size -= evicted
+
+    def __count(self) -> int:
+        """Returns the number of entries in the database"""
+        return self.__connection.execute('SELECT COUNT(*) FROM expressions').fetchone()[0]
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the counters of this process, and the number of entries in the database"""
+        with self.__lock:
+            self.__size = self.__count()
+            return CacheStats(self.__hits, self.__misses, self.__evictions, self.__size, self.__maxsize)
+
+    def clear(self):
+        """Removes all entries, also those of other versions, and resets the counters"""
+        with self.__lock:
+            self.__connection.execute('DELETE FROM expressions')
+            self.__size = self.__hits = self.__misses = self.__evictions = 0
+
+    def close(self):
+        """Closes the database"""
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+from collections.abc import Iterable, Mapping, Sequence
+
+from dt042g_src.cache import ExpressionCache
+from dt042g_src.calculator import FLOAT_BACKEND, FUNCTIONS, Calculator, CompiledExpression, FunctionRegistry, \
+    Limits, NumericBackend
+
+
+class CalculatorEngine:
+    """Calculates any number of expressions with a fixed configuration, and can be shared by threads. A Calculator
+    holds the state of parsing its single expression in its fields, so it can only be used by one thread at a time.
+    The engine only holds its configuration, which is never changed after initialization, and parses each expression
+    with a Calculator of its own call, created only when the expression misses the cache. Compiled expressions are immutable and evaluate with local state, and the
+    ExpressionCache locks its entries, so concurrent calls, and calls from functions called by the engine, do not
+    interfere. The engine has no profiler, since the counters of a Profiler are not locked."""
+    __iterative: bool
+    __backend: NumericBackend
+    __functions: FunctionRegistry
+    __limits: Limits or None
+    __cache: ExpressionCache or None
+
+    def __init__(self, iterative=False, backend=None, functions=None, limits=None, cache=None):
+        """Initializes fields
+
+        :param iterative: Whether to parse without recursion, see Calculator
+        :param backend: The NumericBackend to calculate with. Defaults to FLOAT_BACKEND
+        :param functions: The FunctionRegistry function calls are resolved in. Defaults to FUNCTIONS. Functions
+        registered in it later are used by expressions compiled later, and must be safe to call from any thread
+        :param limits: Optional Limits on the resources of each calculation
+        :param cache: An optional ExpressionCache shared by the calls, which saves parsing expressions again
+        """
+        self.__iterative = iterative
+        self.__backend = backend if backend is not None else FLOAT_BACKEND
+        self.__functions = functions if functions is not None else FUNCTIONS
+        self.__limits = limits
+        self.__cache = cache
+
+    def __repr__(self):
+        """Returns a string representation of the engine"""
+        return f'CalculatorEngine(backend={self.__backend.name!r}, cached={self.__cache is not None})'
+
+    @property
+    def backend(self) -> NumericBackend:
+        """The numeric backend expressions are calculated with"""
+        return self.__backend
+
+    @property
+    def cache(self) -> ExpressionCache or None:
+        """The cache shared by the calls, if any"""
+        return self.__cache
+
+    def compile(self, expression: str) -> CompiledExpression:
+        """Compiles an expression, or looks it up in the cache
+
+        :raises ExpressionSyntaxError if the expression is invalid
+        :raises LimitExceededError if the expression exceeds the limits
+        :returns The compiled expression, which is immutable and can be evaluated by any thread
+        """
+        if self.__cache is not None:
+            return self.__cache.compile(expression, self.__iterative, self.__backend, self.__functions,
+                                        self.__limits)
+        return Calculator(expression, self.__iterative, backend=self.__backend, functions=self.__functions,
+                          limits=self.__limits).compile()
+
+    def calculate(self, expression: str, variables: Mapping or Sequence = None) -> float or int:
+        """Calculates an expression with the given variables. Without variables, the result is looked up in the
+        cache, unless the expression calls impure functions.
+
+        :param variables: A mapping of variable names to values, or a sequence of values in the order of the
+        variables of the compiled expression
+        :raises ExpressionSyntaxError if the expression is not a valid expression
+        :raises UnboundVariableError if a variable has no value bound to it
+        :raises DivisionByZeroError if the expression divides by zero
+        :raises NonRealResultError if the expression evaluates to a complex number
+        :raises FunctionCallError if a function rejects its arguments
+        :raises OverflowError if a result is too large to represent
+        :raises LimitExceededError if the expression exceeds the limits
+        :returns The value of the expression
+        """
+        compiled = self.compile(expression)
+        if variables is not None:
+            return compiled.evaluate(variables)
+        elif self.__cache is not None and compiled.pure:
+            return self.__cache.result(expression, lambda: compiled.evaluate({}), self.__backend, self.__functions,
+                                       self.__limits)
+        return compiled.evaluate({})
+
+    def calculate_many(self, expressions: Iterable) -> list:
+        """Calculates expressions without variables, with the errors of the expressions which raise a ValueError
+        or ArithmeticError, like all CalculationErrors, in place of their results
+
+        :returns The results and errors, in the order of the expressions
+        """
+        results = []
+        for expression in expressions:
+            try:
+                results.append(self.calculate(expression))
+            except (ValueError, ArithmeticError) as e:
+                results.append(e)
+        return results
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+import math
+from collections.abc import Mapping
+from enum import Enum
+from fractions import Fraction
+from functools import partial
+
+from dt042g_src.calculator import BinaryOperation, BooleanOperation, CompiledExpression, FunctionCall, Number, \
+    Operations, UnaryOperation, UnboundVariableError, Variable
+
+
+class _Kind(Enum):
+    """The kinds of nodes of an IncrementalEvaluator"""
+    NUMBER = 0
+    VARIABLE = 1
+    OPERATION = 2
+    CALL = 3
+    AND = 4
+    OR = 5
+    CONDITIONAL = 6
+
+
+def _unchanged(old, new) -> bool:
+    """Determines whether a recomputed value is indistinguishable from the memoized value, so the nodes depending on
+    it need not be recomputed. Errors always count as changed, and so do zeros of different sign, since they divide
+    and compare differently in functions like atan2.
+
+    :returns True if the values are the same
+    """
+    if type(old) is not type(new) or isinstance(new, Exception):
+        return False
+    elif type(new) is float:
+        return old == new and (new != 0 or math.copysign(1.0, old) == math.copysign(1.0, new))
+    elif type(new) in (int, bool, Fraction):
+        return old == new
+    else:
+        return repr(old) == repr(new)
+
+
+class IncrementalEvaluator:
+    """Evaluates a compiled expression repeatedly while its variables change a few at a time. The value of every node
+    of the tree is memoized. set() marks the nodes depending on a changed variable as stale, and value() brings the
+    stale nodes the root needs up to date, recomputing only those with an operand whose value changed. Like the jumps
+    of a CompiledExpression, the operands which boolean operations and conditionals skip are not brought up to date,
+    so they neither cost work nor raise. Errors are memoized like values and raised when they reach the root."""
+    __compiled: CompiledExpression
+    __nodes: list
+    __parents: list
+    __values: list
+    __variables: dict
+    __unbound: set
+    __stale: set
+    __changed: list
+    __checked: list
+    __tick: int
+    __recomputed: int
+
+    def __init__(self, compiled: CompiledExpression, variables: Mapping = None):
+        """Initializes fields and builds the nodes from the tree of the compiled expression in postfix order, so each
+        node comes after the nodes it depends on. Nodes which occur in the tree more than once are built once.
+
+        :param compiled: The expression to evaluate
+        :param variables: The initial values of the variables. Variables can also be set with set()
+        :raises ValueError if the expression calls impure functions, whose value can not be memoized
+        """
+        if not compiled.pure:
+            raise ValueError('Expected an expression calling only pure functions')
+        self.__compiled = compiled
+        self.__nodes = []
+        self.__parents = []
+        self.__values = []
+        self.__variables = {}
+        self.__build(compiled.tree, compiled.backend.operations)
+        self.__unbound = set(self.__variables)
+        self.__stale = {index for index, (kind, _, _) in enumerate(self.__nodes)
+                        if kind is not _Kind.NUMBER and kind is not _Kind.VARIABLE}
+        # The tick at which the value of each node last changed, and at which each node was last brought up to date
+        self.__changed = [0] * len(self.__nodes)
+        self.__checked = [-1] * len(self.__nodes)
+        self.__tick = 0
+        self.__recomputed = 0
+        if variables is not None:
+            self.update(variables)
+
+    def __build(self, tree, operations: type):
+        """Builds the nodes of a tree using an explicit stack, so the depth of the tree is not limited by recursion
+
+        :param operations: The Operations class whose operations replace those of the tree
+        """
+        indexes = {}
+        pending = [(tree, False)]
+        while pending:
+            node, children_built = pending.pop()
+            if id(node) in indexes:
+                continue
+            if isinstance(node, Variable):
+                if node.name not in self.__variables:
+                    self.__variables[node.name] = self.__add(_Kind.VARIABLE, node.name, (), None)
+                indexes[id(node)] = self.__variables[node.name]
+                continue
+            elif isinstance(node, Number):
+                indexes[id(node)] = self.__add(_Kind.NUMBER, None, (), node.value)
+                continue
+
+            if isinstance(node, (UnaryOperation, BinaryOperation)):
+                children = (node.operand,) if isinstance(node, UnaryOperation) else (node.left, node.right)
+            elif isinstance(node, FunctionCall):
+                children = node.arguments
+            elif isinstance(node, BooleanOperation):
+                children = (node.left, node.right)
+            else:
+                children = (node.condition, node.if_true, node.if_false)
+            if not children_built:
+                pending.append((node, True))
+                pending.extend((child, False) for child in reversed(children))
+                continue
+
+            children = tuple(indexes[id(child)] for child in children)
+            if isinstance(node, (UnaryOperation, BinaryOperation)):
+                operation = node.operation
+                if operations is not Operations:
+                    operation = getattr(operations, operation.__name__)
+                indexes[id(node)] = self.__add(_Kind.OPERATION, operation, children, None)
+            elif isinstance(node, FunctionCall):
+                indexes[id(node)] = self.__add(_Kind.CALL, partial(operations.call, node.function), children, None)
+            elif isinstance(node, BooleanOperation):
+                kind = _Kind.AND if node.operator == 'and' else _Kind.OR
+                indexes[id(node)] = self.__add(kind, None, children, None)
+            else:
+                indexes[id(node)] = self.__add(_Kind.CONDITIONAL, None, children, None)
+
+    def __add(self, kind: _Kind, argument, children: tuple, value) -> int:
+        """Adds a node depending on the children, which must already have been added
+
+        :returns The index of the node
+        """
+        index = len(self.__nodes)
+        self.__nodes.append((kind, argument, children))
+        self.__parents.append([])
+        self.__values.append(value)
+        for child in set(children):
+            self.__parents[child].append(index)
+        return index
+
+    @property
+    def variables(self) -> tuple:
+        """The names of the variables in the expression"""
+        return tuple(self.__variables)
+
+    @property
+    def recomputed(self) -> int:
+        """The number of nodes recomputed by the last call of value()"""
+        return self.__recomputed
+
+    def set(self, name: str, value):
+        """Sets the value of a variable. The nodes depending on it are recomputed by the next call of value(), unless
+        the value did not change.
+
+        :raises ValueError if the expression has no variable with the name
+        """
+        try:
+            index = self.__variables[name]
+        except KeyError:
+            raise ValueError(f'The expression has no variable {name!r}') from None
+        if name in self.__unbound:
+            self.__unbound.discard(name)
+        elif _unchanged(self.__values[index], value):
+            return
+        self.__values[index] = value
+        self.__tick += 1
+        self.__changed[index] = self.__tick
+        self.__mark_stale(index)
+
+    def update(self, variables: Mapping):
+        """Sets the values of several variables, see set()"""
+        for name, value in variables.items():
+            self.set(name, value)
+
+    def value(self) -> float or int:
+        """Brings the nodes the root needs up to date and returns the value of the expression
+
+        :raises UnboundVariableError if a variable has not been set
+        :raises DivisionByZeroError if the expression divides by zero
+        :raises NonRealResultError if the expression evaluates to a complex number
+        :raises OverflowError if a result is too large to represent
+        :returns The value of the expression, normalized by the backend
+        """
+        if self.__unbound:
+            raise UnboundVariableError(f'No value bound for variable {sorted(self.__unbound)[0]!r}')
+        backend = self.__compiled.backend
+        self.__recomputed = 0
+        if self.__stale:
+            if backend.context is None:
+                self.__refresh(len(self.__nodes) - 1)
+            else:
+                with backend.evaluating():
+                    self.__refresh(len(self.__nodes) - 1)
+        result = self.__values[-1]
+        if isinstance(result, Exception):
+            raise result.with_traceback(None)
+        return backend.normalize(result)
+
+    def __refresh(self, root: int):
+        """Brings a node up to date using an explicit stack, first bringing up to date the operands it needs: every
+        operand of operations and calls, and the first operand of boolean operations and conditionals followed by
+        the operand it selects. A node is only recomputed if one of those operands changed since it was last brought
+        up to date. Errors are memoized as the value of the node which raised them, and passed on to the nodes using
+        that value."""
+        operation_kind, call_kind, and_kind, conditional_kind = _Kind.OPERATION, _Kind.CALL, _Kind.AND, \
+            _Kind.CONDITIONAL
+        nodes, values, stale, changed, checked = self.__nodes, self.__values, self.__stale, self.__changed, \
+            self.__checked
+        tick = self.__tick
+        recomputed = 0
+        # Indexes of nodes to bring up to date, and complemented indexes of nodes to finish once their operands are
+        pending = [root]
+        while pending:
+            index = pending.pop()
+            if index < 0:
+                index = ~index
+            elif index not in stale:
+                continue
+            kind, argument, children = nodes[index]
+            calculated = kind is operation_kind or kind is call_kind
+            if calculated:
+                up_to_date = True
+                for child in children:
+                    if child in stale:
+                        if up_to_date:
+                            pending.append(~index)
+                            up_to_date = False
+                        pending.append(child)
+                if not up_to_date:
+                    continue
+                needed = children
+            else:
+                first = children[0]
+                if first in stale:
+                    pending.append(~index)
+                    pending.append(first)
+                    continue
+                # The first operand is up to date, and selects the operand the node needs
+                value = values[first]
+                if isinstance(value, Exception):
+                    selected = None
+                elif kind is conditional_kind:
+                    selected = children[1] if value else children[2]
+                else:
+                    selected = children[1] if bool(value) is (kind is and_kind) else None
+                if selected is None:
+                    needed = (first,)
+                elif selected in stale:
+                    pending.append(~index)
+                    pending.append(selected)
+                    continue
+                else:
+                    needed = (first, selected)
+
+            stale.discard(index)
+            last_checked = checked[index]
+            checked[index] = tick
+            for child in needed:
+                if changed[child] > last_checked:
+                    break
+            else:
+                continue
+            recomputed += 1
+            if calculated:
+                operands = [values[child] for child in needed]
+                for operand in operands:
+                    if isinstance(operand, Exception):
+                        value = operand
+                        break
+                else:
+                    try:
+                        value = argument(*operands) if kind is operation_kind else argument(operands)
+                    except Exception as e:
+                        value = e
+            else:
+                value = values[needed[-1]]
+            if not _unchanged(values[index], value):
+                values[index] = value
+                tick += 1
+                changed[index] = checked[index] = tick
+        self.__tick = tick
+        self.__recomputed = recomputed
+
+    def __mark_stale(self, index: int):
+        """Marks the nodes depending on a node as stale, stopping at nodes which already are, since the nodes
+        depending on them were marked with them"""
+        parents, stale = self.__parents, self.__stale
+        pending = [index]
+        while pending:
+            for parent in parents[pending.pop()]:
+                if parent not in stale:
+                    stale.add(parent)
+                    pending.append(parent)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+from functools import partial
+from collections.abc import Callable
+from numbers import Rational
+
+from dt042g_src.calculator import FLOAT_BACKEND, BinaryOperation, BooleanOperation, CalculationError, \
+    CompiledExpression, Conditional, FunctionCall, Node, Number, Operations, UnaryOperation, Variable
+
+_RIGHT_IDENTITIES = {
+    Operations.add: 0,
+    Operations.subtract: 0,
+    Operations.multiply: 1,
+    Operations.divide: 1,
+    Operations.exponentiation: 1,
+}
+_LEFT_IDENTITIES = {
+    Operations.add: 0,
+    Operations.multiply: 1,
+}
+
+
+def transform(tree: Node, rewrite: Callable) -> Node:
+    """Rebuilds a tree bottom-up using an explicit stack, so the depth of the tree is not limited by recursion.
+    Each node is passed to rewrite after its operands have been rewritten, and unchanged nodes are reused.
+
+    :param tree: The tree to transform
+    :param rewrite: Returns the node which replaces the given node
+    :returns The transformed tree
+    """
+    results = []
+    pending = [(tree, False)]
+    while pending:
+        node, operands_rewritten = pending.pop()
+        if isinstance(node, UnaryOperation):
+            if operands_rewritten:
+                operand = results.pop()
+                if operand is not node.operand:
+                    node = UnaryOperation(node.operation, operand)
+                results.append(rewrite(node))
+            else:
+                pending.extend(((node, True), (node.operand, False)))
+        elif isinstance(node, BinaryOperation):
+            if operands_rewritten:
+                right = results.pop()
+                left = results.pop()
+                if left is not node.left or right is not node.right:
+                    node = BinaryOperation(node.operation, left, right)
+                results.append(rewrite(node))
+            else:
+                pending.extend(((node, True), (node.right, False), (node.left, False)))
+        elif isinstance(node, BooleanOperation):
+            if operands_rewritten:
+                right = results.pop()
+                left = results.pop()
+                if left is not node.left or right is not node.right:
+                    node = BooleanOperation(node.operator, left, right)
+                results.append(rewrite(node))
+            else:
+                pending.extend(((node, True), (node.right, False), (node.left, False)))
+        elif isinstance(node, Conditional):
+            if operands_rewritten:
+                if_false = results.pop()
+                if_true = results.pop()
+                condition = results.pop()
+                if condition is not node.condition or if_true is not node.if_true or if_false is not node.if_false:
+                    node = Conditional(condition, if_true, if_false)
+                results.append(rewrite(node))
+            else:
+                pending.extend(((node, True), (node.if_false, False), (node.if_true, False), (node.condition, False)))
+        elif isinstance(node, FunctionCall):
+            if operands_rewritten:
+                arguments = tuple(results[-len(node.arguments):])
+                del results[-len(node.arguments):]
+                if any(argument is not original for argument, original in zip(arguments, node.arguments)):
+                    node = FunctionCall(node.function, arguments)
+                results.append(rewrite(node))
+            else:
+                pending.append((node, True))
+                pending.extend((argument, False) for argument in reversed(node.arguments))
+        else:
+            results.append(rewrite(node))
+    return results[0]
+
+
+def simplify_node(node: Node, operations=Operations) -> Node:
+    """Folds an operation or a call of a pure function on numbers into a number, and removes identity operations
+    (x+0, 0+x, x-0, x*1, 1*x, x/1, x^1) and double negations. Operations and calls which raise an error, like a
+    division by zero or a result beyond the Limits of the backend, are kept so the error surfaces when the expression
+    is evaluated. Conditionals and boolean operations deciding on a number are replaced by the operand they evaluate
+    to.
+
+    :param operations: The Operations class of the backend, whose operations fold numbers
+    :returns The simplified node, or the node itself if it can not be simplified
+    """
+    if isinstance(node, UnaryOperation):
+        operand = node.operand
+        if isinstance(operand, Number):
+            try:
+                return Number(getattr(operations, node.operation.__name__)(operand.value))
+            except (ArithmeticError, CalculationError):
+                return node
+        if node.operation is Operations.negate and isinstance(operand, UnaryOperation) \
+                and operand.operation is Operations.negate:
+            return operand.operand
+    elif isinstance(node, BinaryOperation):
+        left, right = node.left, node.right
+        if isinstance(left, Number) and isinstance(right, Number):
+            try:
+                return Number(getattr(operations, node.operation.__name__)(left.value, right.value))
+            except (ArithmeticError, CalculationError):
+                return node
+        if isinstance(right, Number) and _RIGHT_IDENTITIES.get(node.operation) == right.value:
+            return left
+        if isinstance(left, Number) and _LEFT_IDENTITIES.get(node.operation) == left.value:
+            return right
+    elif isinstance(node, FunctionCall):
+        if node.function.pure and all(isinstance(argument, Number) for argument in node.arguments):
+            try:
+                return Number(operations.call(node.function, [argument.value for argument in node.arguments]))
+            except (ArithmeticError, TypeError, ValueError):
+                return node
+    elif isinstance(node, BooleanOperation):
+        if isinstance(node.left, Number):
+            if bool(node.left.value) is (node.operator == 'or'):
+                return node.left
+            else:
+                return node.right
+    elif isinstance(node, Conditional):
+        if isinstance(node.condition, Number):
+            return node.if_true if node.condition.value else node.if_false
+    return node
+
+
+def simplify(tree: Node, backend=None) -> Node:
+    """Simplifies every node of a tree bottom-up with simplify_node(), so constant subtrees fold into a number
+
+    :param backend: The NumericBackend the numbers of the tree were converted with, which folds them the way the
+    compiled program would calculate them. Defaults to FLOAT_BACKEND
+    :returns The simplified tree
+    """
+    backend = backend if backend is not None else FLOAT_BACKEND
+    with backend.evaluating():
+        return transform(tree, partial(simplify_node, operations=backend.operations))
+
+
+def structure_key(node: Node) -> tuple or None:
+    """Returns a key which is equal for nodes of the same structure, given that their operands are the same objects
+    when they are of the same structure. Numbers are keyed by type and repr, since equal numbers like 0.0 and -0.0
+    or Decimal('1') and Decimal('1.0') can calculate different results, except for rational numbers like ints, which
+    are keyed by value since they calculate alike when equal and the repr of a large int raises ValueError.
+
+    :returns The key, or None for calls of impure functions, which may return different values for each call
+    """
+    if isinstance(node, Number):
+        value = node.value
+        return Number, type(value), value if isinstance(value, Rational) else repr(value)
+    elif isinstance(node, Variable):
+        return Variable, node.name
+    elif isinstance(node, UnaryOperation):
+        return UnaryOperation, node.operation, id(node.operand)
+    elif isinstance(node, BinaryOperation):
+        return BinaryOperation, node.operation, id(node.left), id(node.right)
+    elif isinstance(node, BooleanOperation):
+        return BooleanOperation, node.operator, id(node.left), id(node.right)
+    elif isinstance(node, Conditional):
+        return Conditional, id(node.condition), id(node.if_true), id(node.if_false)
+    elif node.function.pure:
+        return (FunctionCall, node.function) + tuple(id(argument) for argument in node.arguments)
+    else:
+        return None
+
+
+def share_subtrees(tree: Node) -> Node:
+    """Interns subtrees of the same structure bottom-up with transform(), so each distinct subtree is a single object
+    and the tree becomes a directed acyclic graph. A CompiledExpression calculates a shared subtree once per
+    evaluation. Calls of impure functions, and the subtrees containing them, are not shared.
+
+    :returns The tree with shared subtrees
+    """
+    interned = {}
+
+    def intern(node: Node) -> Node:
+        key = structure_key(node)
+        if key is None:
+            return node
+        return interned.setdefault(key, node)
+
+    return transform(tree, intern)
+
+
+def count_nodes(tree: Node) -> tuple:
+    """Counts the nodes of a tree, once for each time they occur and once for each distinct object
+
+    :returns The number of nodes of the tree, and the number of distinct nodes
+    """
+    occurrences = 0
+    distinct = set()
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        occurrences += 1
+        distinct.add(id(node))
+        if isinstance(node, UnaryOperation):
+            pending.append(node.operand)
+        elif isinstance(node, (BinaryOperation, BooleanOperation)):
+            pending.extend((node.left, node.right))
+        elif isinstance(node, Conditional):
+            pending.extend((node.condition, node.if_true, node.if_false))
+        elif isinstance(node, FunctionCall):
+            pending.extend(node.arguments)
+    return occurrences, len(distinct)
+
+
+def optimize(compiled: CompiledExpression) -> CompiledExpression:
+    """Compiles the simplified tree of a compiled expression, with its subtrees of the same structure shared. The
+    result evaluates to the same value with the same variables, in the same order, and raises the same errors.
+
+    :returns The optimized compiled expression
+    """
+    tree = share_subtrees(simplify(compiled.tree, compiled.backend))
+    return CompiledExpression(compiled.expression, tree, compiled.backend, compiled.variables)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from dt042g_src.calculator import calculate_lines
+
+WORKER_CRASHED = 'Worker process crashed while calculating the expression'
+
+
+def _calculate_chunk(chunk: list, iterative: bool) -> list:
+    """Calculates a chunk of lines in a worker process
+
+    :returns The (expression, result, error) tuples of calculate_lines()
+    """
+    return list(calculate_lines(chunk, iterative))
+
+
+def _chunks(lines: Iterable, chunk_size: int) -> Iterator:
+    """Lazily groups lines into lists of chunk_size lines"""
+    lines = iter(lines)
+    chunk = list(islice(lines, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(lines, chunk_size))
+
+
+class ParallelCalculator:
+    """Calculates newline-delimited expressions in a pool of worker processes. Lines are dispatched in chunks, with a
+    bounded number of chunks in flight so memory use does not grow with the input. If a worker process crashes, the
+    pool is replaced, the chunk being waited for is recalculated alone in the new pool, and the other unfinished
+    chunks are resubmitted. Only the lines of a chunk which crashes a worker on its own are reported as errors."""
+    _worker = staticmethod(_calculate_chunk)
+    __workers: int
+    __chunk_size: int
+    __ordered: bool
+    __iterative: bool
+    __executor: ProcessPoolExecutor or None
+
+    def __init__(self, workers=None, chunk_size=1024, ordered=True, iterative=False):
+        """Initializes fields
+
+        :param workers: The number of worker processes. Defaults to the number of CPUs
+        :param chunk_size: The number of lines dispatched to a worker at a time
+        :param ordered: Whether results are yielded in the order of the lines. Unordered results are yielded as soon
+        as any chunk is done, which keeps the workers busier
+        :param iterative: Whether to parse without recursion, see Calculator
+        :raises ValueError if workers or chunk_size is not positive
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers < 1 or chunk_size < 1:
+            raise ValueError(f'Expected positive workers and chunk_size, got {workers} and {chunk_size}')
+        self.__workers = workers
+        self.__chunk_size = chunk_size
+        self.__ordered = ordered
+        self.__iterative = iterative
+        self.__executor = None
+
+    def calculate(self, lines: Iterable) -> Iterator:
+        """Lazily calculates the lines in the worker processes
+
+        :param lines: The lines to calculate, such as an open file
+        :returns An iterator of the (expression, result, error) tuples of calculate_lines()
+        """
+        self.__executor = ProcessPoolExecutor(self.__workers)
+        in_flight = deque()
+        try:
+            chunks = _chunks(lines, self.__chunk_size)
+            if self.__ordered:
+                yield from self.__calculate_ordered(chunks, in_flight)
+            else:
+                yield from self.__calculate_unordered(chunks, in_flight)
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+            self.__executor.shutdown()
+
+    def __calculate_ordered(self, chunks: Iterator, in_flight: deque) -> Iterator:
+        """Yields the results of each chunk in the order of the chunks"""
+        for chunk in chunks:
+            in_flight.append((chunk, self.__submit(chunk)))
+            if len(in_flight) >= 2 * self.__workers:
+                yield from self.__result(*in_flight.popleft(), in_flight)
+        while in_flight:
+            yield from self.__result(*in_flight.popleft(), in_flight)
+
+    def __calculate_unordered(self, chunks: Iterator, in_flight: deque) -> Iterator:
+        """Yields the results of each chunk as soon as it is done"""
+        chunks_left = True
+        while chunks_left or in_flight:
+            while chunks_left and len(in_flight) < 2 * self.__workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    chunks_left = False
+                else:
+                    in_flight.append((chunk, self.__submit(chunk)))
+            if in_flight:
+                wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+                done = next(i for i, (_, future) in enumerate(in_flight) if future.done())
+                chunk, future = in_flight[done]
+                del in_flight[done]
+                yield from self.__result(chunk, future, in_flight)
+
+    def __submit(self, chunk: list):
+        """Submits a chunk to the pool
+
+        :returns The future of the results of the chunk
+        """
+        return self.__executor.submit(self._worker, chunk, self.__iterative)
+
+    def __result(self, chunk: list, future, in_flight: deque) -> list:
+        """Waits for the results of a chunk, recovering from a crashed worker process
+
+        :param chunk: The lines of the chunk
+        :param future: The future of the results of the chunk
+        :param in_flight: The other chunks in flight, which are resubmitted if the pool is replaced
+        :returns The (expression, result, error) tuples of the chunk
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self.__replace_executor()
+            try:
+                results = self.__submit(chunk).result()
+            except BrokenProcessPool:
+                self.__replace_executor()
+                results = [(line.strip(), None, WORKER_CRASHED) for line in chunk if line.strip()]
+            for i, (other_chunk, other_future) in enumerate(in_flight):
+                if other_future.cancelled() or not other_future.done() or other_future.exception() is not None:
+                    in_flight[i] = (other_chunk, self.__submit(other_chunk))
+            return results
+
+    def __replace_executor(self):
+        """Replaces the broken pool with a new one"""
+        self.__executor.shutdown(wait=False)
+        self.__executor = ProcessPoolExecutor(self.__workers)
+
+
+def calculate_parallel(lines: Iterable, workers=None, chunk_size=1024, ordered=True, iterative=False) -> Iterator:
+    """Lazily calculates newline-delimited expressions in a pool of worker processes, see ParallelCalculator
+
+    :returns An iterator of the (expression, result, error) tuples of calculate_lines()
+    """
+    return ParallelCalculator(workers, chunk_size, ordered, iterative).calculate(lines)
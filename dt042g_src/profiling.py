@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+
+import json
+import sys
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Iterator
+from time import perf_counter
+
+from dt042g_src.calculator import CompiledExpression, NumericBackend, Operations, Token
+
+_SECONDS_BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_SIZE_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10_000, 100_000, 1_000_000)
+STAGES = ('tokenize', 'parse', 'flatten', 'evaluate')
+
+
+class Histogram:
+    """Counts observations in buckets with upper bounds, and their sum and maximum, like a Prometheus histogram"""
+    __bounds: tuple
+    __counts: list
+    __sum: float or int
+    __max: float or int or None
+
+    def __init__(self, bounds: tuple):
+        """Initializes fields
+
+        :param bounds: The ascending upper bounds of the buckets. Larger observations are counted in a last,
+        unbounded bucket
+        """
+        self.__bounds = bounds
+        self.__counts = [0] * (len(bounds) + 1)
+        self.__sum = 0
+        self.__max = None
+
+    def observe(self, value: float or int):
+        """Counts an observation in the first bucket whose upper bound is not below it"""
+        self.__counts[bisect_left(self.__bounds, value)] += 1
+        self.__sum += value
+        if self.__max is None or value > self.__max:
+            self.__max = value
+
+    @property
+    def count(self) -> int:
+        """The number of observations"""
+        return sum(self.__counts)
+
+    @property
+    def sum(self) -> float or int:
+        """The sum of the observations"""
+        return self.__sum
+
+    @property
+    def max(self) -> float or int or None:
+        """The largest observation, or None if there are none"""
+        return self.__max
+
+    def buckets(self) -> list:
+        """Returns the cumulative counts of the buckets
+
+        :returns A list of (upper bound, number of observations not above it) pairs, ending with an infinite bound
+        """
+        buckets = []
+        cumulative = 0
+        for bound, count in zip(self.__bounds + (float('inf'),), self.__counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
+
+    def as_dict(self) -> dict:
+        """Returns the histogram as a JSON serializable mapping, with bucket bounds as strings"""
+        return {'count': self.count, 'sum': self.__sum, 'max': self.__max,
+                'buckets': {_format_bound(bound): count for bound, count in self.buckets()}}
+
+
+def _format_bound(bound: float or int) -> str:
+    """Formats the upper bound of a bucket like Prometheus, as +Inf or a number"""
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+class TokenTrace:
+    """Iterates the Tokens of an expression, counting them and timing the tokenizer, and records the depth of the
+    calls of the parser below the frame which started parsing when each Token is requested"""
+    __tokens: Iterator
+    __root: object
+    count: int
+    seconds: float
+    overhead: float
+    depth: int
+
+    def __init__(self, tokens: Iterator, root):
+        """Initializes fields
+
+        :param tokens: The Tokens of the expression
+        :param root: The frame which parses the expression, from which the depth of the parser is measured
+        """
+        self.__tokens = tokens
+        self.__root = root
+        self.count = 0
+        self.seconds = 0.0
+        self.overhead = 0.0
+        self.depth = 0
+
+    def __iter__(self):
+        """Returns the trace itself, since it is an iterator"""
+        return self
+
+    def __next__(self) -> Token:
+        """Returns the next Token
+
+        :raises StopIteration if the expression has no more Tokens
+        """
+        start = perf_counter()
+        depth = 0
+        frame = sys._getframe(1)
+        while frame is not None and frame is not self.__root:
+            depth += 1
+            frame = frame.f_back
+        self.depth = max(self.depth, depth)
+        tokenizing = perf_counter()
+        self.overhead += tokenizing - start
+        try:
+            token = next(self.__tokens)
+        finally:
+            self.seconds += perf_counter() - tokenizing
+        self.count += 1
+        return token
+
+    def close(self):
+        """Releases the frame which parsed the expression"""
+        self.__root = None
+
+
+class Profiler:
+    """Records how the expressions calculated by Calculators given this profiler spend their time: the time of each
+    stage, the number of Tokens and the maximum recursion depth of the parser per expression, and the number of calls
+    of each Operations method. Calculators without a profiler skip all of it."""
+    __stages: dict
+    __tokens: Histogram
+    __depths: Histogram
+    __operations: Counter
+    __counting_operations: dict
+
+    def __init__(self):
+        """Initializes fields"""
+        self.__stages = {stage: Histogram(_SECONDS_BOUNDS) for stage in STAGES}
+        self.__tokens = Histogram(_SIZE_BOUNDS)
+        self.__depths = Histogram(_SIZE_BOUNDS)
+        self.__operations = Counter()
+        self.__counting_operations = {}
+
+    @property
+    def stages(self) -> dict:
+        """A mapping of stage names to Histograms of their durations in seconds"""
+        return dict(self.__stages)
+
+    @property
+    def tokens(self) -> Histogram:
+        """A Histogram of the number of Tokens per expression"""
+        return self.__tokens
+
+    @property
+    def depths(self) -> Histogram:
+        """A Histogram of the maximum recursion depth of the parser per expression"""
+        return self.__depths
+
+    @property
+    def operations(self) -> dict:
+        """A mapping of Operations method names to the number of times they were called"""
+        return dict(self.__operations)
+
+    def trace(self, tokens: Iterator) -> TokenTrace:
+        """Wraps the Tokens of an expression which is about to be parsed by the caller
+
+        :returns The TokenTrace to parse instead, to pass to record_compile() once parsed
+        """
+        return TokenTrace(tokens, sys._getframe(1))
+
+    def counting(self, backend: NumericBackend) -> NumericBackend:
+        """Returns a copy of the backend whose operations count their calls in this profiler"""
+        operations = self.__counting_operations.get(backend.operations)
+        if operations is None:
+            operations = self.__counting_operations[backend.operations] = self.__count(backend.operations)
+        return backend._replace(operations=operations)
+
+    def __count(self, operations: type) -> type:
+        """Creates a subclass of the Operations class whose methods count their calls"""
+        counts = self.__operations
+
+        def counting(name, operation):
+            def count(*arguments):
+                counts[name] += 1
+                return operation(*arguments)
+            count.__name__ = name
+            return staticmethod(count)
+
+        methods = {name: counting(name, getattr(operations, name)) for name in dir(Operations)
+                   if not name.startswith('_')}
+        return type(f'Counting{operations.__name__}', (operations,), methods)
+
+    def record_compile(self, tokens: TokenTrace, parse_seconds: float, flatten_seconds: float):
+        """Records the compilation of an expression
+
+        :param tokens: The trace of the Tokens the expression was parsed from
+        :param parse_seconds: The time spent parsing, including the time spent in the trace
+        :param flatten_seconds: The time spent flattening the tree into a program
+        """
+        self.__stages['tokenize'].observe(tokens.seconds)
+        self.__stages['parse'].observe(max(parse_seconds - tokens.seconds - tokens.overhead, 0.0))
+        self.__stages['flatten'].observe(flatten_seconds)
+        self.__tokens.observe(tokens.count)
+        self.__depths.observe(tokens.depth)
+        tokens.close()
+
+    def evaluate(self, compiled: CompiledExpression, variables=()) -> float or int:
+        """Evaluates a compiled expression and records the time spent
+
+        :returns The value of CompiledExpression.evaluate()
+        """
+        start = perf_counter()
+        try:
+            return compiled.evaluate(variables)
+        finally:
+            self.__stages['evaluate'].observe(perf_counter() - start)
+
+    def as_dict(self) -> dict:
+        """Returns the recorded profile as a JSON serializable mapping"""
+        return {
+            'stages': {stage: histogram.as_dict() for stage, histogram in self.__stages.items()},
+            'tokens': self.__tokens.as_dict(),
+            'recursion_depth': self.__depths.as_dict(),
+            'operations': dict(sorted(self.__operations.items())),
+        }
+
+    def to_json(self) -> str:
+        """Formats the recorded profile as JSON"""
+        return json.dumps(self.as_dict(), indent=2) + '\n'
+
+    def to_prometheus(self, prefix='calculator') -> str:
+        """Formats the recorded profile in the Prometheus text exposition format
+
+        :param prefix: The prefix of the metric names
+        """
+        lines = [f'# HELP {prefix}_stage_seconds Time spent in each stage of calculating an expression',
+                 f'# TYPE {prefix}_stage_seconds histogram']
+        for stage, histogram in self.__stages.items():
+            lines += self.__prometheus_histogram(f'{prefix}_stage_seconds', histogram, f'stage="{stage}",')
+        for name, help_text, histogram in ((f'{prefix}_tokens', 'Tokens per expression', self.__tokens),
+                                           (f'{prefix}_recursion_depth', 'Maximum recursion depth of the parser',
+                                            self.__depths)):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            lines += self.__prometheus_histogram(name, histogram, '')
+        lines += [f'# HELP {prefix}_operations_total Calls of each operation',
+                  f'# TYPE {prefix}_operations_total counter']
+        lines += [f'{prefix}_operations_total{{operation="{operation}"}} {count}'
+                  for operation, count in sorted(self.__operations.items())]
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def __prometheus_histogram(name: str, histogram: Histogram, labels: str) -> list:
+        """Formats the bucket, sum and count samples of a histogram
+
+        :param labels: Labels shared by the samples, each followed by a comma
+        """
+        lines = [f'{name}_bucket{{{labels}le="{_format_bound(bound)}"}} {count}'
+                 for bound, count in histogram.buckets()]
+        labels = f'{{{labels.rstrip(",")}}}' if labels else ''
+        return lines + [f'{name}_sum{labels} {histogram.sum}', f'{name}_count{labels} {histogram.count}']
+
+    def format_report(self) -> str:
+        """Formats the recorded profile as a human readable breakdown"""
+        lines = [f'{"stage":<10}{"count":>8}{"total ms":>12}{"mean us":>12}{"max us":>12}']
+        for stage, histogram in self.__stages.items():
+            mean = histogram.sum / histogram.count if histogram.count else 0
+            lines.append(f'{stage:<10}{histogram.count:>8}{histogram.sum * 1e3:>12.3f}{mean * 1e6:>12.2f}'
+                         f'{(histogram.max or 0) * 1e6:>12.2f}')
+        for name, histogram in (('tokens', self.__tokens), ('recursion depth', self.__depths)):
+            mean = histogram.sum / histogram.count if histogram.count else 0
+            lines.append(f'{name}: mean {mean:.1f}, max {histogram.max or 0}')
+        operations = ', '.join(f'{operation} {count}' for operation, count in sorted(self.__operations.items()))
+        lines.append(f'operations: {operations or "none"}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, output_format='text') -> str:
+        """Formats the recorded profile
+
+        :param output_format: 'text' for format_report(), 'json' for to_json() or 'prometheus' for to_prometheus()
+        :raises ValueError if the format is unknown
+        """
+        if output_format == 'text':
+            return self.format_report()
+        elif output_format == 'json':
+            return self.to_json()
+        elif output_format == 'prometheus':
+            return self.to_prometheus()
+        raise ValueError(f'Unknown profile format {output_format!r}')
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from concurrent.futures import Executor
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dt042g_src.cache import ExpressionCache
+from dt042g_src.calculator import UNTRUSTED_LIMITS, CalculationError, LimitExceededError, Limits, __version__, \
+    format_text_line
+
+__desc__ = 'Serves calculations over persistent TCP or Unix socket connections, one request per line'
+
+# Ints of at most this many bits have fewer digits than the lowest limit of int to text conversion Python allows
+_MAX_WRITTEN_BITS = 2000
+
+
+class CalculatorServer:
+    """Calculates requests received over persistent connections. Each line of a connection is a request, either a
+    plain expression answered with an 'expression = result' line, or a JSON object answered with a JSON object:
+
+    {"id": 1, "expression": "a*2", "variables": {"a": 3}} is answered with {"id": 1, "result": 6}
+    {"id": 2, "expressions": ["1+1", "1/0"]} is answered with {"id": 2, "results": [{"result": 2}, {"error": ...}]}
+
+    Errors are answered with an "error" message, and a "position" if it is known. Requests can be pipelined, and are
+    answered in order. Expressions are compiled through a shared ExpressionCache, and batches larger than
+    batch_threshold are calculated in an executor so they do not block other connections. Expressions exceeding the
+    limits, and variables which are not finite numbers within them, are answered with an error instead of being
+    calculated, and results which are not finite numbers with an error instead of invalid JSON."""
+    __cache: ExpressionCache
+    __executor: Executor or None
+    __batch_threshold: int
+    __limit: int
+    __limits: Limits or None
+
+    def __init__(self, cache=None, executor=None, batch_threshold=64, limit=2 ** 20, limits=UNTRUSTED_LIMITS):
+        """Initializes fields
+
+        :param cache: The ExpressionCache to compile expressions through. Defaults to a new cache
+        :param executor: The executor to calculate large batches in. Defaults to the executor of the event loop
+        :param batch_threshold: The number of expressions above which a batch is calculated in the executor
+        :param limit: The maximum length in bytes of a request line
+        :param limits: The Limits expressions are calculated with, or None to calculate them without limits
+        """
+        self.__cache = cache if cache is not None else ExpressionCache()
+        self.__executor = executor
+        self.__batch_threshold = batch_threshold
+        self.__limit = limit
+        self.__limits = limits
+
+    async def start(self, host='127.0.0.1', port=0) -> asyncio.AbstractServer:
+        """Starts listening for TCP connections
+
+        :param port: The port to listen on, or 0 for any free port
+        :returns The started server, whose sockets have the bound address
+        """
+        return await asyncio.start_server(self.handle_connection, host, port, limit=self.__limit)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        """Starts listening for Unix socket connections
+
+        :param path: The path of the socket
+        :returns The started server
+        """
+        return await asyncio.start_unix_server(self.handle_connection, path, limit=self.__limit)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answers the requests of a connection, one line at a time, until the client closes it"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(self.__json_line({'id': None, 'error': 'Request line too long'}).encode())
+                    break
+                if not line:
+                    break
+                try:
+                    request = line.decode()
+                except UnicodeDecodeError as e:
+                    writer.write(self.__json_line({'id': None, 'error': f'Invalid UTF-8 request: {e}'}).encode())
+                    continue
+                writer.write((await self.respond(request)).encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request: str) -> str:
+        """Answers a single request line
+
+        :returns The response line
+        """
+        request = request.strip()
+        if not request.startswith('{'):
+            result = self.calculate(request)
+            return format_text_line(request, result.get('result'), result.get('error'))
+        try:
+            request = json.loads(request)
+        except ValueError as e:
+            return self.__json_line({'id': None, 'error': f'Invalid JSON request: {e}'})
+        if not isinstance(request, dict):
+            return self.__json_line({'id': None, 'error': 'Expected a JSON object'})
+
+        response = {'id': request.get('id')}
+        if isinstance(request.get('expressions'), list):
+            expressions = request['expressions']
+            if len(expressions) > self.__batch_threshold:
+                loop = asyncio.get_running_loop()
+                response['results'] = await loop.run_in_executor(self.__executor, self.calculate_many, expressions)
+            else:
+                response['results'] = self.calculate_many(expressions)
+        else:
+            response.update(self.calculate(request.get('expression'), request.get('variables')))
+        return self.__json_line(response)
+
+    def calculate(self, expression: str, variables=None) -> dict:
+        """Calculates an expression with the given variables
+
+        :returns A mapping of 'result' to the result, or of 'error' to the error message and 'position' to the
+        position of the error if it is known. Results which are not finite numbers, which JSON can not represent, and
+        ints with more digits than can be converted to text are errors, like expressions too deep to parse
+        """
+        if not isinstance(expression, str):
+            return {'error': 'Expected an expression'}
+        try:
+            variables = self.__check_variables(variables)
+            result = self.__cache.compile(expression, limits=self.__limits).evaluate(variables)
+        except CalculationError as e:
+            if e.position is None:
+                return {'error': str(e)}
+            else:
+                return {'error': str(e), 'position': e.position}
+        except (ValueError, TypeError, ArithmeticError) as e:
+            return {'error': str(e)}
+        except RecursionError:
+            return {'error': 'Expected an expression nested shallow enough to parse recursively'}
+        if type(result) is float and not math.isfinite(result):
+            return {'error': f'The result {result} is not a finite number'}
+        if type(result) is int and result.bit_length() > _MAX_WRITTEN_BITS:
+            try:
+                str(result)
+            except ValueError as e:
+                return {'error': str(e)}
+        return {'result': result}
+
+    def __check_variables(self, variables) -> dict or list:
+        """Checks that the variables of a request are an object or array of finite numbers, so values like lists,
+        which the operations would repeat, are not calculated with
+
+        :raises ValueError if the variables are not an object or array, or a value is not an int or finite float
+        :raises LimitExceededError if a value is larger in magnitude than the max_magnitude of the limits
+        :returns The variables, or an empty mapping if there are none
+        """
+        if variables is None:
+            return {}
+        elif isinstance(variables, dict):
+            values = variables.values()
+        elif isinstance(variables, list):
+            values = variables
+        else:
+            raise ValueError('Expected the variables as an object or array')
+        max_magnitude = self.__limits.max_magnitude if self.__limits is not None else None
+        for value in values:
+            if type(value) is not int and (type(value) is not float or not math.isfinite(value)):
+                raise ValueError(f'Expected finite numbers as the values of variables, got {json.dumps(value)}')
+            if max_magnitude is not None and abs(value) > max_magnitude:
+                raise LimitExceededError(f'Expected variables of at most {max_magnitude:g} in magnitude')
+        return variables
+
+    def calculate_many(self, expressions: list) -> list:
+        """Calculates a batch of expressions without variables
+
+        :returns The result mappings of calculate()
+        """
+        return [self.calculate(expression) for expression in expressions]
+
+    @staticmethod
+    def __json_line(response: dict) -> str:
+        """Formats a response as a JSON line"""
+        return json.dumps(response) + '\n'
+
+
+async def serve(host='127.0.0.1', port=8765, path=None, limits=UNTRUSTED_LIMITS):
+    """Serves calculations until cancelled
+
+    :param path: The path of a Unix socket to listen on instead of host and port
+    :param limits: The Limits expressions are calculated with, or None to calculate them without limits
+    """
+    server = CalculatorServer(limits=limits)
+    if path is None:
+        listener = await server.start(host, port)
+    else:
+        listener = await server.start_unix(path)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    """Parses arguments and serves calculations until interrupted"""
+    epilog = 'DT042G Calculator V' + __version__
+    parser = argparse.ArgumentParser(description=__desc__, epilog=epilog, add_help=True)
+    parser.add_argument('--host', dest='host', default='127.0.0.1', help='The host to listen on')
+    parser.add_argument('-p', '--port', dest='port', type=int, default=8765, help='The TCP port to listen on')
+    parser.add_argument('-u', '--unix', dest='path', help='Listen on a Unix socket at this path instead')
+    parser.add_argument('--unlimited', dest='unlimited', action='store_true',
+                        help='Calculate expressions without the resource limits for untrusted clients')
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.path,
+                          None if arguments.unlimited else UNTRUSTED_LIMITS))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
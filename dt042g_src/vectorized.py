@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+import math
+from array import array
+from collections.abc import Mapping, Sequence
+from enum import Enum
+from itertools import repeat
+
+from dt042g_src.calculator import FLOAT_BACKEND, CompiledExpression, DivisionByZeroError, Function, \
+    NonRealResultError, OpCode, Operations
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_JUMPS = (OpCode.JUMP, OpCode.JUMP_IF_FALSE, OpCode.JUMP_IF_FALSE_OR_POP, OpCode.JUMP_IF_TRUE_OR_POP)
+
+
+class ZeroDivisionMode(Enum):
+    """Defines how a division by zero, or zero raised to a negative power, in a single row of a column is handled"""
+    RAISE = 0
+    NAN = 1
+    MASK = 2
+
+
+class ColumnEvaluator:
+    """Evaluates a compiled expression over whole columns of variable values at once, using NumPy arrays where
+    available and array.array columns otherwise"""
+    __compiled: CompiledExpression
+    __zero_division: ZeroDivisionMode
+    __use_numpy: bool
+
+    def __init__(self, compiled: CompiledExpression, zero_division=ZeroDivisionMode.RAISE, use_numpy=None):
+        """Initializes fields
+
+        :param compiled: The expression to evaluate
+        :param zero_division: How a division by zero, or zero raised to a negative power, in a single row is
+        handled. RAISE raises ZeroDivisionError, NAN sets the row to NaN, and MASK sets the row to NaN and flags it in
+        a mask returned with the result
+        :param use_numpy: Whether to evaluate with NumPy. Defaults to True if NumPy is installed
+        :raises ValueError if NumPy is requested but not installed, the expression was not compiled with
+        FLOAT_BACKEND, since columns hold floats, or the expression contains conditionals or boolean operations,
+        whose branches are taken per row
+        """
+        if compiled.backend is not FLOAT_BACKEND:
+            raise ValueError(f'Expected an expression compiled with the float backend, got {compiled.backend.name}')
+        if any(opcode in _JUMPS for opcode, _ in compiled.program):
+            raise ValueError('Expected an expression without conditionals or boolean operations')
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ValueError('NumPy is not installed')
+        self.__compiled = compiled
+        self.__zero_division = zero_division
+        self.__use_numpy = use_numpy
+
+    def evaluate(self, columns: Mapping or Sequence):
+        """Evaluates the expression for every row of the columns, executing each instruction of the program
+        once for the whole column
+
+        :param columns: A mapping of variable names to columns of values, or a sequence of columns in the order of
+        the variables of the compiled expression
+        :raises ValueError if a variable has no column, the columns differ in length or the expression has
+        no variables
+        :raises DivisionByZeroError if a row divides by zero or raises zero to a negative power, and zero_division
+        is RAISE
+        :raises NonRealResultError if a power of a row is a complex number, like a single evaluation
+        :returns A column with the value of every row, and if zero_division is MASK, a column of flags which
+        are true for the rows that divided by zero
+        """
+        columns = self.__compiled._bind(columns)
+        if not columns:
+            raise ValueError('Expected an expression with variables to evaluate columns of')
+        if self.__use_numpy:
+            columns = [numpy.asarray(column, dtype=float) for column in columns]
+        else:
+            columns = [column if isinstance(column, array) and column.typecode == 'd' else array('d', column)
+                       for column in columns]
+        rows = len(columns[0])
+        if any(len(column) != rows for column in columns):
+            raise ValueError('Expected columns of equal length')
+
+        mask = numpy.zeros(rows, dtype=bool) if self.__use_numpy else array('b', bytes(rows))
+        binary = self.__numpy_binary if self.__use_numpy else self.__array_binary
+        unary = self.__numpy_unary if self.__use_numpy else self.__array_unary
+        call = self.__numpy_call if self.__use_numpy else self.__array_call
+        stack = []
+        slots = [None] * self.__compiled.slot_count
+        for opcode, argument in self.__compiled.program:
+            if opcode is OpCode.PUSH:
+                stack.append(argument)
+            elif opcode is OpCode.LOAD:
+                stack.append(columns[argument])
+            elif opcode is OpCode.BINARY:
+                right = stack.pop()
+                stack[-1] = binary(argument, stack[-1], right, rows, mask)
+            elif opcode is OpCode.CALL:
+                function, count = argument
+                arguments = stack[-count:]
+                del stack[-count:]
+                stack.append(call(function, arguments, rows))
+            elif opcode is OpCode.RECALL:
+                stack.append(slots[argument])
+            elif opcode is OpCode.STORE:
+                slots[argument] = stack[-1]
+            else:
+                stack[-1] = unary(argument, stack[-1], rows)
+
+        if self.__zero_division is ZeroDivisionMode.MASK:
+            return stack[-1], mask
+        else:
+            return stack[-1]
+
+    def __numpy_binary(self, operation, a, b, rows, mask):
+        """Executes a binary operation elementwise on NumPy arrays. The Operations are used directly, with the
+        boolean arrays of comparisons converted to floats, except for division and exponentiation, which need per
+        row handling of zero divisors and of zero raised to a negative power. The NaN rows of a power are complex
+        numbers in a single evaluation unless an operand was NaN, and powers which overflow are infinite, like
+        products which overflow.
+
+        :raises DivisionByZeroError if a row divides by zero or raises zero to a negative power, and zero_division
+        is RAISE
+        :raises NonRealResultError if a power of a row is a complex number
+        :returns The resulting array
+        """
+        if operation is Operations.exponentiation:
+            zero = numpy.broadcast_to(numpy.equal(a, 0) & numpy.less(b, 0), (rows,))
+            self.__zero_rows(zero, mask, "Can't raise zero to a negative power in row")
+            with numpy.errstate(divide='ignore', over='ignore', invalid='ignore'):
+                result = numpy.broadcast_to(numpy.power(a, b, dtype=float), (rows,))
+            non_real = numpy.isnan(result) & ~numpy.isnan(a) & ~numpy.isnan(b)
+            if non_real.any():
+                raise NonRealResultError(f'The result of row {numpy.flatnonzero(non_real)[0]} is not a real number')
+            return numpy.where(zero, numpy.nan, result)
+        if operation is not Operations.divide:
+            return numpy.broadcast_to(numpy.asarray(operation(a, b), dtype=float), (rows,))
+        zero = numpy.broadcast_to(numpy.equal(b, 0), (rows,))
+        self.__zero_rows(zero, mask, "Can't divide by zero in row")
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(zero, numpy.nan, numpy.true_divide(a, b))
+
+    def __zero_rows(self, zero, mask, message: str):
+        """Handles the rows of a NumPy operation which divide by zero according to __zero_division, flagging them
+        in the mask unless it raises
+
+        :raises DivisionByZeroError if a row divides by zero and zero_division is RAISE
+        """
+        if zero.any():
+            if self.__zero_division is ZeroDivisionMode.RAISE:
+                raise DivisionByZeroError(f'{message} {numpy.flatnonzero(zero)[0]}')
+            mask |= zero
+
+    @staticmethod
+    def __numpy_unary(operation, value, rows):
+        """Executes a unary operation elementwise on a NumPy array
+
+        :returns The resulting array
+        """
+        return numpy.broadcast_to(numpy.asarray(operation(value), dtype=float), (rows,))
+
+    @staticmethod
+    def __numpy_call(function: Function, arguments: list, rows: int):
+        """Calls a function row by row, since the math functions do not operate on whole arrays
+
+        :returns The resulting array
+        """
+        arguments = [numpy.broadcast_to(argument, (rows,)) for argument in arguments]
+        return numpy.fromiter(map(function.call, zip(*arguments)), float, rows)
+
+    def __array_binary(self, operation, a, b, rows, mask):
+        """Executes a binary operation row by row on array.array columns, repeating numbers over every row. Rows of
+        divisions and powers which divide by zero are handled like on NumPy arrays, and powers which overflow are
+        infinite.
+
+        :raises DivisionByZeroError if a row divides by zero or raises zero to a negative power, and zero_division
+        is RAISE
+        :raises NonRealResultError if a power of a row is a complex number
+        :returns The resulting column
+        """
+        a = a if isinstance(a, array) else repeat(a, rows)
+        b = b if isinstance(b, array) else repeat(b, rows)
+        if operation is not Operations.divide and operation is not Operations.exponentiation:
+            return array('d', map(operation, a, b))
+        message = "Can't divide by zero in row" if operation is Operations.divide \
+            else "Can't raise zero to a negative power in row"
+        result = array('d')
+        for row, (left, right) in enumerate(zip(a, b)):
+            try:
+                value = operation(left, right)
+            except ZeroDivisionError:
+                if self.__zero_division is ZeroDivisionMode.RAISE:
+                    raise DivisionByZeroError(f'{message} {row}') from None
+                value = math.nan
+                mask[row] = 1
+            except OverflowError:
+                value = -math.inf if left < 0 and right % 2 == 1 else math.inf
+            if isinstance(value, complex):
+                raise NonRealResultError(f'The result of row {row} is not a real number')
+            result.append(value)
+        return result
+
+    @staticmethod
+    def __array_unary(operation, value, rows):
+        """Executes a unary operation row by row on an array.array column
+
+        :returns The resulting column
+        """
+        return array('d', map(operation, value if isinstance(value, array) else repeat(value, rows)))
+
+    @staticmethod
+    def __array_call(function: Function, arguments: list, rows: int):
+        """Calls a function row by row on array.array columns, repeating numbers over every row
+
+        :returns The resulting column
+        """
+        arguments = [argument if isinstance(argument, array) else repeat(argument, rows) for argument in arguments]
+        return array('d', map(function.call, zip(*arguments)))
+
+
+def evaluate_columns(compiled: CompiledExpression, columns: Mapping or Sequence,
+                     zero_division=ZeroDivisionMode.RAISE, use_numpy=None):
+    """Evaluates a compiled expression for every row of the columns of variable values
+
+    :param compiled: The expression to evaluate
+    :param columns: A mapping of variable names to columns of values, or a sequence of columns in the order of
+    the variables of the compiled expression
+    :param zero_division: How a division by zero in a single row is handled
+    :param use_numpy: Whether to evaluate with NumPy. Defaults to True if NumPy is installed
+    :returns The result of ColumnEvaluator.evaluate()
+    """
+    return ColumnEvaluator(compiled, zero_division, use_numpy).evaluate(columns)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+import threading
+import unittest
+from fractions import Fraction
+from dt042g_src.cache import ExpressionCache, LRUCache, normalize_expression
+from dt042g_src.calculator import Calculator, FunctionRegistry, INTEGER_BACKEND, fraction_backend
+
+
+class TestNormalizeExpression(unittest.TestCase):
+    """Tests for the normalize_expression() function"""
+
+    def test_should_remove_whitespace_and_quotes(self):
+        """Tests that whitespace and quotes around operators are removed"""
+        self.assertEqual('2*(3+4)', normalize_expression(' "2 * ( 3\t+\n4 )" '))
+
+    def test_should_keep_separating_whitespace(self):
+        """Tests that a single space is kept between numbers and identifiers"""
+        self.assertEqual('1 2+a b', normalize_expression('1  2 + a "b"'))
+
+    def test_should_keep_whitespace_separating_numbers(self):
+        """Tests that whitespace is kept where removing it would join Tokens into one number"""
+        self.assertEqual('1 .5+2. 5', normalize_expression('1 .5 + 2. 5'))
+        self.assertEqual('1e +5*1e- 5', normalize_expression('1e +5 * 1e- 5'))
+        self.assertEqual('1< =2 and x>=1', normalize_expression('1 < = 2 and x >= 1'))
+
+
+class TestLRUCache(unittest.TestCase):
+    """Tests for the LRUCache class"""
+
+    def test_should_compute_on_miss_and_reuse_on_hit(self):
+        """Tests that values are computed once and counted as misses and hits"""
+        cache = LRUCache(2)
+        calls = []
+        for _ in range(3):
+            self.assertEqual(1, cache.get('a', lambda: calls.append('a') or 1))
+        self.assertEqual(['a'], calls)
+        stats = cache.stats()
+        self.assertEqual((2, 1, 0, 1), (stats.hits, stats.misses, stats.evictions, stats.size))
+
+    def test_should_evict_least_recently_used(self):
+        """Tests that the least recently used entry is evicted when full"""
+        cache = LRUCache(2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 1)
+        cache.get('c', lambda: 3)
+        self.assertEqual(3, cache.get('b', lambda: 3))
+        self.assertEqual(2, cache.stats().evictions)
+        self.assertEqual(2, len(cache))
+
+    def test_errors_should_not_be_cached(self):
+        """Tests that errors raised while computing are not cached"""
+        cache = LRUCache(2)
+
+        def fail():
+            raise ValueError()
+
+        self.assertRaises(ValueError, cache.get, 'a', fail)
+        self.assertEqual(0, len(cache))
+
+    def test_should_be_thread_safe(self):
+        """Tests that the counters stay consistent under concurrent use"""
+        cache = LRUCache(16)
+
+        def work():
+            for i in range(2000):
+                cache.get(i % 32, lambda: i)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        self.assertEqual(8 * 2000, stats.hits + stats.misses)
+        self.assertLessEqual(stats.size, 16)
+
+    def test_should_reject_invalid_maxsize(self):
+        """Tests that a maxsize below one raises error"""
+        self.assertRaises(ValueError, LRUCache, 0)
+
+
+class TestExpressionCache(unittest.TestCase):
+    """Tests for the ExpressionCache class"""
+
+    def test_calculator_should_use_cache(self):
+        """Tests that calculate() results are cached on the normalized expression"""
+        cache = ExpressionCache()
+        self.assertEqual(14, Calculator('2*(3+4)', cache=cache).calculate())
+        self.assertEqual(14, Calculator('2 * (3 + 4)', cache=cache).calculate())
+        stats = cache.stats()['results']
+        self.assertEqual((1, 1), (stats.hits, stats.misses))
+
+    def test_should_cache_compiled_expressions(self):
+        """Tests that compiled expressions are cached and reused"""
+        cache = ExpressionCache()
+        compiled = cache.compile('a*(1+b)')
+        self.assertIs(compiled, cache.compile(' a * (1 + b) '))
+        self.assertEqual(6, compiled.evaluate({'a': 2, 'b': 2}))
+        self.assertEqual(1, cache.stats()['compiled'].hits)
+
+    def test_should_key_on_backend(self):
+        """Tests that results and compiled expressions of different backends are cached separately"""
+        cache = ExpressionCache()
+        self.assertEqual(0.5, Calculator('1/2', cache=cache).calculate())
+        self.assertEqual(Fraction(1, 2), Calculator('1/2', cache=cache, backend=fraction_backend()).calculate())
+        self.assertIsNot(cache.compile('x/2'), cache.compile('x/2', backend=INTEGER_BACKEND))
+        self.assertIs(INTEGER_BACKEND, cache.compile('x/2', backend=INTEGER_BACKEND).backend)
+
+    def test_should_not_cache_impure_results(self):
+        """Tests that results of expressions calling impure functions are calculated every time"""
+        cache = ExpressionCache()
+        functions = FunctionRegistry()
+        counter = iter(range(10))
+        functions.register('count', lambda x: next(counter) + x, pure=False)
+        self.assertEqual(1, Calculator('count(1)', cache=cache, functions=functions).calculate())
+        self.assertEqual(2, Calculator('count(1)', cache=cache, functions=functions).calculate())
+        self.assertEqual(0, cache.stats()['results'].misses)
+        self.assertEqual(1, cache.stats()['compiled'].hits)
+
+    def test_invalid_expression_should_raise_error(self):
+        """Tests that calculate() still raises errors on bad input with a cache"""
+        self.assertRaises(ValueError, Calculator('1+', cache=ExpressionCache()).calculate)
+
+    def test_clear_should_reset(self):
+        """Tests that clear() removes entries and resets counters"""
+        cache = ExpressionCache()
+        Calculator('1+1', cache=cache).calculate()
+        cache.clear()
+        self.assertEqual(0, cache.stats()['results'].misses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,21 @@
 #!/usr/bin/env python
+import decimal
+import fractions
+import io
 import json
 import os
+import subprocess
 import sys
 import unittest
-from dt042g_src.calculator import Calculator, Token, TokenType, Operations
+from unittest import mock
+from dt042g_src import calculator as calculator_module
+from dt042g_src.cache import ExpressionCache
+from dt042g_src.calculator import Calculator, Token, TokenType, Operations, CompiledExpression, OpCode, tokenize, \
+    calculate_lines, calculate_batch, CalculationError, ExpressionSyntaxError, UnboundVariableError, \
+    DivisionByZeroError, NonRealResultError, IntegerOperations, FLOAT_BACKEND, INTEGER_BACKEND, decimal_backend, \
+    fraction_backend, BinaryOperation, Number, Variable, Function, FunctionCall, FunctionRegistry, FunctionCallError, \
+    FUNCTIONS, BooleanOperation, Conditional, UnaryOperation, TokenBuffer, Limits, LimitExceededError, \
+    UNTRUSTED_LIMITS
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -39,10 +51,41 @@ class TestCalculate(unittest.TestCase):
         calculator = Calculator('')
         self.assertTrue(hasattr(calculator, 'calculate') and callable(getattr(calculator, 'calculate')))
 
-    def test_should_exit_on_bad_input(self):
-        """Tests if the calculate method exits on bad input"""
-        calculator = Calculator('f09jj0jf02jf402j49jf2')
-        self.assertRaises(SystemExit, calculator.calculate)
+    def test_should_raise_on_bad_input(self):
+        """Tests if the calculate method raises errors on bad input instead of exiting"""
+        self.assertRaises(UnboundVariableError, Calculator('f09jj0jf02jf402j49jf2').calculate)
+        self.assertRaises(ExpressionSyntaxError, Calculator('09 0 02').calculate)
+        self.assertRaises(DivisionByZeroError, Calculator('1/0').calculate)
+
+    def test_syntax_error_should_have_position(self):
+        """Tests that syntax errors have the position of the unexpected token"""
+        with self.assertRaises(ExpressionSyntaxError) as context:
+            Calculator('1 + (2 * 3))').calculate()
+        self.assertEqual(11, context.exception.position)
+        self.assertIn('at position 11', str(context.exception))
+
+    def test_complex_result_should_raise_error(self):
+        """Tests that a complex result raises error"""
+        self.assertRaises(NonRealResultError, Calculator('(0-8)^(1/3)').calculate)
+
+    def test_zero_to_negative_power_should_raise_division_by_zero(self):
+        """Tests that zero raised to a negative power raises DivisionByZeroError with every backend"""
+        for backend in (FLOAT_BACKEND, INTEGER_BACKEND, decimal_backend(), fraction_backend()):
+            with self.subTest(backend=backend.name):
+                self.assertRaises(DivisionByZeroError, Calculator('0 ^ (0 - 1)', backend=backend).calculate)
+
+    def test_errors_should_be_calculation_errors(self):
+        """Tests that all expression errors share a base class"""
+        for expression in ['1+', 'x', '1/0', '(0-8)^(1/2)']:
+            with self.subTest(expression=expression):
+                self.assertRaises(CalculationError, Calculator(expression).calculate)
+
+    def test_should_calculate_number_literals(self):
+        """Tests that decimal, scientific, underscored and hexadecimal numbers are calculated"""
+        self.assertEqual(6.28, Calculator('3.14*2').calculate())
+        self.assertEqual(1500, Calculator('1.5e3').calculate())
+        self.assertEqual(1000255, Calculator('1_000_000+0xFF').calculate())
+        self.assertEqual(3, Calculator('1.5*2', backend=INTEGER_BACKEND).calculate())
 
     def test_non_decimal_result_should_be_int(self):
         """Tests if non decimal results return int"""
@@ -59,6 +102,282 @@ class TestCalculate(unittest.TestCase):
         self.assertIsInstance(calculator.calculate(), float)
 
 
+class TestCompile(unittest.TestCase):
+    """Tests for the Calculator.compile() method and the module level compile() function"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Loads test data"""
+        with open('../lab2_expressions/expressions.json') as file_handle:
+            cls.test_data = json.load(file_handle)
+
+    def test_should_return_compiled_expression(self):
+        """Tests that a CompiledExpression is returned"""
+        self.assertIsInstance(Calculator('1+2').compile(), CompiledExpression)
+        self.assertIsInstance(calculator_module.compile('1+2'), CompiledExpression)
+
+    def test_compiled_expression_returns_correct_result(self):
+        """Tests that compiled test expressions evaluate to the expected results"""
+        for expression, expected_result in self.test_data.items():
+            with self.subTest(expression=expression, expected_result=expected_result):
+                self.assertEqual(expected_result, calculator_module.compile(expression).evaluate())
+
+    def test_invalid_expression_should_raise_error(self):
+        """Tests that compiling an invalid expression raises error"""
+        self.assertRaises(ValueError, calculator_module.compile, '5+((3/2)')
+
+    def test_division_by_zero_should_raise_on_evaluation(self):
+        """Tests that division by zero is raised when evaluating, not when compiling"""
+        compiled = calculator_module.compile('1/(2-2)')
+        self.assertRaises(ZeroDivisionError, compiled.evaluate)
+
+
+class TestCompiledExpression(unittest.TestCase):
+    """Tests for the CompiledExpression class"""
+
+    def test_program_should_be_postfix(self):
+        """Tests that the program is flattened into postfix order"""
+        compiled = calculator_module.compile('1+2*3')
+        self.assertEqual(((OpCode.PUSH, 1), (OpCode.PUSH, 2), (OpCode.PUSH, 3),
+                          (OpCode.BINARY, Operations.multiply), (OpCode.BINARY, Operations.add)), compiled.program)
+
+    def test_should_evaluate_many_times(self):
+        """Tests that the same compiled expression can be evaluated repeatedly"""
+        compiled = calculator_module.compile('-2^2+10/4')
+        for _ in range(3):
+            self.assertEqual(-1.5, compiled.evaluate())
+
+    def test_non_decimal_result_should_be_int(self):
+        """Tests if non decimal results return int"""
+        self.assertIsInstance(calculator_module.compile('4/4').evaluate(), int)
+
+    def test_should_list_variables_in_order_of_appearance(self):
+        """Tests that variables are listed once, in order of first appearance"""
+        compiled = calculator_module.compile('price*(1+rate)^n-rate')
+        self.assertEqual(('price', 'rate', 'n'), compiled.variables)
+
+    def test_should_bind_variables_from_mapping(self):
+        """Tests that variables are bound by name from a mapping"""
+        compiled = calculator_module.compile('price*(1+rate)^n')
+        self.assertEqual(225, compiled.evaluate({'price': 100, 'rate': 0.5, 'n': 2}))
+        self.assertEqual(8, compiled.evaluate({'price': 1, 'rate': 1, 'n': 3}))
+
+    def test_should_bind_variables_from_sequence(self):
+        """Tests that variables are bound by position from a sequence"""
+        compiled = calculator_module.compile('a-b/c')
+        self.assertEqual(2.5, compiled.evaluate([3, 1, 2]))
+
+    def test_unbound_variable_should_raise_error(self):
+        """Tests that evaluating without a value for every variable raises error"""
+        compiled = calculator_module.compile('a+b')
+        self.assertRaises(ValueError, compiled.evaluate, {'a': 1})
+        self.assertRaises(ValueError, compiled.evaluate, [1])
+
+    def test_should_be_immutable(self):
+        """Tests that the program can not be reassigned"""
+        compiled = calculator_module.compile('1+2')
+        with self.assertRaises(AttributeError):
+            compiled.program = ()
+
+
+class TestNumericBackend(unittest.TestCase):
+    """Tests for the NumericBackend class and the standard backends"""
+
+    def test_float_backend_should_be_default(self):
+        """Tests that expressions are compiled with the float backend by default"""
+        compiled = calculator_module.compile('1+2')
+        self.assertIs(FLOAT_BACKEND, compiled.backend)
+        self.assertIsInstance(compiled.program[0][1], float)
+
+    def test_integer_backend_should_keep_ints_exact(self):
+        """Tests that integer expressions are calculated without converting to float"""
+        compiled = calculator_module.compile('2^100+1-6/3', backend=INTEGER_BACKEND)
+        self.assertEqual(2 ** 100 - 1, compiled.evaluate())
+        self.assertIsInstance(compiled.program[0][1], int)
+
+    def test_integer_backend_should_divide_inexactly_as_float(self):
+        """Tests that an inexact division of ints falls back to float"""
+        self.assertEqual(3.5, Calculator('7/2', backend=INTEGER_BACKEND).calculate())
+        self.assertRaises(ZeroDivisionError, Calculator('1/(1-1)', backend=INTEGER_BACKEND).calculate)
+
+    def test_decimal_backend_should_use_context(self):
+        """Tests that decimals are calculated in the precision of the context of the backend"""
+        backend = decimal_backend(decimal.Context(prec=5))
+        self.assertEqual(decimal.Decimal('0.33333'), Calculator('1/3', backend=backend).calculate())
+        compiled = calculator_module.compile('price*rate', backend=backend)
+        self.assertEqual(decimal.Decimal('0.30'),
+                         compiled.evaluate({'price': decimal.Decimal('0.1'), 'rate': decimal.Decimal('3')}))
+
+    def test_fraction_backend_should_be_exact(self):
+        """Tests that fractions are calculated exactly"""
+        self.assertEqual(fractions.Fraction(1, 2), Calculator('1/3+1/6', backend=fraction_backend()).calculate())
+
+    def test_fraction_backend_complex_result_should_raise_error(self):
+        """Tests that a fractional power of a negative number raises error"""
+        compiled = calculator_module.compile('(0-8)^(1/3)', backend=fraction_backend())
+        self.assertRaises(NonRealResultError, compiled.evaluate)
+
+    def test_exact_backends_should_convert_function_results(self):
+        """Tests that the float results of functions are converted to the numbers of the decimal and fraction
+        backends, and fractional powers of negative numbers raise error like the float backend"""
+        for backend, number_type in ((decimal_backend(), decimal.Decimal), (fraction_backend(), fractions.Fraction)):
+            with self.subTest(backend=backend.name):
+                result = Calculator('sqrt(2) + 1', backend=backend).calculate()
+                self.assertIs(number_type, type(result))
+                self.assertAlmostEqual(2 ** 0.5 + 1, float(result))
+                self.assertEqual(3, Calculator('max(1, 2) + 1', backend=backend).calculate())
+                self.assertRaises(NonRealResultError, Calculator('(0-8)^0.5', backend=backend).calculate)
+
+    def test_program_should_use_backend_operations(self):
+        """Tests that the program executes the Operations of the backend"""
+        compiled = calculator_module.compile('1/2', backend=INTEGER_BACKEND)
+        self.assertEqual((OpCode.BINARY, IntegerOperations.divide), compiled.program[-1])
+        self.assertEqual(BinaryOperation(Operations.divide, Number(1), Number(2)), compiled.tree)
+
+
+class TestFunctionCalls(unittest.TestCase):
+    """Tests for function calls in expressions"""
+
+    def test_should_call_built_in_functions(self):
+        """Tests that built-in functions are called with their arguments, with both parsers"""
+        for iterative in (False, True):
+            with self.subTest(iterative=iterative):
+                self.assertEqual(10, Calculator('sqrt(16)+max(1, 2, 3)*2', iterative).calculate())
+                self.assertEqual(3, Calculator('log(8, 2)', iterative).calculate())
+                self.assertEqual(-9, Calculator('-abs(1-4)^2', iterative).calculate())
+                self.assertEqual(2.57, Calculator('round(2.567, 2)', iterative).calculate())
+
+    def test_should_resolve_functions_when_compiling(self):
+        """Tests that calls are resolved to their Function in the tree and program"""
+        compiled = calculator_module.compile('min(x, 2)')
+        self.assertEqual(FunctionCall(FUNCTIONS.get('min'), (Variable('x'), Number(2))), compiled.tree)
+        self.assertEqual((OpCode.CALL, (FUNCTIONS.get('min'), 2)), compiled.program[-1])
+        self.assertEqual(1, compiled.evaluate({'x': 1}))
+
+    def test_parsers_should_build_same_tree(self):
+        """Tests that the iterative parser builds the same trees for calls as the recursive parser"""
+        for expression in ['max(1, -x^2, (2))', 'hypot(sqrt(x), abs(-1)*2)^2', '-min(x,1)^2']:
+            with self.subTest(expression=expression):
+                self.assertEqual(calculator_module.compile(expression).tree,
+                                 calculator_module.compile(expression, iterative=True).tree)
+
+    def test_unknown_function_should_raise_error(self):
+        """Tests that calling an unregistered function raises error at the position of its name"""
+        for iterative in (False, True):
+            with self.subTest(iterative=iterative):
+                with self.assertRaises(ExpressionSyntaxError) as context:
+                    calculator_module.compile('1+f(2)', iterative)
+                self.assertEqual(2, context.exception.position)
+
+    def test_wrong_number_of_arguments_should_raise_error(self):
+        """Tests that calling a function with too few or too many arguments raises error"""
+        for expression in ['sqrt(1, 2)', 'max(1)', 'atan2(1)', 'max(1,)', '(1, 2)']:
+            for iterative in (False, True):
+                with self.subTest(expression=expression, iterative=iterative):
+                    self.assertRaises(ExpressionSyntaxError, calculator_module.compile, expression, iterative)
+
+    def test_rejected_arguments_should_raise_error(self):
+        """Tests that a function rejecting its arguments raises error on evaluation"""
+        compiled = calculator_module.compile('sqrt(x)')
+        self.assertRaises(FunctionCallError, compiled.evaluate, {'x': -1})
+        self.assertRaises(CalculationError, Calculator('log(0)').calculate)
+
+    def test_should_use_given_registry(self):
+        """Tests that calls are resolved in the registry given to the Calculator"""
+        functions = FunctionRegistry()
+        functions.register('double', lambda x: 2 * x)
+        self.assertEqual(6, Calculator('double(3)', functions=functions).calculate())
+        self.assertRaises(ExpressionSyntaxError, Calculator('sqrt(4)', functions=functions).calculate)
+        self.assertRaises(ExpressionSyntaxError, Calculator('double(3)').calculate)
+
+    def test_pure_should_depend_on_functions(self):
+        """Tests that compiled expressions calling an impure function are not pure"""
+        functions = FUNCTIONS.copy()
+        functions.register('noise', lambda x: x, pure=False)
+        self.assertTrue(calculator_module.compile('sqrt(x)').pure)
+        self.assertFalse(Calculator('sqrt(noise(x))', functions=functions).compile().pure)
+
+
+class TestFunctionRegistry(unittest.TestCase):
+    """Tests for the FunctionRegistry class"""
+
+    def test_register_should_return_function(self):
+        """Tests that registering returns the registered Function"""
+        functions = FunctionRegistry()
+        function = functions.register('clamp', min, 2, None, pure=True)
+        self.assertEqual(Function('clamp', min, 2, None, True), function)
+        self.assertIs(function, functions.get('clamp'))
+        self.assertIn('clamp', functions)
+
+    def test_register_should_validate(self):
+        """Tests that invalid names and arities raise error"""
+        functions = FunctionRegistry()
+        self.assertRaises(ValueError, functions.register, '2x', abs)
+        self.assertRaises(ValueError, functions.register, 'f', abs, 0)
+        self.assertRaises(ValueError, functions.register, 'f', abs, 2, 1)
+
+    def test_copy_should_be_independent(self):
+        """Tests that registering in a copy does not change the original"""
+        functions = FUNCTIONS.copy()
+        functions.register('double', lambda x: 2 * x)
+        self.assertNotIn('double', FUNCTIONS)
+        self.assertIs(FUNCTIONS.get('sqrt'), functions.get('sqrt'))
+
+
+class TestBooleanOperators(unittest.TestCase):
+    """Tests for comparison, boolean and conditional operators"""
+
+    def test_comparisons_should_calculate_to_one_or_zero(self):
+        """Tests that comparisons calculate to 1 if true and 0 if false"""
+        for expression, expected_result in [('1 < 2', 1), ('2 <= 1', 0), ('3 > 2', 1), ('2 >= 2', 1), ('1 == 1.0', 1),
+                                            ('1 != 1', 0), ('1 + 1 == 2', 1), ('-2^2 < 0', 1)]:
+            with self.subTest(expression=expression):
+                self.assertEqual(expected_result, Calculator(expression).calculate())
+
+    def test_comparing_complex_numbers_should_raise_error(self):
+        """Tests that comparisons and not of a fractional power of a negative number raise NonRealResultError"""
+        for expression in ['(0-1)^0.5 < 1', '1 >= (0-1)^0.5', '(0-1)^0.5 == 1', 'not (0-1)^0.5']:
+            with self.subTest(expression=expression):
+                self.assertRaises(NonRealResultError, Calculator(expression).calculate)
+
+    def test_should_bind_like_python(self):
+        """Tests that or binds weaker than and, which binds weaker than not, which binds weaker than comparisons"""
+        tree = calculator_module.compile('not a < b and c or d').tree
+        self.assertEqual(BooleanOperation('or', BooleanOperation('and', UnaryOperation(
+            Operations.logical_not, BinaryOperation(Operations.less, Variable('a'), Variable('b'))), Variable('c')),
+            Variable('d')), tree)
+
+    def test_boolean_operators_should_return_deciding_operand(self):
+        """Tests that and/or calculate to the operand which decides them, like in Python"""
+        for expression, expected_result in [('2 and 3', 3), ('0 and 3', 0), ('2 or 3', 2), ('0 or 3', 3),
+                                            ('not 2', 0), ('not 0', 1), ('not not 5', 1)]:
+            with self.subTest(expression=expression):
+                self.assertEqual(expected_result, Calculator(expression).calculate())
+
+    def test_boolean_operators_should_short_circuit(self):
+        """Tests that the right operand is not evaluated when the left operand decides the result"""
+        compiled = calculator_module.compile('x != 0 and 1/x > 0.5 or x == 0')
+        self.assertEqual(1, compiled.evaluate({'x': 0}))
+        self.assertEqual(1, compiled.evaluate({'x': 1}))
+        self.assertEqual(0, compiled.evaluate({'x': 4}))
+
+    def test_conditional_should_only_evaluate_taken_branch(self):
+        """Tests that if() only evaluates the branch it takes"""
+        for iterative in (False, True):
+            with self.subTest(iterative=iterative):
+                compiled = calculator_module.compile('if(x > 0, 10/x, if(x < 0, -1, sqrt(-1)))', iterative)
+                self.assertEqual(5, compiled.evaluate({'x': 2}))
+                self.assertEqual(-1, compiled.evaluate({'x': -3}))
+                self.assertRaises(FunctionCallError, compiled.evaluate, {'x': 0})
+
+    def test_conditional_should_compile_to_jumps(self):
+        """Tests that a conditional compiles to forward jumps over the branch not taken"""
+        compiled = calculator_module.compile('if(x, 1, 2)')
+        self.assertEqual(Conditional(Variable('x'), Number(1), Number(2)), compiled.tree)
+        self.assertEqual(((OpCode.LOAD, 0), (OpCode.JUMP_IF_FALSE, 2), (OpCode.PUSH, 1), (OpCode.JUMP, 1),
+                          (OpCode.PUSH, 2)), compiled.program)
+
+
 class TestTokenizeExpression(unittest.TestCase):
     """Tests for the Calculator.__tokenize_calculation() method"""
 
@@ -81,7 +400,7 @@ class TestTokenizeExpression(unittest.TestCase):
             with self.subTest(expression=expression):
                 calculator = Calculator(expression)
                 for token in getattr(calculator, '_Calculator__tokenize_calculation')():
-                    self.assertNotIn(' ', token.value)
+                    self.assertNotIn(' ', str(token.value))
 
     def test_tokens_should_not_contain_quotes(self):
         """Tests that tokens do not contain quotes"""
@@ -89,7 +408,7 @@ class TestTokenizeExpression(unittest.TestCase):
             with self.subTest(expression=expression):
                 calculator = Calculator(expression)
                 for token in getattr(calculator, '_Calculator__tokenize_calculation')():
-                    self.assertNotIn('"', token.value)
+                    self.assertNotIn('"', str(token.value))
 
     def test_tokens_should_be_list(self):
         """Tests that tokens are returned as a list"""
@@ -102,7 +421,7 @@ class TestTokenizeExpression(unittest.TestCase):
         """Tests that sequential digits are grouped"""
         expression = '0-(123)+2'
         calculator = Calculator(expression)
-        self.assertEqual('123', getattr(calculator, '_Calculator__tokenize_calculation')()[3].value)
+        self.assertEqual(123, getattr(calculator, '_Calculator__tokenize_calculation')()[3].value)
 
     def test_should_identify_plus(self):
         """Tests that + are identified"""
@@ -153,6 +472,14 @@ class TestTokenizeExpression(unittest.TestCase):
         tokens = getattr(calculator, '_Calculator__tokenize_calculation')()
         self.assertTrue(tokens[10].type == TokenType.RIGHT_PARENTHESIS, f'Token type is {tokens[10].type}')
 
+    def test_should_identify_identifier(self):
+        """Tests that identifiers are identified"""
+        expression = 'price*(1+rate_2)'
+        calculator = Calculator(expression)
+        tokens = getattr(calculator, '_Calculator__tokenize_calculation')()
+        self.assertEqual(Token(TokenType.IDENTIFIER, 'price', 0), tokens[0])
+        self.assertEqual(Token(TokenType.IDENTIFIER, 'rate_2', 9), tokens[5])
+
     def test_tokens_should_be_token_objects(self):
         """Tests that tokens are Token objects"""
         for expression in self.test_data:
@@ -162,6 +489,188 @@ class TestTokenizeExpression(unittest.TestCase):
                     self.assertIsInstance(token, Token)
 
 
+class TestTokenize(unittest.TestCase):
+    """Tests for the tokenize() function"""
+
+    def test_should_be_lazy(self):
+        """Tests that Tokens are yielded lazily"""
+        tokens = tokenize('1+2')
+        self.assertEqual(Token(TokenType.NUMBER, 1, 0), next(tokens))
+        self.assertEqual(Token(TokenType.PLUS, '+', 1), next(tokens))
+
+    def test_whitespace_and_quotes_should_separate_tokens(self):
+        """Tests that whitespace and quotes are skipped but separate Tokens"""
+        self.assertEqual([Token(TokenType.NUMBER, 12, 2), Token(TokenType.NUMBER, 3, 7),
+                          Token(TokenType.IDENTIFIER, 'a', 9)], list(tokenize(' "12" \t3\na ')))
+
+    def test_should_skip_unknown_characters(self):
+        """Tests that unknown characters are skipped"""
+        self.assertEqual([Token(TokenType.NUMBER, 1, 0), Token(TokenType.PLUS, '+', 2),
+                          Token(TokenType.NUMBER, 2, 3)], list(tokenize('1$+2#')))
+
+    def test_should_tokenize_long_literals(self):
+        """Tests that long numbers are grouped into a single Token"""
+        self.assertEqual([Token(TokenType.NUMBER, 7 * 10 ** 99 // 9 * 10 + 7, 0)],
+                         list(tokenize('7' * 100, int)))
+
+    def test_should_tokenize_decimals(self):
+        """Tests that decimals with or without an integer or fractional part are single Tokens"""
+        self.assertEqual([Token(TokenType.NUMBER, 3.14, 0), Token(TokenType.NUMBER, 2, 5),
+                          Token(TokenType.NUMBER, 0.5, 8)], list(tokenize('3.14 2. .5')))
+
+    def test_should_tokenize_scientific_notation(self):
+        """Tests that numbers with an exponent are single Tokens"""
+        self.assertEqual([1e6, 0.0025, 1.5e3], [token.value for token in tokenize('1e6 2.5E-3 1.5e+3')])
+
+    def test_should_tokenize_underscores_and_hexadecimals(self):
+        """Tests that digits grouped with underscores and hexadecimal numbers are single Tokens"""
+        self.assertEqual([Token(TokenType.NUMBER, 1000000, 0), Token(TokenType.NUMBER, 255, 10),
+                          Token(TokenType.NUMBER, 65535, 15)], list(tokenize('1_000_000 0xff 0XFF_FF', int)))
+
+    def test_incomplete_numbers_should_be_separate_tokens(self):
+        """Tests that an exponent without digits or a hexadecimal prefix without digits is an identifier"""
+        self.assertEqual([TokenType.NUMBER, TokenType.IDENTIFIER, TokenType.NUMBER, TokenType.IDENTIFIER],
+                         [token.type for token in tokenize('1e 0x')])
+
+    def test_should_tokenize_comparisons_and_keywords(self):
+        """Tests that comparison operators and the keywords and, or, not are identified"""
+        self.assertEqual([TokenType.LESS_EQUAL, TokenType.GREATER_EQUAL, TokenType.EQUAL, TokenType.NOT_EQUAL,
+                          TokenType.LESS, TokenType.GREATER, TokenType.AND, TokenType.OR, TokenType.NOT,
+                          TokenType.IDENTIFIER],
+                         [token.type for token in tokenize('<= >= == != < > and or not nothing')])
+
+    def test_should_convert_numbers(self):
+        """Tests that numbers are converted once, when tokenized"""
+        self.assertEqual([decimal.Decimal('0.1'), decimal.Decimal(16)],
+                         [token.value for token in tokenize('0.1 0x10', decimal.Decimal)])
+
+    def test_numbers_converted_to_infinity_should_raise_error(self):
+        """Tests that numbers too large for the conversion raise error at their position, also in a TokenBuffer"""
+        for tokens in (tokenize('1 + 1_0e399'), TokenBuffer('1 + 1_0e399').tokens()):
+            with self.assertRaises(ExpressionSyntaxError) as context:
+                list(tokens)
+            self.assertEqual(4, context.exception.position)
+        self.assertRaises(ExpressionSyntaxError, Calculator('1e999 * 0').calculate)
+        self.assertEqual(decimal.Decimal('1e400'), next(tokenize('1e400', decimal.Decimal)).value)
+
+
+class TestTokenBuffer(unittest.TestCase):
+    """Tests for the TokenBuffer class"""
+
+    def test_should_hold_tokens_of_tokenize(self):
+        """Tests that the buffer holds the same Tokens as tokenize() yields, with the same converted numbers"""
+        expression = ' "12" + 0xff_ff*1_000 / x1 <= .5e3 and not$ f(2, 3)'
+        for convert in (float, fractions.Fraction, decimal.Decimal):
+            with self.subTest(convert=convert):
+                self.assertEqual(list(tokenize(expression, convert)), list(TokenBuffer(expression).tokens(convert)))
+
+    def test_should_store_types_and_offsets(self):
+        """Tests that Tokens are stored as TokenType values and offsets of their text"""
+        tokens = TokenBuffer('12 + abc')
+        self.assertEqual(3, len(tokens))
+        self.assertEqual([TokenType.NUMBER.value, TokenType.PLUS.value, TokenType.IDENTIFIER.value], list(tokens.types))
+        self.assertEqual('abc', tokens.text(2))
+        self.assertEqual(Token(TokenType.IDENTIFIER, 'abc', 5), tokens.token(2))
+        self.assertEqual(27, tokens.nbytes)
+
+    def test_should_compile_from_buffer(self):
+        """Tests that a compiled TokenBuffer evaluates like the compiled expression, and must be of the expression"""
+        tokens = TokenBuffer('2 ^ 70 / 4')
+        self.assertEqual(2 ** 68, Calculator(tokens.expression, backend=INTEGER_BACKEND).compile(tokens).evaluate())
+        self.assertEqual(2 ** 68, Calculator(tokens.expression, iterative=True).compile(tokens).evaluate())
+        with self.assertRaises(ValueError):
+            Calculator('1').compile(tokens)
+
+
+class TestLimits(unittest.TestCase):
+    """Tests for the Limits class"""
+
+    def assert_exceeds(self, expression: str, limits: Limits, **kwargs):
+        """Asserts that calculating the expression with the limits raises LimitExceededError"""
+        with self.assertRaises(LimitExceededError):
+            Calculator(expression, limits=limits, **kwargs).calculate()
+
+    def test_should_limit_length_and_tokens(self):
+        """Tests that expressions with too many characters or Tokens are rejected"""
+        self.assertEqual(3, Calculator('1 + 2', limits=Limits(max_length=5, max_tokens=3)).calculate())
+        self.assert_exceeds('1 + 22', Limits(max_length=5))
+        self.assert_exceeds('1+2+3', Limits(max_tokens=3))
+        self.assert_exceeds('1+2+3', Limits(max_tokens=3), iterative=True)
+
+    def test_should_limit_depth(self):
+        """Tests that parenthesis nested too deep are rejected, with the position of the first one too deep"""
+        self.assertEqual(1, Calculator('((1))', limits=Limits(max_depth=2)).calculate())
+        with self.assertRaises(LimitExceededError) as context:
+            Calculator('(1)+((2))', limits=Limits(max_depth=1)).calculate()
+        self.assertEqual(5, context.exception.position)
+
+    def test_should_raise_recursion_as_limit(self):
+        """Tests that an expression too deep to parse recursively raises LimitExceededError with limits"""
+        expression = '-' * (sys.getrecursionlimit() * 2) + '1'
+        self.assert_exceeds(expression, Limits())
+        self.assertEqual(1, Calculator(expression, iterative=True, limits=Limits()).calculate())
+
+    def test_should_limit_operations(self):
+        """Tests that the operations and function calls of the compiled program are counted"""
+        self.assertEqual(5, Calculator('-1 + sqrt(4) * 3', limits=Limits(max_operations=4)).calculate())
+        self.assert_exceeds('-1 + sqrt(4) * 3', Limits(max_operations=3))
+
+    def test_should_limit_exponents_before_computing_powers(self):
+        """Tests that large exponents and powers are rejected without being computed"""
+        limits = Limits(max_exponent=1000, max_magnitude=1e100)
+        self.assertEqual(2 ** 300, Calculator('2^300', backend=INTEGER_BACKEND).calculate())
+        self.assert_exceeds('9^9^9', limits, backend=INTEGER_BACKEND)
+        self.assert_exceeds('2^-1001', limits)
+        self.assert_exceeds('10^101', limits, backend=INTEGER_BACKEND)
+        self.assertEqual(10 ** 100, Calculator('10^100', backend=INTEGER_BACKEND, limits=limits).calculate())
+        self.assertEqual(0.5 ** 1000, Calculator('0.5^1000', limits=limits).calculate())
+
+    def test_should_limit_exponents_too_large_for_floats(self):
+        """Tests that exponents too large to convert to float are rejected as exceeding the limits"""
+        compiled = Calculator('2^x', backend=INTEGER_BACKEND, limits=Limits(max_exponent=10)).compile()
+        self.assertRaises(LimitExceededError, compiled.evaluate, [10 ** 400])
+        compiled = Calculator('2^x', backend=fraction_backend(), limits=Limits(max_exponent=10)).compile()
+        self.assertRaises(LimitExceededError, compiled.evaluate, [fractions.Fraction(10 ** 400, 3)])
+        compiled = Calculator('2^x', backend=INTEGER_BACKEND, limits=Limits(max_magnitude=1e100)).compile()
+        self.assertRaises(LimitExceededError, compiled.evaluate, [10 ** 400])
+
+    def test_should_limit_magnitude(self):
+        """Tests that results larger than max_magnitude are rejected, also with other backends and with variables"""
+        limits = Limits(max_magnitude=1000)
+        self.assert_exceeds('999 + 2', limits)
+        self.assert_exceeds('-999 - 2', limits, backend=decimal_backend())
+        compiled = Calculator('x * x', limits=limits).compile()
+        self.assertEqual(900, compiled.evaluate({'x': 30}))
+        with self.assertRaises(LimitExceededError):
+            compiled.evaluate({'x': 40})
+
+    def test_should_limit_magnitude_of_numbers_calls_and_results(self):
+        """Tests that numbers, function results and the result of the expression, including NaN, are checked against
+        max_magnitude"""
+        limits = Limits(max_magnitude=1000)
+        self.assert_exceeds('1001 * x', limits)
+        self.assert_exceeds('hypot(800, 800)', limits)
+        self.assertRaises(LimitExceededError, Calculator('x', limits=limits).compile().evaluate, [1001])
+        self.assertRaises(LimitExceededError, Calculator('x - x', limits=limits).compile().evaluate, [float('inf')])
+        self.assertEqual(8, Calculator('2 ^ x', backend=decimal_backend(), limits=limits).compile().evaluate([3]))
+
+    def test_should_be_cached_separately(self):
+        """Tests that expressions compiled with limits are not shared with those compiled without"""
+        cache = ExpressionCache()
+        self.assertEqual(2 ** 20, Calculator('2^20', cache=cache).calculate())
+        self.assert_exceeds('2^20', Limits(max_exponent=10), cache=cache)
+        with self.assertRaises(LimitExceededError):
+            cache.compile('1  +  1', limits=Limits(max_length=5))
+
+    def test_untrusted_limits_allow_corpus(self):
+        """Tests that the limits for untrusted expressions calculate the expressions of the test data unchanged"""
+        with open('../lab2_expressions/expressions.json') as file_handle:
+            test_data = json.load(file_handle)
+        for expression, expected_result in test_data.items():
+            with self.subTest(expression=expression):
+                self.assertEqual(expected_result, Calculator(expression, limits=UNTRUSTED_LIMITS).calculate())
+
+
 class TestNextToken(unittest.TestCase):
     """Tests for the Calculator.__next_token() method"""
 
@@ -200,6 +709,11 @@ class TestCalculateExpression(unittest.TestCase):
         getattr(calculator, '_Calculator__next_token')()
         self.assertRaises(ValueError, calculator._calculate_expression)
 
+    def test_should_parse_nested_parenthesis_recursively(self):
+        """Tests that the recursive parser handles a parenthesis level in a few frames, as deep as before comparisons
+        and boolean operators were parsed"""
+        self.assertEqual(1, calculator_module.compile('(' * 150 + '1' + ')' * 150).evaluate())
+
     def test_should_return_value_of_expression(self):
         """Tests that the value of the expression is returned"""
         for expression, expected_result in self.test_data.items():
@@ -318,6 +832,14 @@ class TestCalculateExponentiation(unittest.TestCase):
         getattr(calculator, '_Calculator__next_token')()
         self.assertEqual(4294967298, calculator._calculate_exponentiation())
 
+    def test_should_handle_parenthesis_as_base(self):
+        """Tests that an expression in parenthesis can be the base"""
+        expression = "(1+2)^2*2"
+        calculator = Calculator(expression)
+        calculator.__dict__["_Calculator__tokens"] = iter(getattr(calculator, '_Calculator__tokenize_calculation')())
+        getattr(calculator, '_Calculator__next_token')()
+        self.assertEqual(9, calculator._calculate_exponentiation())
+
     def test_should_return_first_number_if_no_exponentiation(self):
         """Tests that the first number is returned if no exponentiation"""
         expression = "45+34"
@@ -374,6 +896,157 @@ class TestIdentifyNumber(unittest.TestCase):
         self.assertRaises(ValueError, calculator._identify_number)
 
 
+class TestParseIteratively(unittest.TestCase):
+    """Tests for the Calculator._parse_iteratively() method"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Loads test data"""
+        with open('../lab2_expressions/expressions.json') as file_handle:
+            cls.test_data = json.load(file_handle)
+
+    def test_iterative_calculator_returns_correct_result(self):
+        """Validation tests for the behaviour of the program, using the iterative parser"""
+        for expression, expected_result in self.test_data.items():
+            with self.subTest(expression=expression, expected_result=expected_result):
+                self.assertEqual(expected_result, Calculator(expression, iterative=True).calculate())
+
+    def test_should_build_same_tree_as_recursive_parser(self):
+        """Tests that the tree equals the tree of the recursive parser, including precedence and associativity"""
+        for expression in ['-2^2', '2^3^2', '2^-3^2*4', '2*-3^2', '--x+-(1)^2', '1-2-3/4/5', '+(2)^(3)^-x-+1',
+                           '((a))*(b+c)^d']:
+            with self.subTest(expression=expression):
+                self.assertEqual(Calculator(expression).compile().tree,
+                                 Calculator(expression, iterative=True).compile().tree)
+
+    def test_should_build_same_tree_for_boolean_operators(self):
+        """Tests that the tree of comparisons, boolean operators and conditionals equals the tree of the recursive
+        parser"""
+        for expression in ['not a < b and c or d', 'a or not not b == -c', 'if(a and b, c < 1, max(not a, b))',
+                           '1 < 2 < 3', '(a or b) and c']:
+            with self.subTest(expression=expression):
+                self.assertEqual(calculator_module.compile(expression).tree,
+                                 calculator_module.compile(expression, iterative=True).tree)
+
+    def test_invalid_expression_should_raise_error(self):
+        """Tests that invalid expressions raise the same errors as the recursive parser"""
+        for expression in ['', '5+((3/2)', '(1))', '1 2', '2(3)', '*1', '1+', '()']:
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError) as recursive_error:
+                    Calculator(expression).compile()
+                with self.assertRaises(ValueError) as iterative_error:
+                    Calculator(expression, iterative=True).compile()
+                self.assertEqual(str(recursive_error.exception), str(iterative_error.exception))
+
+    def test_should_handle_deep_nesting(self):
+        """Tests that nesting deeper than the recursion limit is handled"""
+        depth = sys.getrecursionlimit() * 10
+        self.assertEqual(1, calculator_module.compile('(' * depth + '1' + ')' * depth, iterative=True).evaluate())
+        self.assertEqual(-4, calculator_module.compile('-' * (depth + 1) + '2^2', iterative=True).evaluate())
+
+    def test_invalid_boolean_expressions_should_raise_error(self):
+        """Tests that not in an operand of an arithmetic operator or comparison, and if() without three
+        arguments, raise error with both parsers"""
+        for expression in ['1 + not 0', '-not 1', '1 < not 2', '2 ^ not 1', 'if(1, 2)', 'and 1', '1 or']:
+            for iterative in (False, True):
+                with self.subTest(expression=expression, iterative=iterative):
+                    self.assertRaises(ExpressionSyntaxError, calculator_module.compile, expression, iterative)
+
+
+class TestCalculateLines(unittest.TestCase):
+    """Tests for the calculate_lines() function"""
+
+    def test_should_calculate_each_line(self):
+        """Tests that each line is calculated and blank lines are skipped"""
+        results = list(calculate_lines(['1+2\n', '\n', ' 2^3 \n']))
+        self.assertEqual([('1+2', 3, None), ('2^3', 8, None)], results)
+
+    def test_should_report_errors_without_aborting(self):
+        """Tests that invalid lines report errors and following lines are still calculated"""
+        results = list(calculate_lines(['1/0', '(1', '4/2']))
+        self.assertIsNotNone(results[0][2])
+        self.assertIsNotNone(results[1][2])
+        self.assertEqual(('4/2', 2, None), results[2])
+
+    def test_should_report_other_exceptions_without_aborting(self):
+        """Tests that lines raising exceptions other than CalculationErrors report errors, and can be parsed
+        iteratively"""
+        deep = '(' * 5000 + '1' + ')' * 5000
+        results = list(calculate_lines([deep, '2+2']))
+        self.assertIsNone(results[0][1])
+        self.assertIsNotNone(results[0][2])
+        self.assertEqual(('2+2', 4, None), results[1])
+        self.assertEqual([(deep, 1, None)], list(calculate_lines([deep], iterative=True)))
+
+    def test_should_be_lazy(self):
+        """Tests that lines are calculated as they are consumed"""
+        def lines():
+            yield '1+1'
+            raise AssertionError('Read past the first line')
+
+        self.assertEqual(('1+1', 2, None), next(calculate_lines(lines())))
+
+
+class TestStartup(unittest.TestCase):
+    """Tests for the imports of the calculator module and its lean command line path"""
+
+    def run_python(self, *arguments: str) -> str:
+        """Runs a fresh interpreter with the repository on its path
+
+        :returns The standard output
+        """
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        environment = dict(os.environ, PYTHONPATH=root)
+        return subprocess.run([sys.executable, *arguments], capture_output=True, text=True, env=environment,
+                              check=True).stdout
+
+    def test_should_not_import_argparse_or_json(self):
+        """Tests that importing the module and calculating with -c do not import argparse or json"""
+        output = self.run_python('-c', 'import sys; import dt042g_src.calculator as c; c.sys.argv[1:] = ["-c", "2*3"];'
+                                       'c.main(); print("argparse" in sys.modules, "json" in sys.modules)')
+        self.assertEqual('2*3 = 6\nFalse False\n', output)
+
+    def test_should_parse_other_arguments_with_argparse(self):
+        """Tests that arguments other than -c and an expression are still parsed"""
+        self.assertEqual('1+1 = 2\n', self.run_python('-m', 'dt042g_src.calculator', '--calculate', '1+1', '-w', '1'))
+
+    def test_should_reject_negative_workers_with_usage(self):
+        """Tests that a negative number of workers exits with a usage message instead of a traceback"""
+        with mock.patch.object(sys, 'argv', ['calculator', '-b', '-w', '-1']), \
+                mock.patch.object(sys, 'stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as context:
+                calculator_module.main()
+        self.assertEqual(2, context.exception.code)
+        self.assertIn('usage:', stderr.getvalue())
+
+
+class TestCalculateBatch(unittest.TestCase):
+    """Tests for the calculate_batch() function"""
+
+    def test_should_write_text_lines(self):
+        """Tests that results are written as 'expression = result' lines"""
+        output = io.StringIO()
+        errors = calculate_batch(io.StringIO('1+2\n5-7\n'), output, buffer_lines=1)
+        self.assertEqual('1+2 = 3\n5-7 = -2\n', output.getvalue())
+        self.assertEqual(0, errors)
+
+    def test_should_write_json_lines(self):
+        """Tests that results and errors are written as JSON Lines"""
+        output = io.StringIO()
+        errors = calculate_batch(io.StringIO('1+2\n1/0\n'), output, json_lines=True)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual({'expression': '1+2', 'result': 3}, lines[0])
+        self.assertEqual('1/0', lines[1]['expression'])
+        self.assertIn('error', lines[1])
+        self.assertEqual(1, errors)
+
+    def test_should_calculate_in_worker_processes(self):
+        """Tests that results calculated in worker processes are written in order"""
+        output = io.StringIO()
+        calculate_batch(io.StringIO('1+2\n5-7\n2^3\n'), output, workers=2)
+        self.assertEqual('1+2 = 3\n5-7 = -2\n2^3 = 8\n', output.getvalue())
+
+
 class TestOperations(unittest.TestCase):
     """Tests for the Operations class """
 
@@ -466,6 +1139,11 @@ class TestToken(unittest.TestCase):
         token = Token(TokenType.NUMBER, '123')
         self.assertEqual('123', token.value)
 
+    def test_has_position(self):
+        """Tests that a Token has a position, which defaults to None"""
+        self.assertIsNone(Token(TokenType.END, '').position)
+        self.assertEqual(4, Token(TokenType.NUMBER, '123', 4).position)
+
 
 class TestTokenType(unittest.TestCase):
     """Tests for the TokenType class"""
@@ -506,6 +1184,20 @@ class TestTokenType(unittest.TestCase):
         """Tests that the class defines an end"""
         self.assertTrue(hasattr(TokenType, 'END'))
 
+    def test_defines_identifier(self):
+        """Tests that the class defines an identifier"""
+        self.assertTrue(hasattr(TokenType, 'IDENTIFIER'))
+
+    def test_defines_comparisons_and_keywords(self):
+        """Tests that the class defines the comparison operators and boolean keywords"""
+        for name in ['LESS', 'LESS_EQUAL', 'GREATER', 'GREATER_EQUAL', 'EQUAL', 'NOT_EQUAL', 'AND', 'OR', 'NOT']:
+            with self.subTest(name=name):
+                self.assertTrue(hasattr(TokenType, name))
+
+    def test_defines_comma(self):
+        """Tests that the class defines a comma"""
+        self.assertTrue(hasattr(TokenType, 'COMMA'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import decimal
+import json
+import unittest
+from fractions import Fraction
+from dt042g_src.calculator import FUNCTIONS, INTEGER_BACKEND, Calculator, DivisionByZeroError, \
+    NonRealResultError, UnboundVariableError, compile as compile_expression, decimal_backend, fraction_backend
+from dt042g_src.codegen import NativeCompiler, NativeExpression
+from dt042g_src.optimizer import optimize
+
+
+class TestNativeExpression(unittest.TestCase):
+    """Tests for the NativeExpression class"""
+
+    def test_should_match_calculator_on_corpus(self):
+        """Tests that every expression of the corpus evaluates to the same value, or raises the same error"""
+        with open('../lab2_expressions/expressions.json') as file_handle:
+            corpus = json.load(file_handle)
+        for expression in corpus:
+            with self.subTest(expression=expression):
+                try:
+                    expected = Calculator(expression).calculate()
+                except (ValueError, ArithmeticError) as e:
+                    with self.assertRaises(type(e)):
+                        NativeExpression(compile_expression(expression)).evaluate()
+                else:
+                    self.assertEqual(expected, NativeExpression(compile_expression(expression)).evaluate())
+
+    def test_should_keep_precedence_and_associativity(self):
+        """Tests that the generated source binds like the grammar, where Python operators bind differently"""
+        for expression, expected in [('-2 ^ 2', -4), ('(-2) ^ 2', 4), ('2 ^ -1', 0.5), ('2 ^ 3 ^ 2', 512),
+                                     ('3 > 2 > 1', 0), ('8 - 4 - 2', 2), ('8 / (4 / 2)', 4), ('not 2 == 2', 0),
+                                     ('not 0 and 2', 2), ('0 or 1 and 0', 0), ('-(-3)', 3)]:
+            with self.subTest(expression=expression):
+                self.assertEqual(expected, NativeExpression(compile_expression(expression)).evaluate())
+
+    def test_should_keep_folded_negative_numbers(self):
+        """Tests that negative numbers folded by the optimizer are parenthesized"""
+        native = NativeExpression(optimize(compile_expression('(0 - 2) ^ x')))
+        self.assertEqual(4, native.evaluate({'x': 2}))
+
+    def test_should_reference_large_integers_by_name(self):
+        """Tests that ints with more digits than can be converted to text are not written as literals"""
+        native = NativeExpression(optimize(compile_expression('x * 10^5000', backend=INTEGER_BACKEND)))
+        self.assertEqual(2 * 10 ** 5000, native.evaluate([2]))
+
+    def test_should_bind_variables(self):
+        """Tests that variables are bound by name or position, and unbound variables raise"""
+        native = NativeExpression(compile_expression('x * 10 + y'))
+        self.assertEqual(32, native.evaluate({'x': 3, 'y': 2}))
+        self.assertEqual(32, native.evaluate([3, 2]))
+        with self.assertRaises(UnboundVariableError):
+            native.evaluate({'x': 3})
+
+    def test_should_check_division_by_zero(self):
+        """Tests that division keeps the zero check of Operations.divide"""
+        with self.assertRaises(DivisionByZeroError):
+            NativeExpression(compile_expression('1 / (x - 1)')).evaluate([1])
+
+    def test_should_check_zero_to_negative_power(self):
+        """Tests that powers keep the zero check of Operations.exponentiation"""
+        with self.assertRaises(DivisionByZeroError):
+            NativeExpression(compile_expression('x ^ -1')).evaluate([0])
+
+    def test_should_check_comparisons_of_complex_numbers(self):
+        """Tests that comparisons keep the check of Operations for complex numbers"""
+        for expression in ['x ^ 0.5 < 1', '1 == x ^ 0.5', 'not x ^ 0.5']:
+            with self.subTest(expression=expression):
+                with self.assertRaises(NonRealResultError):
+                    NativeExpression(compile_expression(expression)).evaluate([-1])
+
+    def test_should_short_circuit(self):
+        """Tests that skipped operands of boolean operations and conditionals are not evaluated"""
+        for expression, expected in [('0 and 1 / 0', 0), ('2 or 1 / 0', 2), ('if(1, 3, 1 / 0)', 3),
+                                     ('if(0, 1 / 0, 4)', 4)]:
+            with self.subTest(expression=expression):
+                self.assertEqual(expected, NativeExpression(compile_expression(expression)).evaluate())
+
+    def test_should_call_functions(self):
+        """Tests that function calls are made through the Function they were compiled with"""
+        functions = FUNCTIONS.copy()
+        functions.register('twice', lambda x: 2 * x)
+        compiled = Calculator('twice(x) + hypot(3, 4)', functions=functions).compile()
+        self.assertEqual(15, NativeExpression(compiled).evaluate({'x': 5}))
+
+    def test_should_use_operations_of_backend(self):
+        """Tests that the operations, numbers and context of the backend are used"""
+        self.assertEqual(2 ** 70 // 4, NativeExpression(compile_expression('2 ^ 70 / 4', backend=INTEGER_BACKEND))
+                         .evaluate())
+        self.assertEqual(Fraction(1, 3), NativeExpression(compile_expression('1 / 3', backend=fraction_backend()))
+                         .evaluate())
+        backend = decimal_backend(decimal.Context(prec=5))
+        self.assertEqual(decimal.Decimal('0.33333'), NativeExpression(compile_expression('1 / 3', backend=backend))
+                         .evaluate())
+
+    def test_should_fall_back_for_deep_expressions(self):
+        """Tests that expressions too deep for the Python compiler are evaluated by the compiled expression"""
+        expression = '(' * 5000 + '1' + ' + 1)' * 5000
+        native = NativeExpression(compile_expression(expression, iterative=True))
+        self.assertFalse(native.native)
+        self.assertIsNone(native.source)
+        self.assertEqual(5001, native.evaluate())
+
+
+class TestNativeCompiler(unittest.TestCase):
+    """Tests for the NativeCompiler class"""
+
+    def test_should_cache_by_text_and_backend(self):
+        """Tests that expressions are compiled once per text and backend"""
+        compiler = NativeCompiler()
+        native = compiler.compile('x + 1')
+        self.assertTrue(native.native)
+        self.assertIs(native, compiler.compile('x + 1'))
+        self.assertIsNot(native, compiler.compile('x + 1', backend=INTEGER_BACKEND))
+        stats = compiler.stats()
+        self.assertEqual((1, 2), (stats.hits, stats.misses))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from dt042g_src import disk_cache
+from dt042g_src.cache import ExpressionCache
+from dt042g_src.calculator import FUNCTIONS, INTEGER_BACKEND, Calculator, ExpressionSyntaxError, Limits, \
+    LimitExceededError, compile as compile_expression, decimal_backend, fraction_backend
+from dt042g_src.disk_cache import DiskCache, decode_tree, encode_tree
+
+
+def compile_in_process(path: str, expressions: list) -> tuple:
+    """Compiles expressions through a DiskCache opened by a worker process
+
+    :returns The values of the compiled expressions with x bound to 2, and the number of hits
+    """
+    with DiskCache(path) as cache:
+        values = [cache.compile(expression).evaluate({'x': 2}) for expression in expressions]
+        return values, cache.stats().hits
+
+
+class TestEncodeTree(unittest.TestCase):
+    """Tests for the encode_tree() and decode_tree() functions"""
+
+    def test_should_decode_to_equal_tree(self):
+        """Tests that decoded trees equal the parsed trees, for every backend and every kind of node"""
+        with open('../lab2_expressions/expressions.json') as file_handle:
+            expressions = list(json.load(file_handle))
+        expressions += ['if(x > 1 and y, -x, max(1, 2, x)) or not z', '0x1f / 3 ^ -0.5e1', 'round(x, 2) != 1e999']
+        for backend in (None, INTEGER_BACKEND, decimal_backend(), fraction_backend()):
+            for expression in expressions:
+                with self.subTest(backend=backend, expression=expression):
+                    try:
+                        tree = compile_expression(expression, backend=backend).tree
+                    except ExpressionSyntaxError:
+                        continue
+                    self.assertEqual(tree, decode_tree(encode_tree(tree), FUNCTIONS))
+
+    def test_should_not_decode_unknown_functions(self):
+        """Tests that calls of functions which are not registered with the same arity are not decoded"""
+        functions = FUNCTIONS.copy()
+        functions.register('double', lambda x: x * 2)
+        text = encode_tree(Calculator('double(x)', functions=functions).compile().tree)
+        self.assertIsNotNone(decode_tree(text, functions))
+        self.assertIsNone(decode_tree(text, FUNCTIONS))
+        functions.register('double', lambda x, y: x * 2, 2, 2)
+        self.assertIsNone(decode_tree(text, functions))
+
+
+class TestDiskCache(unittest.TestCase):
+    """Tests for the DiskCache class"""
+
+    def setUp(self) -> None:
+        """Creates a directory for the database"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite')
+
+    def tearDown(self) -> None:
+        """Removes the directory"""
+        self.directory.cleanup()
+
+    def test_should_persist_across_instances(self):
+        """Tests that expressions compiled by one instance are hits of the next, keyed on the normalized text"""
+        with DiskCache(self.path) as cache:
+            self.assertEqual(7, cache.compile('1 + x * 2').evaluate({'x': 3}))
+            self.assertEqual((0, 1), (cache.stats().hits, cache.stats().misses))
+        with DiskCache(self.path) as cache:
+            compiled = cache.compile(' 1+x*2 ')
+            self.assertEqual(' 1+x*2 ', compiled.expression)
+            self.assertEqual(7, compiled.evaluate({'x': 3}))
+            self.assertEqual((1, 0, 1), (cache.stats().hits, cache.stats().misses, cache.stats().size))
+
+    def test_should_key_on_backend_and_version(self):
+        """Tests that entries of other backends and engine versions are not read"""
+        with DiskCache(self.path) as cache:
+            cache.compile('2 ^ 70')
+            self.assertEqual(2 ** 70, cache.compile('2 ^ 70', backend=INTEGER_BACKEND).evaluate())
+            with mock.patch.object(disk_cache, 'ENGINE_VERSION', 'other'):
+                cache.compile('2 ^ 70')
+            self.assertEqual((0, 3, 3), (cache.stats().hits, cache.stats().misses, cache.stats().size))
+
+    def test_should_resolve_functions_on_load(self):
+        """Tests that a cached call of a function which is not registered is parsed again, and raises like parsing"""
+        functions = FUNCTIONS.copy()
+        functions.register('double', lambda x: x * 2)
+        with DiskCache(self.path) as cache:
+            self.assertEqual(4, cache.compile('double(x)', functions=functions).evaluate({'x': 2}))
+            self.assertRaises(ExpressionSyntaxError, cache.compile, 'double(x)')
+            self.assertEqual(0, cache.stats().hits)
+
+    def test_should_not_cache_invalid_expressions(self):
+        """Tests that expressions which do not parse raise and are not stored"""
+        with DiskCache(self.path) as cache:
+            self.assertRaises(ExpressionSyntaxError, cache.compile, '1 +')
+            self.assertEqual(0, cache.stats().size)
+
+    def test_should_evict_least_recently_used(self):
+        """Tests that a tenth of the entries, the least recently used, are evicted when there are more than maxsize"""
+        with DiskCache(self.path, maxsize=10, touch_interval=0) as cache:
+            for i in range(10):
+                cache.compile(f'{i} + x')
+            cache.compile('0 + x')
+            cache.compile('10 + x')
+            stats = cache.stats()
+            self.assertEqual((9, 2), (stats.size, stats.evictions))
+            cache.compile('0 + x')
+            cache.compile('10 + x')
+            self.assertEqual((3, 11), (cache.stats().hits, cache.stats().misses))
+
+    def test_should_check_limits_on_hits(self):
+        """Tests that the length, Tokens, nesting and operations of a cached expression are checked against the
+        limits"""
+        with DiskCache(self.path) as cache:
+            cache.compile('1 + 2 + 3 + 4')
+            cache.compile('((1))')
+            self.assertRaises(LimitExceededError, cache.compile, '1 + 2 + 3 + 4', limits=Limits(max_operations=2))
+            self.assertRaises(LimitExceededError, cache.compile, '1 + 2 + 3 + 4', limits=Limits(max_length=5))
+            self.assertRaises(LimitExceededError, cache.compile, '1 + 2 + 3 + 4', limits=Limits(max_tokens=6))
+            with self.assertRaises(LimitExceededError) as context:
+                cache.compile('((1))', limits=Limits(max_depth=1))
+            self.assertEqual(1, context.exception.position)
+            self.assertEqual(1, cache.compile('((1))', limits=Limits(max_tokens=5, max_depth=2)).evaluate())
+            self.assertEqual(4, cache.stats().hits)
+
+    def test_should_be_store_of_expression_cache(self):
+        """Tests that an ExpressionCache compiles its misses through a DiskCache store"""
+        with DiskCache(self.path) as store:
+            store.compile('x ^ 2')
+            cache = ExpressionCache(store=store)
+            self.assertEqual(9, Calculator('3 ^ 2', cache=cache).calculate())
+            self.assertEqual(16, cache.compile('x^2').evaluate({'x': 4}))
+            cache.compile('x ^ 2')
+            self.assertEqual(1, store.stats().hits)
+
+    def test_should_be_shared_by_processes(self):
+        """Tests that processes reading and writing the same database at once compile the same expressions"""
+        expressions = [f'x * {i} + (x - {i}) ^ 2' for i in range(100)]
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(compile_in_process, [self.path] * 4, [expressions] * 4))
+        expected = [compile_expression(expression).evaluate({'x': 2}) for expression in expressions]
+        for values, _ in results:
+            self.assertEqual(expected, values)
+        with DiskCache(self.path) as cache:
+            self.assertEqual(100, cache.stats().size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+import decimal
+import json
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from dt042g_src.cache import ExpressionCache
+from dt042g_src.calculator import FUNCTIONS, Calculator, DivisionByZeroError, ExpressionSyntaxError, Limits, \
+    LimitExceededError, decimal_backend
+from dt042g_src.engine import CalculatorEngine
+
+
+class TestCalculatorEngine(unittest.TestCase):
+    """Tests for the CalculatorEngine class"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Loads test data"""
+        with open('../lab2_expressions/expressions.json') as file_handle:
+            cls.test_data = json.load(file_handle)
+
+    def test_should_calculate_like_calculator(self):
+        """Tests that one engine calculates the expressions of the test data like a Calculator for each"""
+        for engine in (CalculatorEngine(), CalculatorEngine(iterative=True, cache=ExpressionCache())):
+            for expression, expected_result in self.test_data.items():
+                with self.subTest(engine=engine, expression=expression):
+                    self.assertEqual(expected_result, engine.calculate(expression))
+
+    def test_should_bind_variables(self):
+        """Tests that variables are bound by mapping and by position"""
+        engine = CalculatorEngine(cache=ExpressionCache())
+        self.assertEqual(7, engine.calculate('x * 2 + y', {'x': 3, 'y': 1}))
+        self.assertEqual(9, engine.calculate('x * 2 + y', [4, 1]))
+
+    def test_should_not_parse_cached_expressions(self):
+        """Tests that expressions and results found in the cache are returned without creating a Calculator"""
+        cache = ExpressionCache()
+        engine = CalculatorEngine(cache=cache)
+        self.assertEqual(3, engine.calculate('1 + 2'))
+        with mock.patch('dt042g_src.engine.Calculator') as calculator:
+            self.assertEqual(3, engine.calculate('1 + 2'))
+            self.assertEqual(4, engine.calculate('1 + x', [3]))
+        calculator.assert_not_called()
+        self.assertEqual(1, cache.stats()['results'].hits)
+
+    def test_should_use_configuration(self):
+        """Tests that the backend and limits of the engine are used for every expression"""
+        engine = CalculatorEngine(backend=decimal_backend(decimal.Context(prec=5)), limits=Limits(max_length=8))
+        self.assertEqual(decimal.Decimal('0.33333'), engine.calculate('1 / 3'))
+        self.assertRaises(LimitExceededError, engine.calculate, '1 + 2 + 3')
+
+    def test_should_return_errors_of_batch(self):
+        """Tests that calculate_many() returns errors in place of results"""
+        results = CalculatorEngine().calculate_many(['1 + 1', '1 / 0', '(1'])
+        self.assertEqual(2, results[0])
+        self.assertIsInstance(results[1], DivisionByZeroError)
+        self.assertIsInstance(results[2], ExpressionSyntaxError)
+
+    def test_should_be_reentrant(self):
+        """Tests that a function called by the engine can calculate with the same engine"""
+        functions = FUNCTIONS.copy()
+        engine = CalculatorEngine(functions=functions, cache=ExpressionCache())
+        functions.register('inner', lambda x: engine.calculate('x * (10 + 1)', {'x': x}))
+        self.assertEqual(23, engine.calculate('inner(2) + 1'))
+
+    def test_should_calculate_concurrently(self):
+        """Tests that threads sharing an engine and its cache calculate the same results as a Calculator for each
+        expression, also with a decimal backend whose context is set per evaluation"""
+        expressions = list(self.test_data) + [f'(x + {i}) * (x - {i}) / 7' for i in range(50)]
+        for backend in (None, decimal_backend(decimal.Context(prec=12))):
+            engine = CalculatorEngine(backend=backend, cache=ExpressionCache(maxsize=16, compiled_maxsize=16))
+            expected = {}
+            for expression in expressions:
+                try:
+                    expected[expression] = Calculator(expression.replace('x', '3'), backend=backend).calculate()
+                except (ValueError, ArithmeticError) as e:
+                    expected[expression] = type(e)
+
+            def calculate(expression: str):
+                try:
+                    return expression, engine.calculate(expression, {'x': 3} if 'x' in expression else None)
+                except (ValueError, ArithmeticError) as e:
+                    return expression, type(e)
+
+            interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+            try:
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    results = list(executor.map(calculate, expressions * 20))
+            finally:
+                sys.setswitchinterval(interval)
+            with self.subTest(backend=backend):
+                self.assertEqual(len(expressions) * 20, len(results))
+                for expression, result in results:
+                    self.assertEqual(expected[expression], result, expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
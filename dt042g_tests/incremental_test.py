@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+import unittest
+from fractions import Fraction
+from dt042g_src.calculator import FUNCTIONS, DivisionByZeroError, UnboundVariableError, \
+    compile as compile_expression, fraction_backend, Calculator
+from dt042g_src.incremental import IncrementalEvaluator
+
+
+class TestIncrementalEvaluator(unittest.TestCase):
+    """Tests for the IncrementalEvaluator class"""
+
+    def test_should_evaluate_like_compiled_expression(self):
+        """Tests that the value follows the variables as they are set"""
+        compiled = compile_expression('(a + b) * c - a / 2')
+        evaluator = IncrementalEvaluator(compiled, {'a': 2, 'b': 3, 'c': 4})
+        self.assertEqual(19, evaluator.value())
+        for name, value in [('a', 4), ('c', 0.5), ('b', -1)]:
+            evaluator.set(name, value)
+        self.assertEqual(compiled.evaluate({'a': 4, 'b': -1, 'c': 0.5}), evaluator.value())
+
+    def test_should_only_recompute_changed_path(self):
+        """Tests that only the nodes depending on a changed variable are recomputed"""
+        evaluator = IncrementalEvaluator(compile_expression('((a + b) + (c + d)) + ((e + f) + (g + h))'),
+                                         dict.fromkeys('abcdefgh', 1))
+        self.assertEqual(8, evaluator.value())
+        self.assertEqual(7, evaluator.recomputed)
+        evaluator.set('c', 2)
+        self.assertEqual(9, evaluator.value())
+        self.assertEqual(3, evaluator.recomputed)
+        self.assertEqual(9, evaluator.value())
+        self.assertEqual(0, evaluator.recomputed)
+
+    def test_should_stop_at_unchanged_values(self):
+        """Tests that nodes whose value did not change do not recompute the nodes depending on them"""
+        evaluator = IncrementalEvaluator(compile_expression('(a > 0) * 10 + b'), {'a': 1, 'b': 1})
+        evaluator.value()
+        evaluator.set('a', 2)
+        self.assertEqual(11, evaluator.value())
+        self.assertEqual(1, evaluator.recomputed)
+        evaluator.set('a', 2)
+        evaluator.value()
+        self.assertEqual(0, evaluator.recomputed)
+
+    def test_should_not_raise_for_skipped_operands(self):
+        """Tests that errors of operands skipped by conditionals are kept until they are taken"""
+        evaluator = IncrementalEvaluator(compile_expression('if(x != 0, 1 / x, 0) + 1 / (y - x)'), {'x': 0, 'y': 1})
+        self.assertEqual(1, evaluator.value())
+        evaluator.set('y', 0)
+        with self.assertRaises(DivisionByZeroError):
+            evaluator.value()
+        evaluator.set('x', 2)
+        self.assertEqual(0, evaluator.value())
+
+    def test_should_not_compute_untaken_branches(self):
+        """Tests that the operands conditionals and boolean operations skip are not computed, and are brought up to
+        date once they are taken"""
+        evaluator = IncrementalEvaluator(compile_expression('if(x > 0, (a + 1) * 2, b - 1)'), {'x': 0, 'a': 1, 'b': 1})
+        self.assertEqual(0, evaluator.value())
+        self.assertEqual(3, evaluator.recomputed)
+        evaluator.set('a', 5)
+        self.assertEqual(0, evaluator.value())
+        self.assertEqual(0, evaluator.recomputed)
+        evaluator.set('x', 1)
+        self.assertEqual(12, evaluator.value())
+        self.assertEqual(4, evaluator.recomputed)
+        evaluator = IncrementalEvaluator(compile_expression('x == 0 or 1 / x > 1'), {'x': 0})
+        self.assertTrue(evaluator.value())
+        self.assertEqual(2, evaluator.recomputed)
+
+    def test_should_require_variables(self):
+        """Tests that unset variables raise on evaluation, and unknown variables raise when set"""
+        evaluator = IncrementalEvaluator(compile_expression('a + b'))
+        evaluator.set('a', 1)
+        with self.assertRaises(UnboundVariableError):
+            evaluator.value()
+        with self.assertRaises(ValueError):
+            evaluator.set('c', 1)
+
+    def test_should_use_backend(self):
+        """Tests that the operations of the backend are used"""
+        evaluator = IncrementalEvaluator(compile_expression('a / 3', backend=fraction_backend()), {'a': Fraction(1)})
+        self.assertEqual(Fraction(1, 3), evaluator.value())
+
+    def test_should_reject_impure_functions(self):
+        """Tests that expressions calling impure functions are rejected, since their value can not be memoized"""
+        functions = FUNCTIONS.copy()
+        functions.register('noise', lambda x: x, pure=False)
+        with self.assertRaises(ValueError):
+            IncrementalEvaluator(Calculator('noise(a) + a', functions=functions).compile())
+
+
+if __name__ == '__main__':
+    unittest.main()
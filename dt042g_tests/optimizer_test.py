@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+import decimal
+import unittest
+from dt042g_src.calculator import BinaryOperation, Number, Operations, Variable, INTEGER_BACKEND, decimal_backend, \
+    Calculator, FunctionCall, FunctionRegistry, OpCode, DivisionByZeroError, NonRealResultError, UnboundVariableError, \
+    Limits, LimitExceededError, compile as compile_expression
+from dt042g_src.optimizer import count_nodes, optimize, share_subtrees, simplify
+
+
+class TestSimplify(unittest.TestCase):
+    """Tests for the simplify() function"""
+
+    def test_should_fold_constant_subtrees(self):
+        """Tests that operations on numbers are folded into numbers"""
+        tree = simplify(compile_expression('(2^10)*x').tree)
+        self.assertEqual(BinaryOperation(Operations.multiply, Number(1024), Variable('x')), tree)
+
+    def test_should_fold_whole_expression(self):
+        """Tests that an expression without variables folds into a single number"""
+        self.assertEqual(Number(-7), simplify(compile_expression('-(3-3)*2-7').tree))
+
+    def test_should_remove_identities(self):
+        """Tests that identity operations are removed"""
+        for expression in ['x*1+0', '1*x', '0+x-0', 'x/1', 'x^1', '--x', '(5-4)*x^(2-1)']:
+            with self.subTest(expression=expression):
+                self.assertEqual(Variable('x'), simplify(compile_expression(expression).tree))
+
+    def test_should_keep_division_by_zero(self):
+        """Tests that a division by zero is not folded"""
+        tree = compile_expression('1/0').tree
+        self.assertEqual(tree, simplify(tree))
+
+    def test_should_fold_pure_function_calls(self):
+        """Tests that calls of pure functions on numbers fold, and calls which raise error are kept"""
+        self.assertEqual(Number(5), simplify(compile_expression('hypot(3, 1+3)').tree))
+        tree = compile_expression('sqrt(0-1)').tree
+        self.assertEqual(FunctionCall(tree.function, (Number(-1),)), simplify(tree))
+
+    def test_should_not_fold_impure_function_calls(self):
+        """Tests that calls of impure functions are kept"""
+        functions = FunctionRegistry()
+        functions.register('tick', lambda x: x, pure=False)
+        tree = Calculator('tick(1)', functions=functions).compile().tree
+        self.assertIs(tree, simplify(tree))
+
+    def test_should_fold_constant_conditions(self):
+        """Tests that conditionals and boolean operations deciding on a number are replaced by their result"""
+        self.assertEqual(Variable('x'), simplify(compile_expression('if(2 > 1, x, 1/0)').tree))
+        self.assertEqual(Variable('y'), simplify(compile_expression('1 and y').tree))
+        self.assertEqual(Number(0), simplify(compile_expression('0 and y').tree))
+        self.assertEqual(Number(True), simplify(compile_expression('1 < 2 or y').tree))
+
+    def test_should_not_remove_unsafe_identities(self):
+        """Tests that multiplication by zero is kept, since it is not zero for infinite values"""
+        tree = simplify(compile_expression('(3-3)*y').tree)
+        self.assertEqual(BinaryOperation(Operations.multiply, Number(0), Variable('y')), tree)
+
+
+class TestShareSubtrees(unittest.TestCase):
+    """Tests for the share_subtrees() function and the evaluation of shared subtrees"""
+
+    def test_should_intern_subtrees_of_same_structure(self):
+        """Tests that subtrees of the same structure become a single object"""
+        tree = share_subtrees(compile_expression('(a + b * c) ^ 2 / (a + b * c)').tree)
+        self.assertIs(tree.left.left, tree.right)
+        self.assertEqual((13, 8), count_nodes(tree))
+
+    def test_should_recall_shared_subtrees(self):
+        """Tests that a shared subtree is calculated once and recalled where it occurs again"""
+        compiled = compile_expression('(a + b * c) ^ 2 / (a + b * c)')
+        shared = optimize(compiled)
+        opcodes = [opcode for opcode, _ in shared.program]
+        self.assertEqual([OpCode.STORE, OpCode.RECALL], [opcode for opcode in opcodes if opcode.value >= 9])
+        self.assertEqual(1, shared.slot_count)
+        self.assertEqual(10, len(shared.program))
+        for values in ({'a': 1, 'b': 2, 'c': 3}, {'a': -2.5, 'b': 0.5, 'c': 7}):
+            with self.subTest(values=values):
+                self.assertEqual(compiled.evaluate(values), shared.evaluate(values))
+
+    def test_should_not_share_numbers_which_calculate_differently(self):
+        """Tests that equal numbers of different sign or precision are not shared"""
+        tree = share_subtrees(BinaryOperation(Operations.add, Number(0.0), Number(-0.0)))
+        self.assertIsNot(tree.left, tree.right)
+        tree = compile_expression('1.0 * x + 1 * x', backend=decimal_backend()).tree
+        tree = share_subtrees(tree)
+        self.assertIsNot(tree.left, tree.right)
+
+    def test_should_share_large_integers(self):
+        """Tests that integers with more digits than int can convert to text are shared by value"""
+        optimized = optimize(compile_expression('x * 10^5000 + x * 10^5000', backend=INTEGER_BACKEND))
+        self.assertEqual(4 * 10 ** 5000, optimized.evaluate([2]))
+        self.assertIs(optimized.tree.left, optimized.tree.right)
+
+    def test_should_not_share_impure_function_calls(self):
+        """Tests that calls of impure functions, and the subtrees containing them, are not shared"""
+        functions = FunctionRegistry()
+        functions.register('tick', lambda x: x, pure=False)
+        tree = share_subtrees(Calculator('(tick(1) + 1) - (tick(1) + 1)', functions=functions).compile().tree)
+        self.assertIsNot(tree.left, tree.right)
+        self.assertIsNot(tree.left.left, tree.right.left)
+
+    def test_should_not_recall_subtrees_of_skipped_branches(self):
+        """Tests that a subtree first calculated in a branch which may be skipped is calculated again outside it,
+        and raises the same errors"""
+        compiled = optimize(compile_expression('if(x > 0, 1 / y, 0) + (x > 0 and 1 / y) + 1 / y'))
+        self.assertEqual(0, compiled.evaluate({'x': 0, 'y': 0.5}) - 2)
+        self.assertEqual(6, compiled.evaluate({'x': 1, 'y': 0.5}))
+        self.assertRaises(DivisionByZeroError, compiled.evaluate, {'x': 0, 'y': 0})
+
+    def test_should_evaluate_corpus_like_tree(self):
+        """Tests that shared trees of repetitive expressions evaluate like the original trees"""
+        for expression in ['(x - y) * (x - y) + sqrt(abs(x - y)) - (x - y)', 'if(x < y, x * y, x / y) / (x * y)',
+                           '((x + 1) * (y + 1) or x) + ((x + 1) * (y + 1) and y) - max(x + 1, y + 1, x + 1)']:
+            for values in ({'x': 3, 'y': -2}, {'x': 0.5, 'y': 4}, {'x': 0, 'y': 0}):
+                with self.subTest(expression=expression, values=values):
+                    compiled = compile_expression(expression)
+                    try:
+                        expected = compiled.evaluate(values)
+                    except ZeroDivisionError:
+                        self.assertRaises(ZeroDivisionError, optimize(compiled).evaluate, values)
+                    else:
+                        self.assertEqual(expected, optimize(compiled).evaluate(values))
+
+
+class TestOptimize(unittest.TestCase):
+    """Tests for the optimize() function"""
+
+    def test_should_evaluate_to_same_value(self):
+        """Tests that optimized expressions evaluate like the original"""
+        for expression in ['(2^10)*x', 'x*1+0-y', '2^3^2/x+-(4-1)*y', '-(y)^(1+1)']:
+            with self.subTest(expression=expression):
+                compiled = compile_expression(expression)
+                values = {'x': 3, 'y': -2}
+                self.assertEqual(compiled.evaluate(values), optimize(compiled).evaluate(values))
+
+    def test_should_keep_variable_order(self):
+        """Tests that the variables keep their positions"""
+        compiled = compile_expression('b*1+a*(2-1)')
+        self.assertEqual(('b', 'a'), optimize(compiled).variables)
+
+    def test_should_keep_variables_of_folded_branches(self):
+        """Tests that variables only used in branches which are folded away are still bound, and raise if unbound"""
+        optimized = optimize(compile_expression('if(1, x, y) + (0 and z)'))
+        self.assertEqual(('x', 'y', 'z'), optimized.variables)
+        self.assertEqual(2, optimized.evaluate([2, 3, 4]))
+        self.assertRaises(ValueError, optimized.evaluate, [2])
+        self.assertRaises(UnboundVariableError, optimized.evaluate, {'x': 2})
+
+    def test_should_not_fold_comparisons_of_complex_numbers(self):
+        """Tests that a comparison of a complex number is left to raise on evaluation"""
+        self.assertRaises(NonRealResultError, optimize(compile_expression('x + ((0-1)^0.5 < 1)')).evaluate, [1])
+
+    def test_should_not_fold_results_beyond_limits(self):
+        """Tests that an operation exceeding the limits of the backend is left to raise on evaluation"""
+        optimized = optimize(Calculator('x + 1e300 * 1e300', limits=Limits(max_magnitude=1e308)).compile())
+        self.assertRaises(LimitExceededError, optimized.evaluate, [1])
+
+    def test_should_shorten_program(self):
+        """Tests that the optimized program has fewer instructions"""
+        compiled = compile_expression('(2^10)*x*1+0')
+        self.assertEqual(3, len(optimize(compiled).program))
+
+    def test_division_by_zero_should_raise_on_evaluation(self):
+        """Tests that a division by zero still raises when evaluated"""
+        self.assertRaises(ZeroDivisionError, optimize(compile_expression('x+1/(2-2)')).evaluate, {'x': 1})
+
+    def test_should_fold_with_backend(self):
+        """Tests that numbers are folded with the operations and context of the backend"""
+        optimized = optimize(compile_expression('x*(2^70/2)', backend=INTEGER_BACKEND))
+        self.assertIs(INTEGER_BACKEND, optimized.backend)
+        self.assertEqual(Number(2 ** 69), optimized.tree.right)
+        optimized = optimize(compile_expression('x*(1/3)', backend=decimal_backend(decimal.Context(prec=3))))
+        self.assertEqual(Number(decimal.Decimal('0.333')), optimized.tree.right)
+
+
+if __name__ == '__main__':
+    unittest.main()
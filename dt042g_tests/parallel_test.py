@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import os
+import unittest
+from dt042g_src.calculator import calculate_lines
+from dt042g_src.parallel import ParallelCalculator, WORKER_CRASHED, calculate_parallel
+
+
+def crash_on_marker(chunk: list, iterative: bool) -> list:
+    """Calculates a chunk like the default worker, but exits the worker process if a line contains 'crash'"""
+    if any('crash' in line for line in chunk):
+        os._exit(1)
+    return list(calculate_lines(chunk, iterative))
+
+
+class CrashingCalculator(ParallelCalculator):
+    """A ParallelCalculator whose workers crash on chunks with marked lines"""
+    _worker = staticmethod(crash_on_marker)
+
+
+class TestParallelCalculator(unittest.TestCase):
+    """Tests for the ParallelCalculator class"""
+
+    lines = [f'{i}*2+1' for i in range(200)] + ['1/0', '(1', '(' * 5000 + '1' + ')' * 5000]
+
+    def test_should_match_sequential_results_in_order(self):
+        """Tests that ordered results equal the results of calculate_lines()"""
+        results = list(calculate_parallel(self.lines, workers=2, chunk_size=7))
+        self.assertEqual(list(calculate_lines(self.lines)), results)
+
+    def test_unordered_should_yield_every_result(self):
+        """Tests that unordered results contain every result"""
+        results = list(calculate_parallel(self.lines, workers=2, chunk_size=7, ordered=False))
+        self.assertCountEqual(list(calculate_lines(self.lines)), results)
+
+    def test_should_recover_from_crashed_worker(self):
+        """Tests that only the lines of the chunk crashing a worker are reported as errors"""
+        lines = ['1+1', '2+2', 'crash', '3+3', '4+4', '5+5']
+        results = list(CrashingCalculator(workers=2, chunk_size=2).calculate(lines))
+        self.assertEqual([('1+1', 2, None), ('2+2', 4, None), ('crash', None, WORKER_CRASHED),
+                          ('3+3', None, WORKER_CRASHED), ('4+4', 8, None), ('5+5', 10, None)], results)
+
+    def test_unordered_should_recover_from_crashed_worker(self):
+        """Tests that unordered calculation recovers from a crashed worker"""
+        lines = ['1+1', 'crash', '3+3', '4+4']
+        results = list(CrashingCalculator(workers=2, chunk_size=1, ordered=False).calculate(lines))
+        self.assertCountEqual([('1+1', 2, None), ('crash', None, WORKER_CRASHED), ('3+3', 6, None),
+                               ('4+4', 8, None)], results)
+
+    def test_should_reject_invalid_arguments(self):
+        """Tests that a non positive chunk size raises error"""
+        self.assertRaises(ValueError, ParallelCalculator, 2, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
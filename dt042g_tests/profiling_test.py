@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+import io
+import json
+import unittest
+from dt042g_src.calculator import INTEGER_BACKEND, Calculator, calculate_batch
+from dt042g_src.profiling import Histogram, Profiler
+
+
+class TestHistogram(unittest.TestCase):
+    """Tests for the Histogram class"""
+
+    def test_should_count_observations_in_cumulative_buckets(self):
+        """Tests that observations are counted in the bucket of their upper bound and every bucket after it"""
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 100):
+            histogram.observe(value)
+        self.assertEqual([(1, 2), (10, 3), (float('inf'), 4)], histogram.buckets())
+        self.assertEqual((4, 106.5, 100), (histogram.count, histogram.sum, histogram.max))
+
+
+class TestProfiler(unittest.TestCase):
+    """Tests for the Profiler class"""
+
+    def test_should_record_stages_tokens_and_operations(self):
+        """Tests that calculating records each stage once, the Token count and the operations executed"""
+        profiler = Profiler()
+        self.assertEqual(14, Calculator('2 * 3 + 2 * 4', profiler=profiler).calculate())
+        self.assertEqual({'tokenize': 1, 'parse': 1, 'flatten': 1, 'evaluate': 1},
+                         {stage: histogram.count for stage, histogram in profiler.stages.items()})
+        self.assertEqual(7, profiler.tokens.sum)
+        self.assertEqual({'add': 1, 'multiply': 2}, profiler.operations)
+
+    def test_should_record_recursion_depth_of_parser(self):
+        """Tests that the recursion depth grows with nesting for the recursive parser, but not the iterative one"""
+        depths = []
+        for expression, iterative in (('1', False), ('((((1))))', False), ('((((1))))', True)):
+            profiler = Profiler()
+            Calculator(expression, iterative, profiler=profiler).calculate()
+            depths.append(profiler.depths.max)
+        self.assertLess(depths[0], depths[1])
+        self.assertLess(depths[2], depths[0])
+
+    def test_should_count_operations_of_backend(self):
+        """Tests that the operations of the backend are counted, and results are unchanged"""
+        profiler = Profiler()
+        self.assertEqual(2 ** 70 // 4, Calculator('2 ^ 70 / 4', backend=INTEGER_BACKEND, profiler=profiler).calculate())
+        self.assertEqual({'divide': 1, 'exponentiation': 1}, profiler.operations)
+
+    def test_should_record_evaluation_errors(self):
+        """Tests that evaluations which raise are recorded, and the error is not swallowed"""
+        profiler = Profiler()
+        with self.assertRaises(ZeroDivisionError):
+            Calculator('1 / 0', profiler=profiler).calculate()
+        self.assertEqual(1, profiler.stages['evaluate'].count)
+
+    def test_should_profile_batch(self):
+        """Tests that every line of a batch is recorded, and profiling in worker processes is rejected"""
+        profiler = Profiler()
+        calculate_batch(['1 + 1\n', '2 - 1\n', '1 +\n'], io.StringIO(), profiler=profiler)
+        self.assertEqual(2, profiler.stages['evaluate'].count)
+        self.assertEqual({'add': 1, 'subtract': 1}, profiler.operations)
+        with self.assertRaises(ValueError):
+            calculate_batch(['1'], io.StringIO(), workers=2, profiler=profiler)
+
+    def test_should_export_json_and_prometheus(self):
+        """Tests that the profile is exported as JSON and Prometheus text with histograms and counters"""
+        profiler = Profiler()
+        Calculator('1 + 2', profiler=profiler).calculate()
+        profile = json.loads(profiler.export('json'))
+        self.assertEqual(1, profile['stages']['evaluate']['count'])
+        self.assertEqual(1, profile['tokens']['buckets']['+Inf'])
+        self.assertEqual({'add': 1}, profile['operations'])
+        metrics = profiler.export('prometheus')
+        self.assertIn('calculator_stage_seconds_bucket{stage="parse",le="+Inf"} 1\n', metrics)
+        self.assertIn('calculator_tokens_count 1\n', metrics)
+        self.assertIn('calculator_operations_total{operation="add"} 1\n', metrics)
+        self.assertIn('operations: add 1', profiler.export())
+        with self.assertRaises(ValueError):
+            profiler.export('xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import unittest
+from dt042g_src.server import CalculatorServer
+
+
+class TestCalculatorServer(unittest.IsolatedAsyncioTestCase):
+    """Tests for the CalculatorServer class using a loopback client"""
+
+    async def asyncSetUp(self) -> None:
+        """Starts a server on a free loopback port and connects a client to it"""
+        self.listener = await CalculatorServer(batch_threshold=2).start('127.0.0.1', 0)
+        port = self.listener.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+
+    async def asyncTearDown(self) -> None:
+        """Closes the client and server"""
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.listener.close()
+        await self.listener.wait_closed()
+
+    async def request(self, *lines: str) -> list:
+        """Pipelines request lines and reads a response line for each"""
+        self.writer.write(''.join(line + '\n' for line in lines).encode())
+        await self.writer.drain()
+        return [(await self.reader.readline()).decode() for _ in lines]
+
+    async def test_should_answer_plain_expressions(self):
+        """Tests that plain expressions are answered with 'expression = result' lines"""
+        self.assertEqual(['1+2 = 3\n', '2^3 = 8\n'], await self.request('1+2', '2^3'))
+
+    async def test_should_answer_pipelined_json_requests_in_order(self):
+        """Tests that JSON requests are answered in order with their ids"""
+        responses = await self.request(*[json.dumps({'id': i, 'expression': f'{i}*2'}) for i in range(20)])
+        self.assertEqual([{'id': i, 'result': i * 2} for i in range(20)], [json.loads(line) for line in responses])
+
+    async def test_should_bind_variables(self):
+        """Tests that JSON requests can bind variables"""
+        response, = await self.request(json.dumps({'id': 'a', 'expression': 'x*(1+y)', 'variables': {'x': 2, 'y': 1}}))
+        self.assertEqual({'id': 'a', 'result': 4}, json.loads(response))
+
+    async def test_should_answer_invalid_variables_with_error(self):
+        """Tests that variables which are not finite numbers within the limits are answered with an error"""
+        for variables in ({'a': [1], 'b': 30000000}, {'a': '1', 'b': 2}, {'a': True, 'b': 2},
+                          {'a': float('nan'), 'b': 2}, {'a': 10 ** 400, 'b': 2}, [1, [2]], 'ab'):
+            with self.subTest(variables=variables):
+                response, = await self.request(json.dumps({'id': 1, 'expression': 'a*b', 'variables': variables}))
+                self.assertIn('error', json.loads(response))
+        response, = await self.request(json.dumps({'id': 1, 'expression': 'a*b', 'variables': [1.5, 2]}))
+        self.assertEqual({'id': 1, 'result': 3}, json.loads(response))
+
+    async def test_should_answer_errors_with_position(self):
+        """Tests that errors are answered with the message and position"""
+        response, = await self.request(json.dumps({'id': 1, 'expression': '1+(2'}))
+        response = json.loads(response)
+        self.assertEqual(4, response['position'])
+        self.assertIn('error', response)
+
+    async def test_should_answer_limit_errors(self):
+        """Tests that expressions exceeding the limits for untrusted clients are answered with an error"""
+        response, = await self.request(json.dumps({'id': 1, 'expression': '9^9^9'}))
+        self.assertIn('exponent', json.loads(response)['error'])
+
+    async def test_should_answer_results_which_are_not_finite_with_error(self):
+        """Tests that results which JSON can not represent are answered with an error, with and without limits"""
+        response, = await self.request(json.dumps({'id': 1, 'expression': 'hypot(1e308, 1e308)'}))
+        self.assertIn('error', json.loads(response))
+        server = CalculatorServer(limits=None)
+        for expression in ['1e308 * 10', '1e308 * 10 - 1e308 * 10']:
+            with self.subTest(expression=expression):
+                self.assertIn('error', server.calculate(expression))
+
+    async def test_should_answer_invalid_utf8_with_error(self):
+        """Tests that a line which is not UTF-8 is answered with an error, and the connection is kept"""
+        self.writer.write(b'\xff1+1\n1+2\n')
+        await self.writer.drain()
+        self.assertIn('error', json.loads(await self.reader.readline()))
+        self.assertEqual('1+2 = 3\n', (await self.reader.readline()).decode())
+
+    async def test_should_answer_unlimited_errors(self):
+        """Tests that expressions too deep to parse, and ints with too many digits to write, are answered with an
+        error without limits"""
+        server = CalculatorServer(limits=None)
+        self.assertIn('error', server.calculate('(' * 5000 + '1' + ')' * 5000))
+        self.assertIn('error', server.calculate('a * a', {'a': 10 ** 4000}))
+        self.assertEqual({'result': 10 ** 200}, server.calculate('a * a', {'a': 10 ** 100}))
+
+    async def test_should_answer_batches(self):
+        """Tests that batches, including those calculated in the executor, are answered in order"""
+        for expressions in (['1+1'], ['1+1', '1/0', '2*3']):
+            with self.subTest(expressions=expressions):
+                response, = await self.request(json.dumps({'id': 7, 'expressions': expressions}))
+                results = json.loads(response)['results']
+                self.assertEqual(len(expressions), len(results))
+                self.assertEqual({'result': 2}, results[0])
+        self.assertIn('error', results[1])
+
+    async def test_invalid_json_should_answer_error(self):
+        """Tests that an invalid JSON request is answered with an error and the connection stays usable"""
+        responses = await self.request('{"id": ', '1+1')
+        self.assertIn('error', json.loads(responses[0]))
+        self.assertEqual('1+1 = 2\n', responses[1])
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are not supported')
+class TestCalculatorServerUnix(unittest.IsolatedAsyncioTestCase):
+    """Tests for the CalculatorServer class using a Unix socket"""
+
+    async def test_should_answer_over_unix_socket(self):
+        """Tests that requests are answered over a Unix socket"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'calculator.sock')
+            listener = await CalculatorServer().start_unix(path)
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b'6/4\n')
+            self.assertEqual(b'6/4 = 1.5\n', await reader.readline())
+            writer.close()
+            await writer.wait_closed()
+            listener.close()
+            await listener.wait_closed()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+import math
+import unittest
+from array import array
+from dt042g_src.calculator import INTEGER_BACKEND, DivisionByZeroError, NonRealResultError, compile as compile_expression
+from dt042g_src.vectorized import ColumnEvaluator, ZeroDivisionMode, evaluate_columns, numpy
+
+
+class TestColumnEvaluator(unittest.TestCase):
+    """Tests for the ColumnEvaluator class using array.array columns"""
+
+    def test_should_evaluate_every_row(self):
+        """Tests that every row is evaluated like a single evaluation"""
+        compiled = compile_expression('price*(1+rate)^n-1')
+        columns = {'price': [100, 200, 50], 'rate': [0.5, 0, 1], 'n': [2, 3, 1]}
+        result = evaluate_columns(compiled, columns, use_numpy=False)
+        self.assertIsInstance(result, array)
+        self.assertEqual([224, 199, 99], list(result))
+
+    def test_should_reject_other_backends(self):
+        """Tests that only expressions compiled with the float backend are evaluated over columns"""
+        compiled = compile_expression('x/2', backend=INTEGER_BACKEND)
+        self.assertRaises(ValueError, ColumnEvaluator, compiled)
+
+    def test_should_call_functions(self):
+        """Tests that function calls are evaluated for every row"""
+        compiled = compile_expression('sqrt(x)+max(x, 2)')
+        self.assertEqual([3, 6, 12], list(evaluate_columns(compiled, {'x': [1, 4, 9]}, use_numpy=False)))
+
+    def test_should_compare_rows(self):
+        """Tests that comparisons and not are evaluated for every row, and conditionals are rejected"""
+        compiled = compile_expression('(x > 1) + (not x)')
+        self.assertEqual([1, 0, 1], list(evaluate_columns(compiled, {'x': [0, 1, 2]}, use_numpy=False)))
+        self.assertRaises(ValueError, ColumnEvaluator, compile_expression('if(x, 1, 2)'))
+
+    def test_should_bind_columns_by_position(self):
+        """Tests that columns are bound by position from a sequence"""
+        compiled = compile_expression('a-b')
+        self.assertEqual([2, -1], list(evaluate_columns(compiled, [[3, 1], [1, 2]], use_numpy=False)))
+
+    def test_should_handle_negation(self):
+        """Tests that negation is evaluated for every row"""
+        compiled = compile_expression('-x^2')
+        self.assertEqual([-1, -4], list(evaluate_columns(compiled, {'x': [1, 2]}, use_numpy=False)))
+
+    def test_zero_division_should_raise_error(self):
+        """Tests that a row dividing by zero raises error by default"""
+        compiled = compile_expression('1/x')
+        self.assertRaises(ZeroDivisionError, evaluate_columns, compiled, {'x': [1, 0]}, use_numpy=False)
+
+    def test_zero_division_should_be_nan(self):
+        """Tests that a row dividing by zero is NaN in NAN mode"""
+        compiled = compile_expression('1/x+1')
+        result = evaluate_columns(compiled, {'x': [1, 0, 2]}, ZeroDivisionMode.NAN, use_numpy=False)
+        self.assertEqual(2, result[0])
+        self.assertTrue(math.isnan(result[1]))
+        self.assertEqual(1.5, result[2])
+
+    def test_zero_division_should_be_masked(self):
+        """Tests that a row dividing by zero is flagged in MASK mode"""
+        compiled = compile_expression('1/x')
+        result, mask = evaluate_columns(compiled, {'x': [1, 0, 2]}, ZeroDivisionMode.MASK, use_numpy=False)
+        self.assertEqual([0, 1, 0], list(mask))
+        self.assertEqual(0.5, result[2])
+
+    def test_zero_power_should_follow_zero_division_mode(self):
+        """Tests that zero raised to a negative power is handled like a division by zero"""
+        compiled = compile_expression('x^-1')
+        self.assertRaises(DivisionByZeroError, evaluate_columns, compiled, {'x': [1, 0]}, use_numpy=False)
+        result = evaluate_columns(compiled, {'x': [0, 2]}, ZeroDivisionMode.NAN, use_numpy=False)
+        self.assertTrue(math.isnan(result[0]))
+        self.assertEqual(0.5, result[1])
+
+    def test_non_real_power_should_raise_error(self):
+        """Tests that a row whose power is a complex number raises error like a single evaluation"""
+        compiled = compile_expression('x^0.5')
+        self.assertEqual([0, 2], list(evaluate_columns(compiled, {'x': [0, 4]}, use_numpy=False)))
+        self.assertRaises(NonRealResultError, evaluate_columns, compiled, {'x': [4, -1]}, use_numpy=False)
+
+    def test_unequal_columns_should_raise_error(self):
+        """Tests that columns of different lengths raise error"""
+        compiled = compile_expression('a+b')
+        self.assertRaises(ValueError, evaluate_columns, compiled, {'a': [1, 2], 'b': [1]}, use_numpy=False)
+
+    def test_missing_column_should_raise_error(self):
+        """Tests that a variable without a column raises error"""
+        compiled = compile_expression('a+b')
+        self.assertRaises(ValueError, evaluate_columns, compiled, {'a': [1, 2]}, use_numpy=False)
+
+    @unittest.skipIf(numpy is not None, 'NumPy is installed')
+    def test_should_raise_error_if_numpy_is_requested_but_missing(self):
+        """Tests that requesting NumPy without it being installed raises error"""
+        self.assertRaises(ValueError, ColumnEvaluator, compile_expression('x'), use_numpy=True)
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestColumnEvaluatorNumpy(unittest.TestCase):
+    """Tests for the ColumnEvaluator class using NumPy arrays"""
+
+    def test_should_evaluate_every_row(self):
+        """Tests that every row is evaluated like a single evaluation"""
+        compiled = compile_expression('price*(1+rate)^n-1')
+        columns = {'price': numpy.array([100, 200, 50]), 'rate': [0.5, 0, 1], 'n': [2, 3, 1]}
+        result = evaluate_columns(compiled, columns, use_numpy=True)
+        self.assertEqual([224, 199, 99], result.tolist())
+
+    def test_should_call_functions(self):
+        """Tests that function calls are evaluated for every row"""
+        compiled = compile_expression('sqrt(x)+max(x, 2)')
+        self.assertEqual([3, 6, 12], evaluate_columns(compiled, {'x': [1, 4, 9]}, use_numpy=True).tolist())
+
+    def test_should_compare_rows(self):
+        """Tests that comparisons are evaluated for every row as numbers"""
+        compiled = compile_expression('(x > 0) + (x > 0) + (not x)')
+        self.assertEqual([1, 2, 2], evaluate_columns(compiled, {'x': [0, 1, 2]}, use_numpy=True).tolist())
+
+    def test_zero_division_should_raise_error(self):
+        """Tests that a row dividing by zero raises error by default"""
+        compiled = compile_expression('1/x')
+        self.assertRaises(ZeroDivisionError, evaluate_columns, compiled, {'x': [1, 0]}, use_numpy=True)
+
+    def test_zero_division_should_be_masked(self):
+        """Tests that a row dividing by zero is NaN and flagged in MASK mode"""
+        compiled = compile_expression('1/x')
+        result, mask = evaluate_columns(compiled, {'x': [1, 0, 2]}, ZeroDivisionMode.MASK, use_numpy=True)
+        self.assertEqual([False, True, False], mask.tolist())
+        self.assertTrue(numpy.isnan(result[1]))
+
+    def test_non_real_power_should_raise_error(self):
+        """Tests that a row whose power is a complex number raises error like a single evaluation, unless an
+        operand is NaN"""
+        compiled = compile_expression('x^0.5')
+        self.assertEqual([0, 2], evaluate_columns(compiled, {'x': [0, 4]}, use_numpy=True).tolist())
+        self.assertRaises(NonRealResultError, evaluate_columns, compiled, {'x': [4, -1]}, use_numpy=True)
+        self.assertTrue(numpy.isnan(evaluate_columns(compiled, {'x': [math.nan]}, use_numpy=True)[0]))
+
+    def test_powers_should_match_array_columns(self):
+        """Tests that zero raised to a negative power follows the zero division mode, and overflowing powers are
+        infinite, with NumPy and array.array columns alike"""
+        compiled = compile_expression('x ^ y')
+        columns = {'x': [0, 10, -10, 2], 'y': [-1, 400, 401, 3]}
+        for use_numpy in (True, False):
+            with self.subTest(use_numpy=use_numpy):
+                self.assertRaises(DivisionByZeroError, evaluate_columns, compiled, columns, use_numpy=use_numpy)
+                result, mask = evaluate_columns(compiled, columns, ZeroDivisionMode.MASK, use_numpy=use_numpy)
+                self.assertTrue(math.isnan(result[0]))
+                self.assertEqual([math.inf, -math.inf, 8], list(result[1:]))
+                self.assertEqual([True, False, False, False], [bool(flag) for flag in mask])
+
+
+if __name__ == '__main__':
+    unittest.main()